@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+The local API throughput: submitting objects in batches, listing
+the vectors and streaming the objects, in objects per second
+
+    python benchmarks/api.py [-n OBJECTS] [--batch N] [--seed SEED]
+"""
+import argparse
+import http.client
+import json
+import queue
+import time
+
+from minode import api, shared
+
+from validation import make_objects
+
+
+def request(conn, method, path, body=None):
+    """The decoded JSON response over the kept alive connection"""
+    conn.request(
+        method, path, body=None if body is None else json.dumps(body),
+        headers={'Content-Type': 'application/json'})
+    return json.loads(conn.getresponse().read())
+
+
+def measure(name, n, func):
+    """Run and print the rate"""
+    started = time.perf_counter()
+    func()
+    print('{:<24} {:10.0f} objects/s'.format(
+        name, n / (time.perf_counter() - started)))
+
+
+def main():
+    """Print the report"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--objects', type=int, default=5000)
+    parser.add_argument('--batch', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    shared.nonce_trials_per_byte = 1
+    shared.vector_advertise_queue = queue.Queue()
+    datas = [
+        obj.to_bytes().hex()
+        for obj in make_objects(args.objects, 2 ** 14, args.seed)]
+    listener = api.APIListener('127.0.0.1', 0)
+    listener.start()
+    conn = http.client.HTTPConnection(
+        '127.0.0.1', listener.server.server_address[1])
+    try:
+        def submit():
+            for i in range(0, len(datas), args.batch):
+                request(
+                    conn, 'POST', '/objects',
+                    {'objects': datas[i:i + args.batch]})
+
+        def vectors():
+            since = 0
+            while True:
+                response = request(
+                    conn, 'GET', '/vectors?since={}&limit={}'.format(
+                        since, args.batch))
+                if not response['vectors']:
+                    break
+                since = response['last']
+
+        def subscribe():
+            stream = http.client.HTTPConnection(
+                '127.0.0.1', listener.server.server_address[1])
+            stream.request('GET', '/subscribe')
+            response = stream.getresponse()
+            for _ in datas:
+                json.loads(response.readline())
+            stream.close()
+
+        measure('submit, batch {}'.format(args.batch), len(datas), submit)
+        measure('vectors, limit {}'.format(args.batch), len(datas), vectors)
+        measure('subscribe', len(datas), subscribe)
+    finally:
+        conn.close()
+        listener.server.shutdown()
+        listener.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
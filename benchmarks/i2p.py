@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+"""
+I2P stream setup rate and throughput against the SAM bridge stand-in
+
+    python benchmarks/i2p.py [-n STREAMS] [--latency MS] [--loss P]
+        [--pool SIZE] [--size MIB]
+"""
+import argparse
+import threading
+import time
+
+from minode import i2p
+from minode.tests.sam_bridge import SAMBridge, State
+
+
+def dial(bridge, listening, dialing, n):
+    """Dial *n* streams in parallel, returns the successful dialers"""
+    dialers = [
+        i2p.I2PDialer(
+            dialing, listening.controller.dest_pub, dialing.controller.nick,
+            sam_port=bridge.port)
+        for _ in range(n)]
+    for d in dialers:
+        d.start()
+    for d in dialers:
+        d.join()
+    return [d for d in dialers if d.success]
+
+
+def close_streams(*states):
+    """Close and forget the streams"""
+    for state in states:
+        for c in state.connections:
+            c.s.close()
+        state.connections.clear()
+
+
+def throughput(bridge, listening, dialing, size):
+    """Send *size* bytes over a new stream, returns the bytes/s"""
+    close_streams(dialing)
+    if not dial(bridge, listening, dialing, 1):
+        return 0
+    sender = next(iter(dialing.connections))
+    while not listening.connections:
+        time.sleep(0.001)
+    receiver = next(iter(listening.connections))
+    chunk = b'\x00' * 65536
+    received = [len(receiver.buffer_receive)]
+
+    def receive():
+        receiver.s.settimeout(10)
+        while received[0] < size:
+            data = receiver.s.recv(65536)
+            if not data:
+                break
+            received[0] += len(data)
+
+    thread = threading.Thread(target=receive)
+    started = time.perf_counter()
+    thread.start()
+    for _ in range(size // len(chunk)):
+        sender.s.sendall(chunk)
+    thread.join()
+    return received[0] / (time.perf_counter() - started)
+
+
+def node(bridge, accept_streams=0, pool=0):
+    """The State with a running controller, listeners and SAM pool"""
+    state = State()
+    started = time.perf_counter()
+    state.controller = i2p.I2PController(state, port=bridge.port)
+    state.controller.start()
+    print('session:       {:8.1f} ms'.format(
+        (time.perf_counter() - started) * 1000))
+    if pool:
+        state.i2p_sam_pool = i2p.SAMPool(port=bridge.port, size=pool)
+        state.i2p_sam_pool.fill()
+    for _ in range(accept_streams):
+        i2p.I2PListener(
+            state, state.controller.nick, port=bridge.port).start()
+    return state
+
+
+def main():
+    """Print the report"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--streams', type=int, default=100)
+    parser.add_argument(
+        '--latency', type=float, default=0,
+        help='Milliseconds added to each SAM reply')
+    parser.add_argument(
+        '--loss', type=float, default=0,
+        help='Probability of a failing STREAM CONNECT')
+    parser.add_argument(
+        '--pool', type=int, default=0, help='Size of the SAM socket pool')
+    parser.add_argument(
+        '--accept-streams', type=int, default=2,
+        help='Simultaneous STREAM ACCEPT')
+    parser.add_argument(
+        '--size', type=int, default=64,
+        help='MiB to send through a stream')
+    args = parser.parse_args()
+
+    bridge = SAMBridge(latency=args.latency / 1000, loss=args.loss).start()
+    listening = node(bridge, accept_streams=args.accept_streams)
+    dialing = node(bridge, pool=args.pool)
+    nodes = [listening, dialing]
+    if args.pool:
+        # let the pool fill
+        time.sleep(args.latency / 1000 + 0.1)
+    try:
+        # the listener drops the streams from the same destination
+        # but only after the bridge has paired them with STREAM ACCEPT
+        started = time.perf_counter()
+        succeeded = len(dial(bridge, listening, dialing, args.streams))
+        print('stream setup:  {:8.1f} streams/s, {} of {} succeeded'.format(
+            succeeded / (time.perf_counter() - started),
+            succeeded, args.streams))
+        # a new node, the listeners may still renew the dropped streams
+        nodes.append(node(bridge, accept_streams=1))
+        print('throughput:    {:8.1f} MiB/s'.format(throughput(
+            bridge, nodes[-1], dialing, args.size * 1024 * 1024
+        ) / 1024 / 1024))
+    finally:
+        for state in nodes:
+            state.shutdown()
+            if state.i2p_sam_pool:
+                state.i2p_sam_pool.close()
+            state.controller.join()
+        close_streams(*nodes)
+        bridge.stop()
+
+
+if __name__ == '__main__':
+    main()
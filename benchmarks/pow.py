@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""
+Proof of work backends: trials per second and the time to do the PoW
+for an object like our I2P destination object
+
+    python benchmarks/pow.py [--seconds S] [--runs N] [--seed SEED]
+"""
+import argparse
+import random
+import statistics
+import time
+
+from minode import proofofwork, shared, structure
+
+
+def destination_object(rng):
+    """An object with the size and TTL of the I2P destination object"""
+    return structure.Object(
+        b'\x00' * 8, int(time.time() + 2 * 3600),
+        shared.i2p_dest_obj_type, shared.i2p_dest_obj_version,
+        shared.stream, rng.getrandbits(391 * 8).to_bytes(391, 'big'))
+
+
+def do_pow(search, obj):
+    """Seconds to find the nonce in the current process"""
+    target = obj.pow_target()
+    initial_hash = obj.pow_initial_hash()
+    started = time.perf_counter()
+    nonce = 1
+    # pylint: disable=protected-access
+    while search(target, initial_hash, nonce, proofofwork._chunk) is None:
+        nonce += proofofwork._chunk
+    return time.perf_counter() - started
+
+
+def main():
+    """Print the report"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=1)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    objects = [destination_object(rng) for _ in range(args.runs)]
+    expected = 2 ** 64 / objects[0].pow_target()
+    print('expected trials for the I2P destination object: {:.0f}'.format(
+        expected))
+    print('\n{:<8} {:>12} {:>12} {:>12}'.format(
+        'backend', 'trials/s', 'expected, s', 'median, s'))
+    for name, search in proofofwork.backends.items():
+        rate = proofofwork.benchmark(search, args.seconds)
+        print('{:<8} {:12.0f} {:12.2f} {:12.2f}'.format(
+            name, rate, expected / rate,
+            statistics.median(do_pow(search, obj) for obj in objects)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+Startup time of minode: wall time of the CLI and the import time breakdown
+
+    python benchmarks/startup.py [-n RUNS] [--top N]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+
+def wall_time(args, runs):
+    """Median seconds to run the python interpreter with *args*"""
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(  # nosec B603
+            [sys.executable] + args, check=True,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+
+def import_times(module, runs):
+    """Median self and cumulative microseconds by imported module"""
+    samples = {}
+    for _ in range(runs):
+        result = subprocess.run(  # nosec B603
+            [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        for line in result.stderr.decode().splitlines():
+            if not line.startswith('import time:'):
+                continue
+            try:
+                own, cumulative, name = line[12:].split('|')
+                own, cumulative = int(own), int(cumulative)
+            except ValueError:
+                continue  # the header
+            samples.setdefault(name.strip(), []).append((own, cumulative))
+    return {
+        name: (
+            statistics.median(s[0] for s in values),
+            statistics.median(s[1] for s in values))
+        for name, values in samples.items()}
+
+
+def main():
+    """Print the report"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    baseline = wall_time(['-c', 'pass'], args.runs)
+    print('python -c pass:           {:8.1f} ms'.format(baseline * 1000))
+    print('python -m minode.main -h: {:8.1f} ms'.format(
+        wall_time(['-m', 'minode.main', '-h'], args.runs) * 1000))
+
+    times = import_times('minode.main', args.runs)
+    print('\nimport minode.main: {:.1f} ms'.format(
+        times['minode.main'][1] / 1000))
+    print('\n{:>10} {:>10}  module'.format('self, ms', 'cumul, ms'))
+    for name, (own, cumulative) in sorted(
+        times.items(), key=lambda item: item[1][1], reverse=True
+    )[1:args.top + 1]:
+        print('{:10.2f} {:10.2f}  {}'.format(
+            own / 1000, cumulative / 1000, name))
+
+
+if __name__ == '__main__':
+    main()
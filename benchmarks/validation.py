@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+Object validation throughput: Object.is_valid() one by one
+and validation.validate() in batches, in objects per second
+
+    python benchmarks/validation.py [-n OBJECTS] [--batch N]
+        [--max-size BYTES] [--seed SEED]
+"""
+import argparse
+import hashlib
+import random
+import time
+
+from minode import shared, structure, validation
+
+
+def make_objects(n, max_size, seed):
+    """
+    Objects with the reproducible payloads, mostly small like the
+    messages and some large, the PoW is done for a low difficulty
+    """
+    rng = random.Random(seed)
+    expires_time = int(time.time() + 3 * 24 * 3600)
+    objects = []
+    for _ in range(n):
+        size = int(min(rng.paretovariate(1.2) * 300, max_size))
+        obj = structure.Object(
+            b'\x00' * 8, expires_time, 2, 1, shared.stream,
+            rng.getrandbits(size * 8).to_bytes(size, 'big'))
+        target = obj.pow_target()
+        initial_hash = obj.pow_initial_hash()
+        nonce = 0
+        while int.from_bytes(hashlib.sha512(hashlib.sha512(
+            nonce.to_bytes(8, 'big') + initial_hash
+        ).digest()).digest()[:8], 'big') > target:
+            nonce += 1
+        objects.append(structure.Object.from_bytes(
+            nonce.to_bytes(8, 'big') + obj.to_bytes()[8:]))
+    return objects
+
+
+def measure(name, n, size, func):
+    """Run and print the rate"""
+    started = time.perf_counter()
+    valid = func()
+    elapsed = time.perf_counter() - started
+    print('{:<28} {:10.0f} objects/s {:8.1f} MiB/s  valid: {}'.format(
+        name, n / elapsed, size / elapsed / 1024 / 1024, valid))
+
+
+def main():
+    """Print the report"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--objects', type=int, default=5000)
+    parser.add_argument('--batch', type=int, default=64)
+    parser.add_argument('--max-size', type=int, default=2 ** 18)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    shared.nonce_trials_per_byte = 1
+    objects = make_objects(args.objects, args.max_size, args.seed)
+    size = sum(len(obj.object_payload) for obj in objects)
+    print('{} objects, {:.1f} MiB'.format(len(objects), size / 1024 / 1024))
+
+    measure(
+        'Object.is_valid()', len(objects), size,
+        lambda: sum(obj.is_valid() for obj in objects))
+    measure(
+        'validate(), batch {}'.format(args.batch), len(objects), size,
+        lambda: sum(
+            sum(validation.validate(objects[i:i + args.batch]))
+            for i in range(0, len(objects), args.batch)))
+
+
+if __name__ == '__main__':
+    main()
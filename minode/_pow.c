@@ -0,0 +1,161 @@
+/*
+ * Native proof of work search: double SHA-512 of the 8 bytes nonce
+ * and the 64 bytes initial hash, both messages fit into a single
+ * SHA-512 block, so a trial is two compressions without the padding
+ * and buffering of a general purpose implementation.
+ */
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#include <stdint.h>
+
+static const uint64_t K[80] = {
+    0x428a2f98d728ae22ULL, 0x7137449123ef65cdULL, 0xb5c0fbcfec4d3b2fULL,
+    0xe9b5dba58189dbbcULL, 0x3956c25bf348b538ULL, 0x59f111f1b605d019ULL,
+    0x923f82a4af194f9bULL, 0xab1c5ed5da6d8118ULL, 0xd807aa98a3030242ULL,
+    0x12835b0145706fbeULL, 0x243185be4ee4b28cULL, 0x550c7dc3d5ffb4e2ULL,
+    0x72be5d74f27b896fULL, 0x80deb1fe3b1696b1ULL, 0x9bdc06a725c71235ULL,
+    0xc19bf174cf692694ULL, 0xe49b69c19ef14ad2ULL, 0xefbe4786384f25e3ULL,
+    0x0fc19dc68b8cd5b5ULL, 0x240ca1cc77ac9c65ULL, 0x2de92c6f592b0275ULL,
+    0x4a7484aa6ea6e483ULL, 0x5cb0a9dcbd41fbd4ULL, 0x76f988da831153b5ULL,
+    0x983e5152ee66dfabULL, 0xa831c66d2db43210ULL, 0xb00327c898fb213fULL,
+    0xbf597fc7beef0ee4ULL, 0xc6e00bf33da88fc2ULL, 0xd5a79147930aa725ULL,
+    0x06ca6351e003826fULL, 0x142929670a0e6e70ULL, 0x27b70a8546d22ffcULL,
+    0x2e1b21385c26c926ULL, 0x4d2c6dfc5ac42aedULL, 0x53380d139d95b3dfULL,
+    0x650a73548baf63deULL, 0x766a0abb3c77b2a8ULL, 0x81c2c92e47edaee6ULL,
+    0x92722c851482353bULL, 0xa2bfe8a14cf10364ULL, 0xa81a664bbc423001ULL,
+    0xc24b8b70d0f89791ULL, 0xc76c51a30654be30ULL, 0xd192e819d6ef5218ULL,
+    0xd69906245565a910ULL, 0xf40e35855771202aULL, 0x106aa07032bbd1b8ULL,
+    0x19a4c116b8d2d0c8ULL, 0x1e376c085141ab53ULL, 0x2748774cdf8eeb99ULL,
+    0x34b0bcb5e19b48a8ULL, 0x391c0cb3c5c95a63ULL, 0x4ed8aa4ae3418acbULL,
+    0x5b9cca4f7763e373ULL, 0x682e6ff3d6b2b8a3ULL, 0x748f82ee5defb2fcULL,
+    0x78a5636f43172f60ULL, 0x84c87814a1f0ab72ULL, 0x8cc702081a6439ecULL,
+    0x90befffa23631e28ULL, 0xa4506cebde82bde9ULL, 0xbef9a3f7b2c67915ULL,
+    0xc67178f2e372532bULL, 0xca273eceea26619cULL, 0xd186b8c721c0c207ULL,
+    0xeada7dd6cde0eb1eULL, 0xf57d4f7fee6ed178ULL, 0x06f067aa72176fbaULL,
+    0x0a637dc5a2c898a6ULL, 0x113f9804bef90daeULL, 0x1b710b35131c471bULL,
+    0x28db77f523047d84ULL, 0x32caab7b40c72493ULL, 0x3c9ebe0a15c9bebcULL,
+    0x431d67c49c100d4cULL, 0x4cc5d4becb3e42b6ULL, 0x597f299cfc657e2aULL,
+    0x5fcb6fab3ad6faecULL, 0x6c44198c4a475817ULL
+};
+
+static const uint64_t IV[8] = {
+    0x6a09e667f3bcc908ULL, 0xbb67ae8584caa73bULL, 0x3c6ef372fe94f82bULL,
+    0xa54ff53a5f1d36f1ULL, 0x510e527fade682d1ULL, 0x9b05688c2b3e6c1fULL,
+    0x1f83d9abfb41bd6bULL, 0x5be0cd19137e2179ULL
+};
+
+#define ROTR(x, n) (((x) >> (n)) | ((x) << (64 - (n))))
+
+/* SHA-512 of a single block *w* (16 words, extended in place) */
+static void
+compress(uint64_t w[80], uint64_t out[8])
+{
+    uint64_t a = IV[0], b = IV[1], c = IV[2], d = IV[3];
+    uint64_t e = IV[4], f = IV[5], g = IV[6], h = IV[7];
+    uint64_t t1, t2;
+    int i;
+
+    for (i = 16; i < 80; i++) {
+        w[i] = w[i - 16] + w[i - 7]
+            + (ROTR(w[i - 15], 1) ^ ROTR(w[i - 15], 8) ^ (w[i - 15] >> 7))
+            + (ROTR(w[i - 2], 19) ^ ROTR(w[i - 2], 61) ^ (w[i - 2] >> 6));
+    }
+    for (i = 0; i < 80; i++) {
+        t1 = h + (ROTR(e, 14) ^ ROTR(e, 18) ^ ROTR(e, 41))
+            + ((e & f) ^ (~e & g)) + K[i] + w[i];
+        t2 = (ROTR(a, 28) ^ ROTR(a, 34) ^ ROTR(a, 39))
+            + ((a & b) ^ (a & c) ^ (b & c));
+        h = g;
+        g = f;
+        f = e;
+        e = d + t1;
+        d = c;
+        c = b;
+        b = a;
+        a = t1 + t2;
+    }
+    out[0] = IV[0] + a;
+    out[1] = IV[1] + b;
+    out[2] = IV[2] + c;
+    out[3] = IV[3] + d;
+    out[4] = IV[4] + e;
+    out[5] = IV[5] + f;
+    out[6] = IV[6] + g;
+    out[7] = IV[7] + h;
+}
+
+static PyObject *
+search(PyObject *self, PyObject *args)
+{
+    unsigned long long target, start, count, i;
+    Py_buffer initial_hash;
+    uint64_t hash[8], first[8], second[8];
+    uint64_t w1[80], w2[80];
+    const unsigned char *p;
+    int found = 0, j, k;
+
+    if (!PyArg_ParseTuple(
+            args, "Ky*KK", &target, &initial_hash, &start, &count))
+        return NULL;
+    if (initial_hash.len != 64) {
+        PyBuffer_Release(&initial_hash);
+        PyErr_SetString(PyExc_ValueError, "initial hash must be 64 bytes");
+        return NULL;
+    }
+    p = initial_hash.buf;
+    for (j = 0; j < 8; j++) {
+        hash[j] = 0;
+        for (k = 0; k < 8; k++)
+            hash[j] = (hash[j] << 8) | p[j * 8 + k];
+    }
+    PyBuffer_Release(&initial_hash);
+
+    Py_BEGIN_ALLOW_THREADS
+    for (i = 0; i < count; i++) {
+        /* 72 bytes message */
+        w1[0] = start + i;
+        for (j = 0; j < 8; j++)
+            w1[j + 1] = hash[j];
+        w1[9] = 0x8000000000000000ULL;
+        for (j = 10; j < 15; j++)
+            w1[j] = 0;
+        w1[15] = 72 * 8;
+        compress(w1, first);
+        /* 64 bytes message */
+        for (j = 0; j < 8; j++)
+            w2[j] = first[j];
+        w2[8] = 0x8000000000000000ULL;
+        for (j = 9; j < 15; j++)
+            w2[j] = 0;
+        w2[15] = 64 * 8;
+        compress(w2, second);
+        if (second[0] <= target) {
+            found = 1;
+            break;
+        }
+    }
+    Py_END_ALLOW_THREADS
+
+    if (!found)
+        Py_RETURN_NONE;
+    return PyLong_FromUnsignedLongLong(start + i);
+}
+
+static PyMethodDef methods[] = {
+    {"search", search, METH_VARARGS,
+     "search(target, initial_hash, start, count)\n--\n\n"
+     "The first nonce from *start* to *start* + *count* with the trial\n"
+     "value not exceeding the *target* or None."},
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef module = {
+    PyModuleDef_HEAD_INIT, "_pow", "Native proof of work search", -1,
+    methods
+};
+
+PyMODINIT_FUNC
+PyInit__pow(void)
+{
+    return PyModule_Create(&module);
+}
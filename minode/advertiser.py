@@ -2,10 +2,12 @@
 Advertiser thread advertises new addresses and objects among all connections
 """
 import logging
+import queue
+import random
 import threading
 import time
 
-from . import message, shared
+from . import message, shared, timing
 
 
 class Advertiser(threading.Thread):
@@ -15,34 +17,66 @@ class Advertiser(threading.Thread):
 
     def run(self):
         while True:
-            time.sleep(0.4)
+            shared.advertise_event.wait()
             if shared.shutting_down:
                 logging.debug('Shutting down Advertiser')
                 break
+            # coalesce the items arriving shortly into one message
+            time.sleep(shared.advertise_window)
+            shared.advertise_event.clear()
             self._advertise_vectors()
             self._advertise_addresses()
 
     @staticmethod
-    def _advertise_vectors():
-        vectors_to_advertise = set()
-        while not shared.vector_advertise_queue.empty():
-            vectors_to_advertise.add(shared.vector_advertise_queue.get())
-        if len(vectors_to_advertise) > 0:
-            for c in shared.connections.copy():
-                if c.status == 'fully_established':
-                    c.send_queue.put(message.Inv(vectors_to_advertise))
+    def _drain(q):
+        items = []
+        while True:
+            try:
+                items.append(q.get_nowait())
+            except queue.Empty:
+                return items
 
     @staticmethod
-    def _advertise_addresses():
-        addresses_to_advertise = set()
-        while not shared.address_advertise_queue.empty():
-            addr = shared.address_advertise_queue.get()
+    def _established_connections():
+        with shared.connections_lock:
+            return tuple(shared.established_connections)
+
+    def _advertise_vectors(self):
+        vectors_to_advertise = set(self._drain(shared.vector_advertise_queue))
+        if len(vectors_to_advertise) > 0:
+            connections = self._established_connections()
+            # one message serialized once for all the connections
+            inv = message.Inv(vectors_to_advertise)
+            if shared.timing and connections:
+                inv.relay = timing.Relay(inv.vectors, len(connections))
+            for c in connections:
+                c.send_queue.put(inv)
+
+    def _advertise_addresses(self):
+        addresses_to_advertise = {}
+        for addr in self._drain(shared.address_advertise_queue):
             if addr.port == 'i2p':
                 # We should not try to construct Addr messages
                 # with I2P destinations (yet)
                 continue
-            addresses_to_advertise.add(addr)
+            addresses_to_advertise[(addr.host, addr.port)] = addr
         if len(addresses_to_advertise) > 0:
-            for c in shared.connections.copy():
-                if c.status == 'fully_established':
-                    c.send_queue.put(message.Addr(addresses_to_advertise))
+            connections = self._established_connections()
+            # relay each address to a few random peers not knowing it
+            relays = {}
+            for key, addr in addresses_to_advertise.items():
+                candidates = [
+                    c for c in connections if key not in c.addresses_known]
+                for c in random.sample(  # nosec B311
+                    candidates,
+                    min(len(candidates), shared.addr_relay_fanout)
+                ):
+                    relays.setdefault(c, []).append(addr)
+            messages = {}
+            for c, addresses in relays.items():
+                keys = tuple((a.host, a.port) for a in addresses)
+                c.addresses_known.update(keys)
+                # peers receiving the same addresses share the message
+                if keys not in messages:
+                    messages[keys] = message.Addr(addresses)
+                c.send_queue.put(messages[keys])
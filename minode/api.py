@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+The local API for the applications using the node as a relay:
+submitting the objects in bulk, getting them by vector, listing
+and streaming the new ones, and queueing the PoW. It's served over HTTP
+with JSON by `.httpd.APIHandler`, the objects and vectors are hex encoded.
+"""
+import logging
+import struct
+import threading
+
+from . import feed, proofofwork, shared, storage, structure, timing, validation
+
+
+def decode(data):
+    """The object from the hex encoded *data*, raises ValueError"""
+    try:
+        return structure.Object.from_bytes(bytes.fromhex(data))
+    except (TypeError, IndexError, ValueError, struct.error) as e:
+        raise ValueError('malformed object') from e
+
+
+def submit(datas):
+    """
+    Validate and add the hex encoded objects in one batch,
+    returns the list of results with the status 'added', 'duplicate',
+    'invalid' or 'malformed'
+    """
+    results = [None] * len(datas)
+    objects = []
+    indexes = []
+    for i, data in enumerate(datas):
+        try:
+            objects.append(decode(data))
+        except ValueError as e:
+            results[i] = {'status': 'malformed', 'reason': str(e)}
+        else:
+            indexes.append(i)
+
+    good = []
+    for i, obj, valid in zip(indexes, objects, validation.validate(objects)):
+        if valid:
+            good.append((i, obj))
+        else:
+            results[i] = {
+                'vector': obj.vector.hex(), 'status': 'invalid',
+                'reason': obj.check() or 'insufficient pow'}
+
+    added = storage.add_objects([obj for _, obj in good])
+    for (i, obj), new in zip(good, added):
+        results[i] = {
+            'vector': obj.vector.hex(),
+            'status': 'added' if new else 'duplicate'}
+        if new:
+            if shared.timing:
+                timing.seen(obj.vector)
+            shared.vector_advertise_queue.put(obj.vector)
+    logging.debug(
+        'Added %s of %s objects submitted locally', sum(added), len(datas))
+    return results
+
+
+def get(vector):
+    """The object by vector or None"""
+    return shared.objects.get(vector)
+
+
+def _since(seq, epoch=None):
+    # the numbers from another epoch refer to other objects
+    if epoch is not None and epoch != feed.objects.epoch:
+        return 0
+    return 0 if seq > feed.objects.last else seq
+
+
+def vectors(since=0, limit=None, flt=None, epoch=None):
+    """
+    The list of (sequence number, vector) of the objects after *since*
+    of the *epoch* passing the `.feed.Filter` *flt*, from the start
+    if the epoch has changed
+    """
+    return feed.objects.since(_since(since, epoch), limit, flt)
+
+
+def subscribe(since=0, timeout=15, flt=None, epoch=None):
+    """
+    Generate (sequence number, object) of the objects after *since*
+    of the *epoch* passing the *flt*, waiting for the new ones,
+    or None after *timeout* without them
+    """
+    since = _since(since, epoch)
+    while not shared.shutting_down:
+        last = feed.objects.last
+        items = feed.objects.since(since, flt=flt)
+        for seq, vector in items:
+            obj = shared.objects.get(vector)
+            if obj:
+                yield seq, obj
+        # the objects removed from the inventory are skipped
+        since = max(since, last, items[-1][0] if items else 0)
+        if not items and not feed.objects.wait(since, timeout):
+            yield None
+
+
+def submit_pow(datas, priority=0):
+    """Queue the PoW for the hex encoded objects, returns the jobs"""
+    return proofofwork.jobs.submit_many(
+        [decode(data) for data in datas], priority)
+
+
+class APIListener(threading.Thread):
+    """The thread serving the local API"""
+    def __init__(self, host, port):
+        super().__init__(name='API', daemon=True)
+        # http.server is slow to import and rarely needed
+        from . import httpd  # pylint: disable=import-outside-toplevel
+        self.server = httpd.Server((host, port), httpd.APIHandler)
+
+    def run(self):
+        self.server.serve_forever()
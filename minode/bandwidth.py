@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""Token buckets for limiting the network bandwidth"""
+import threading
+import time
+
+from . import shared
+
+
+class TokenBucket():
+    """
+    A token bucket refilled with *rate* tokens (bytes) per second
+    and holding up to *burst* tokens, zero rate means no limit
+    """
+    def __init__(self, rate=0, burst=None):
+        self.lock = threading.Lock()
+        self.rate = 0
+        self.burst = 0
+        self.tokens = 0
+        self.updated = time.monotonic()
+        self.set_rate(rate, burst)
+
+    def __repr__(self):
+        return 'token_bucket, rate: {}, burst: {}, tokens: {}'.format(
+            self.rate, self.burst, int(self.tokens))
+
+    def set_rate(self, rate, burst=None):
+        """Change the rate and the bucket size, refilling the bucket"""
+        with self.lock:
+            self.rate = rate
+            self.burst = burst or rate
+            self.tokens = self.burst
+            self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self, n):
+        """How many of *n* bytes may be transferred now"""
+        if not self.rate:
+            return n
+        with self.lock:
+            self._refill()
+            return max(0, min(n, int(self.tokens)))
+
+    def consume(self, n):
+        """Take *n* tokens, possibly going into debt"""
+        if not self.rate:
+            return
+        with self.lock:
+            self._refill()
+            self.tokens -= n
+
+
+upload = TokenBucket()
+download = TokenBucket()
+
+
+def configure():
+    """Apply global limits from `.shared`"""
+    upload.set_rate(shared.upload_limit)
+    download.set_rate(shared.download_limit)
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 """The logic and behaviour of a single connection"""
 import base64
+import collections
 import errno
 import logging
 import math
@@ -9,10 +10,78 @@ import select
 import socket
 import ssl
 import threading
-import queue
 import time
 
-from . import message, shared, structure
+from . import (
+    bandwidth, message, metrics, sendqueue, shared, storage, structure,
+    timing, validation)
+
+
+class KnownAddresses():
+    """A bounded set of (host, port) the peer is known to have"""
+    def __init__(self, limit=5000):
+        self.limit = limit
+        self.lock = threading.Lock()
+        self.items = collections.OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    def update(self, keys):
+        """Add *keys* forgetting the oldest ones above the limit"""
+        with self.lock:
+            for key in keys:
+                self.items[key] = None
+                self.items.move_to_end(key)
+            while len(self.items) > self.limit:
+                self.items.popitem(last=False)
+
+
+def _create_tls_context(server):
+    context = ssl.create_default_context(
+        purpose=ssl.Purpose.CLIENT_AUTH if server
+        else ssl.Purpose.SERVER_AUTH
+    )
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+
+    if (
+        ssl.OPENSSL_VERSION_NUMBER >= 0x10100000
+        and not ssl.OPENSSL_VERSION.startswith("LibreSSL")
+    ):  # OpenSSL>=1.1
+        context.set_ciphers('AECDH-AES256-SHA@SECLEVEL=0')
+    else:
+        context.set_ciphers('AECDH-AES256-SHA')
+
+    context.set_ecdh_curve("secp256k1")
+    context.options = (
+        ssl.OP_ALL | ssl.OP_NO_SSLv2 | ssl.OP_NO_SSLv3
+        | ssl.OP_SINGLE_ECDH_USE | ssl.OP_CIPHER_SERVER_PREFERENCE)
+    # OP_NO_SSL* is deprecated since 3.6
+    try:
+        # TODO: ssl.TLSVersion.TLSv1 is deprecated
+        context.minimum_version = ssl.TLSVersion.TLSv1
+        context.maximum_version = ssl.TLSVersion.TLSv1_2
+    except AttributeError:
+        pass
+    return context
+
+
+_tls_contexts = {}
+_tls_contexts_lock = threading.Lock()
+
+
+def tls_context(server):
+    """The TLS context for the *server* or client side, created once"""
+    with _tls_contexts_lock:
+        try:
+            return _tls_contexts[server]
+        except KeyError:
+            context = _tls_contexts[server] = _create_tls_context(server)
+            return context
 
 
 class ConnectionBase(threading.Thread):
@@ -20,6 +89,11 @@ class ConnectionBase(threading.Thread):
     Common code for the connection thread
     with minimum command handlers to reuse
     """
+    # (key, time, inv messages) for the objects in the inventory
+    _inventory_cache = (None, 0, ())
+    # whether the new addresses from the peer are rate limited
+    addr_limited = True
+
     def __init__(
         self, host, port, s=None, network='ip', server=False,
         i2p_remote_dest=b''
@@ -28,15 +102,18 @@ class ConnectionBase(threading.Thread):
         self.port = port
         self.network = network
         self.i2p_remote_dest = i2p_remote_dest
+        # nick of the SAM session carrying the I2P stream
+        self.i2p_session = None
 
         if self.network == 'i2p':
             self.host_print = self.i2p_remote_dest[:8].decode()
         else:
             self.host_print = self.host
+        self.peer_str = '{}:{}'.format(self.host_print, self.port)
 
         super().__init__(name='Connection to {}:{}'.format(host, port))
 
-        self.send_queue = queue.Queue()
+        self.send_queue = sendqueue.SendQueue()
 
         self.vectors_to_get = set()
         self.vectors_to_send = set()
@@ -46,6 +123,8 @@ class ConnectionBase(threading.Thread):
         self.status = 'ready'
 
         self.tls = False
+        # time.monotonic() of the TLS handshake start while in progress
+        self.tls_started = None
 
         self.verack_received = False
         self.verack_sent = False
@@ -60,7 +139,31 @@ class ConnectionBase(threading.Thread):
             self.status = 'connected'
 
         self.buffer_receive = b''
+        # vector: the object with its message waiting for the validation
+        self.objects_received = {}
+        # the control messages
         self.buffer_send = b''
+        # object messages wait here until the control messages are sent
+        self.buffer_send_bulk = collections.deque()
+        # the rest of the object message being sent, a memoryview
+        self.buffer_send_object = b''
+        # bytes of the control messages queued and written to the socket,
+        # (queued bytes at the end, relay) of the invs being sent
+        self.control_queued = 0
+        self.control_written = 0
+        self.relays = collections.deque()
+        self.send_retry_size = 0
+
+        # addresses sent to or received from the peer
+        self.addresses_known = KnownAddresses()
+        # counts new addresses received in addr messages
+        self.addr_bucket = bandwidth.TokenBucket(
+            shared.addr_rate, shared.addr_burst)
+
+        self.upload_bucket = bandwidth.TokenBucket(
+            shared.connection_upload_limit)
+        self.download_bucket = bandwidth.TokenBucket(
+            shared.connection_download_limit)
 
         self.next_message_size = shared.header_length
         self.next_header = True
@@ -81,33 +184,42 @@ class ConnectionBase(threading.Thread):
                 self.send_queue.put(message.Version(self.host, self.port))
             else:
                 self.send_queue.put(message.Version('127.0.0.1', 7656))
+        # the data received by the I2P listener or dialer
+        self._process_buffer_receive()
         while True:
             if (
                 self.on_connection_fully_established_scheduled
-                and not (self.buffer_send or self.buffer_receive)
+                and not (
+                    self.buffer_send or self.buffer_send_object
+                    or self.buffer_send_bulk or self.buffer_receive)
             ):
                 self._on_connection_fully_established()
+            if self.tls_started and self._do_tls_handshake():
+                continue
             data = True
             try:
                 if self.status == 'fully_established':
-                    data = self.s.recv(4096)
-                    self.buffer_receive += data
-                    if data and len(self.buffer_receive) < 4000000:
-                        continue
+                    size = self._receive_allowance(4096)
+                    if size:
+                        data = self.s.recv(size)
+                        self._account_received(len(data))
+                        self.buffer_receive += data
+                        if data and len(self.buffer_receive) < 4000000:
+                            continue
+                    else:
+                        self._process_objects()
                 else:
                     data = self.s.recv(
                         self.next_message_size - len(self.buffer_receive))
                     self.buffer_receive += data
             except ssl.SSLWantReadError:
                 if self.status == 'fully_established':
-                    self._request_objects()
-                    self._send_objects()
+                    self._process_objects()
             except socket.error as e:
                 err = e.args[0]
                 if err in (errno.EAGAIN, errno.EWOULDBLOCK):
                     if self.status == 'fully_established':
-                        self._request_objects()
-                        self._send_objects()
+                        self._process_objects()
                 else:
                     logging.debug(
                         'Disconnecting from %s:%s. Reason: %s',
@@ -144,13 +256,17 @@ class ConnectionBase(threading.Thread):
             if not data:
                 self.status = 'disconnected'
                 self.s.close()
+                with shared.connections_lock:
+                    shared.established_connections.discard(self)
+                if shared.timing:
+                    timing.forget_peer(self.peer_str)
                 logging.info(
                     'Disconnected from %s:%s', self.host_print, self.port)
                 break
-            time.sleep(0.2)
+            shared.shutdown_event.wait(0.2)
 
     def _connect(self):
-        peer_str = '{0.host_print}:{0.port}'.format(self)
+        peer_str = self.peer_str
         logging.debug('Connecting to %s', peer_str)
 
         try:
@@ -171,13 +287,59 @@ class ConnectionBase(threading.Thread):
         if self.status != 'connected':
             self.status = 'failed'
 
+    def _timed(self, stage, command, func, *args):
+        """Call *func* recording its duration if timing is enabled"""
+        if not shared.timing:
+            return func(*args)
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            timing.observe(
+                stage, command, self.peer_str,
+                time.perf_counter() - started)
+
+    def _receive_allowance(self, n):
+        """How many bytes we may receive now according to the limits"""
+        return min(
+            bandwidth.download.available(n),
+            self.download_bucket.available(n))
+
+    def _account_received(self, n):
+        bandwidth.download.consume(n)
+        self.download_bucket.consume(n)
+
     def _send_data(self):
-        if self.buffer_send and self:
+        while (
+            self.buffer_send or self.buffer_send_object
+            or self.buffer_send_bulk
+        ):
+            # an object message once started is sent to the end,
+            # then the control messages go ahead of the next one
+            if not self.buffer_send_object and not self.buffer_send:
+                # the frame may be shared with the cache and other peers
+                self.buffer_send_object = memoryview(
+                    self.buffer_send_bulk.popleft())
+            sending_object = bool(self.buffer_send_object)
+            buffer = (
+                self.buffer_send_object if sending_object
+                else self.buffer_send)
+            size = min(
+                bandwidth.upload.available(len(buffer)),
+                self.upload_bucket.available(len(buffer)))
+            # SSL requires to retry a write with at least the same length
+            size = max(size, self.send_retry_size)
+            if not size:
+                return
             try:
-                amount = self.s.send(self.buffer_send)
-                self.buffer_send = self.buffer_send[amount:]
-            except (BlockingIOError, ssl.SSLWantWriteError):
-                pass
+                amount = self._timed(
+                    'socket', b'send', self.s.send,
+                    memoryview(buffer)[:size])
+            except ssl.SSLWantWriteError:
+                self.send_retry_size = size
+                return
+            except BlockingIOError:
+                return
             except (
                 BrokenPipeError, ConnectionResetError, ssl.SSLError, OSError
             ) as e:
@@ -185,72 +347,99 @@ class ConnectionBase(threading.Thread):
                     'Disconnecting from %s:%s. Reason: %s',
                     self.host_print, self.port, e)
                 self.status = 'disconnecting'
+                return
+            self.send_retry_size = 0
+            bandwidth.upload.consume(amount)
+            self.upload_bucket.consume(amount)
+            if sending_object:
+                self.buffer_send_object = buffer[amount:]
+            else:
+                self.buffer_send = buffer[amount:]
+                self.control_written += amount
+                while (
+                    self.relays and self.relays[0][0] <= self.control_written
+                ):
+                    self.relays.popleft()[1].sent()
+            if amount < size:
+                # the socket buffer is full
+                return
 
-    def _do_tls_handshake(self):
+    def _start_tls_handshake(self):
         logging.debug(
             'Initializing TLS connection with %s:%s',
             self.host_print, self.port)
-
-        context = ssl.create_default_context(
-            purpose=ssl.Purpose.CLIENT_AUTH if self.server
-            else ssl.Purpose.SERVER_AUTH
-        )
-        context.check_hostname = False
-        context.verify_mode = ssl.CERT_NONE
-
-        if (
-            ssl.OPENSSL_VERSION_NUMBER >= 0x10100000
-            and not ssl.OPENSSL_VERSION.startswith("LibreSSL")
-        ):  # OpenSSL>=1.1
-            context.set_ciphers('AECDH-AES256-SHA@SECLEVEL=0')
-        else:
-            context.set_ciphers('AECDH-AES256-SHA')
-
-        context.set_ecdh_curve("secp256k1")
-        context.options = (
-            ssl.OP_ALL | ssl.OP_NO_SSLv2 | ssl.OP_NO_SSLv3
-            | ssl.OP_SINGLE_ECDH_USE | ssl.OP_CIPHER_SERVER_PREFERENCE)
-        # OP_NO_SSL* is deprecated since 3.6
-        try:
-            # TODO: ssl.TLSVersion.TLSv1 is deprecated
-            context.minimum_version = ssl.TLSVersion.TLSv1
-            context.maximum_version = ssl.TLSVersion.TLSv1_2
-        except AttributeError:
-            pass
-
-        self.s = context.wrap_socket(
+        self.s = tls_context(self.server).wrap_socket(
             self.s, server_side=self.server, do_handshake_on_connect=False)
+        self.tls_started = time.monotonic()
+        self._do_tls_handshake()
 
-        while True:
-            try:
-                self.s.do_handshake()
-                break
-            except ssl.SSLWantReadError:
-                select.select([self.s], [], [])
-            except ssl.SSLWantWriteError:
-                select.select([], [self.s], [])
-            except Exception as e:
+    def _do_tls_handshake(self):
+        """
+        Make a step of the handshake, waiting for the socket up to 0.2s,
+        returns True while it's in progress
+        """
+        remaining = self.tls_started + shared.tls_timeout - time.monotonic()
+        try:
+            self.s.do_handshake()
+        except (ssl.SSLWantReadError, ssl.SSLWantWriteError) as e:
+            if shared.shutting_down:
+                self.tls_started = None
+                return False
+            if remaining <= 0:
                 logging.debug(
-                    'Disconnecting from %s:%s. Reason: %s',
-                    self.host_print, self.port, e)
+                    'Disconnecting from %s:%s. Reason: TLS handshake timeout',
+                    self.host_print, self.port)
                 self.status = 'disconnecting'
-                if isinstance(e, ssl.SSLError):  # pylint: disable=no-member
-                    logging.debug('ssl.SSLError reason: %s', e.reason)
-                    shared.node_pool.discard((self.host, self.port))
-                return
+                self.tls_started = None
+                return False
+            if isinstance(e, ssl.SSLWantReadError):
+                select.select([self.s], [], [], min(remaining, 0.2))
+            else:
+                select.select([], [self.s], [], min(remaining, 0.2))
+            return True
+        except Exception as e:
+            logging.debug(
+                'Disconnecting from %s:%s. Reason: %s',
+                self.host_print, self.port, e)
+            self.status = 'disconnecting'
+            self.tls_started = None
+            if isinstance(e, ssl.SSLError):  # pylint: disable=no-member
+                logging.debug('ssl.SSLError reason: %s', e.reason)
+                shared.node_pool.discard((self.host, self.port))
+            return False
+        if shared.timing:
+            timing.observe(
+                'tls', b'', self.peer_str,
+                time.monotonic() - self.tls_started)
+        self.tls_started = None
         self.tls = True
         logging.debug(
             'Established TLS connection with %s:%s (%s)',
             self.host_print, self.port, self.s.version())
+        self._on_connection_ready()
+        return False
 
     def _send_message(self, m):
-        if isinstance(m, message.Message) and m.command == b'object':
-            logging.debug(
-                '%s:%s <- %s',
-                self.host_print, self.port, structure.Object.from_message(m))
+        logging.debug('%s:%s <- %s', self.host_print, self.port, m)
+        data = m.to_bytes()
+        if getattr(m, 'command', None) == b'object':
+            command = b'object'
+            # control messages go ahead of the objects
+            self.buffer_send_bulk.append(data)
         else:
-            logging.debug('%s:%s <- %s', self.host_print, self.port, m)
-        self.buffer_send += m.to_bytes()
+            command = data[4:16].rstrip(b'\x00')
+            self.buffer_send += data
+            self.control_queued += len(data)
+            if getattr(m, 'relay', None):
+                # complete when written to the socket
+                self.relays.append((self.control_queued, m.relay))
+        metrics.messages_sent.inc(command)
+        metrics.bytes_sent.inc(command, n=len(data))
+        if self.i2p_session:
+            metrics.i2p_bytes.inc(self.i2p_session, 'sent', n=len(data))
+        if shared.timing:
+            timing.observe(
+                'queue', command, self.peer_str, self.send_queue.waited)
 
     def _on_connection_fully_established(self):
         logging.info(
@@ -258,8 +447,11 @@ class ConnectionBase(threading.Thread):
             self.host_print, self.port)
         self.on_connection_fully_established_scheduled = False
         if self.remote_version.services & 2 and self.network == 'ip':
-            self._do_tls_handshake()  # NODE_SSL
+            self._start_tls_handshake()  # NODE_SSL
+        else:
+            self._on_connection_ready()
 
+    def _on_connection_ready(self):
         addr = {
             structure.NetAddr(c.remote_version.services, c.host, c.port)
             for c in shared.connections if c.network != 'i2p'
@@ -275,28 +467,57 @@ class ConnectionBase(threading.Thread):
                 structure.NetAddr(1, a[0], a[1])
                 for a in random.sample(tuple(shared.unchecked_node_pool), 10)})
         if len(addr) != 0:
+            self.addresses_known.update((a.host, a.port) for a in addr)
             self.send_queue.put(message.Addr(addr))
 
-        with shared.objects_lock:
-            if len(shared.objects) > 0:
-                to_send = {
-                    vector for vector in shared.objects.keys()
-                    if shared.objects[vector].expires_time > time.time()}
-                while len(to_send) > 0:
-                    if len(to_send) > 10000:
-                        # We limit size of inv messaged to 10000 entries
-                        # because they might time out
-                        # in very slow networks (I2P)
-                        pack = random.sample(tuple(to_send), 10000)
-                        self.send_queue.put(message.Inv(pack))
-                        to_send.difference_update(pack)
-                    else:
-                        self.send_queue.put(message.Inv(to_send))
-                        to_send.clear()
+        for inv in self._inventory():
+            self.send_queue.put(inv)
         self.status = 'fully_established'
+        with shared.connections_lock:
+            shared.established_connections.add(self)
+
+    @classmethod
+    def _inventory(cls):
+        """
+        Inv messages for all the objects, shared by the connections
+        becoming established while the inventory is unchanged
+        """
+        with shared.objects_lock:
+            try:
+                # the dict is ordered, the last key changes on insert
+                key = (
+                    id(shared.objects), len(shared.objects),
+                    next(reversed(shared.objects), None))
+            except TypeError:  # python < 3.8
+                key = None
+            cached_key, cached_time, invs = cls._inventory_cache
+            if (
+                key is not None and key == cached_key
+                and time.time() - cached_time < 60
+            ):
+                return invs
+            now = time.time()
+            to_send = [
+                vector for vector, obj in shared.objects.items()
+                if obj.expires_time > now]
+        # We limit size of inv messaged to 10000 entries
+        # because they might time out in very slow networks (I2P)
+        invs = tuple(
+            message.Inv(to_send[i:i + 10000])
+            for i in range(0, len(to_send), 10000))
+        cls._inventory_cache = (key, now, invs)
+        return invs
 
     def _process_queue(self):
         while not self.send_queue.empty():
+            if (
+                len(self.buffer_send) + len(self.buffer_send_object)
+                + sum(map(len, self.buffer_send_bulk))
+                > shared.send_buffer_size
+                and not self.send_queue.has_control()
+            ):
+                # keep the rest in the queue to be able to prioritize
+                break
             m = self.send_queue.get()
             if m:
                 if m == 'fully_established':
@@ -324,7 +545,8 @@ class ConnectionBase(threading.Thread):
                 self.next_message_size += h.payload_length
             else:
                 try:
-                    m = message.Message.from_bytes(
+                    m = self._timed(
+                        'parse', b'', message.Message.from_bytes,
                         self.buffer_receive[:self.next_message_size])
                 except ValueError as e:
                     self.status = 'disconnecting'
@@ -332,19 +554,30 @@ class ConnectionBase(threading.Thread):
                         'Received malformed message from %s:%s, %s',
                         self.host_print, self.port, e)
                     break
+                command = metrics.command_label(m.command)
+                metrics.messages_received.inc(command)
+                metrics.bytes_received.inc(
+                    command, n=self.next_message_size)
+                if self.i2p_session:
+                    metrics.i2p_bytes.inc(
+                        self.i2p_session, 'received',
+                        n=self.next_message_size)
                 self.next_header = True
                 self.buffer_receive = self.buffer_receive[
                     self.next_message_size:]
                 self.next_message_size = shared.header_length
                 self.last_message_received = time.time()
                 try:
-                    self._process_message(m)
+                    self._timed(
+                        'process', m.command, self._process_message, m)
                 except ValueError as e:
                     self.status = 'disconnecting'
                     logging.warning(
                         'Received malformed message from %s:%s: %s',
                         self.host_print, self.port, e)
                     break
+        if self.objects_received:
+            self._validate_objects()
 
     def _process_message(self, m):
         if m.command == b'verack':
@@ -410,9 +643,34 @@ class ConnectionBase(threading.Thread):
     def _process_msg_addr(self, m):
         addr = message.Addr.from_message(m)
         logging.debug('%s:%s -> %s', self.host_print, self.port, addr)
-        for a in addr.addresses:
-            if (a.host, a.port) not in shared.core_nodes:
-                shared.unchecked_node_pool.add((a.host, a.port))
+        received = {(a.host, a.port) for a in addr.addresses}
+        self.addresses_known.update(received)
+        new = [
+            key for key in received if key not in shared.core_nodes
+            and key not in shared.node_pool
+            and key not in shared.unchecked_node_pool]
+        allowed = shared.unchecked_node_pool_limit
+        if self.addr_limited:
+            allowed = min(allowed, self.addr_bucket.available(len(new)))
+        if allowed < len(new):
+            logging.debug(
+                'Ignoring %i of %i new addresses from %s:%s',
+                len(new) - allowed, len(new), self.host_print, self.port)
+            new = random.sample(new, allowed)
+        if self.addr_limited:
+            self.addr_bucket.consume(len(new))
+        # the new addresses replace random ones in the full pool
+        excess = (
+            len(shared.unchecked_node_pool) + len(new)
+            - shared.unchecked_node_pool_limit)
+        if excess > 0:
+            shared.unchecked_node_pool.difference_update(random.sample(
+                tuple(shared.unchecked_node_pool), excess))
+        shared.unchecked_node_pool.update(new)
+
+    def _process_objects(self):
+        self._timed('request_objects', b'getdata', self._request_objects)
+        self._timed('send_objects', b'object', self._send_objects)
 
     def _request_objects(self):
         if self.vectors_to_get and len(self.vectors_requested) < 100:
@@ -454,7 +712,7 @@ class ConnectionBase(threading.Thread):
                     len(to_re_request), self.host_print, self.port)
 
     def _send_objects(self):
-        if self.vectors_to_send:
+        if self.vectors_to_send and self.send_queue.accepts_objects():
             logging.info(
                 'Preparing to send %s objects', len(self.vectors_to_send))
             if len(self.vectors_to_send) > 16:
@@ -463,12 +721,10 @@ class ConnectionBase(threading.Thread):
             else:
                 to_send = self.vectors_to_send.copy()
                 self.vectors_to_send.clear()
-            with shared.objects_lock:
-                for vector in to_send:
-                    obj = shared.objects.get(vector, None)
-                    if obj:
-                        self.send_queue.put(
-                            message.Message(b'object', obj.to_bytes()))
+            for vector in to_send:
+                obj = shared.objects.get(vector, None)
+                if obj:
+                    self.send_queue.put(message.object_frames.frame(obj))
 
 
 class Connection(ConnectionBase):
@@ -487,20 +743,52 @@ class Connection(ConnectionBase):
         logging.debug('%s:%s -> %s', self.host_print, self.port, obj)
         self.vectors_requested.pop(obj.vector, None)
         self.vectors_to_get.discard(obj.vector)
-        if obj.is_valid() and obj.vector not in shared.objects:
-            with shared.objects_lock:
-                shared.objects[obj.vector] = obj
-            if (
-                obj.object_type == shared.i2p_dest_obj_type
-                and obj.version == shared.i2p_dest_obj_version
-            ):
-                dest = base64.b64encode(obj.object_payload, altchars=b'-~')
-                logging.debug(
-                    'Received I2P destination object,'
-                    ' adding to i2p_unchecked_node_pool')
-                logging.debug(dest)
-                shared.i2p_unchecked_node_pool.add((dest, 'i2p'))
-            shared.vector_advertise_queue.put(obj.vector)
+        if (
+            obj.vector in shared.objects
+            or obj.vector in self.objects_received
+        ):
+            metrics.objects_received.inc('duplicate')
+            return
+        # validated along with the other objects from the buffer
+        self.objects_received[obj.vector] = (obj, m)
+
+    def _validate_objects(self):
+        objects = list(self.objects_received.values())
+        self.objects_received = {}
+        started = time.perf_counter()
+        results = validation.validate([obj for obj, _ in objects])
+        duration = (time.perf_counter() - started) / len(objects)
+        for (obj, m), valid in zip(objects, results):
+            metrics.validation_seconds.observe(duration)
+            if shared.timing:
+                timing.observe('validate', b'object', self.peer_str, duration)
+            if not valid:
+                metrics.objects_received.inc('invalid')
+            elif self._add_object(obj, m):
+                metrics.objects_received.inc('valid')
+            else:
+                # added from another connection meanwhile
+                metrics.objects_received.inc('duplicate')
+
+    def _add_object(self, obj, m):
+        if not storage.add_object(obj):
+            return False
+        # keep the received frame to serve getdata
+        message.object_frames.put(obj.vector, m.to_bytes())
+        if shared.timing:
+            timing.seen(obj.vector)
+        if (
+            obj.object_type == shared.i2p_dest_obj_type
+            and obj.version == shared.i2p_dest_obj_version
+        ):
+            dest = base64.b64encode(obj.object_payload, altchars=b'-~')
+            logging.debug(
+                'Received I2P destination object,'
+                ' adding to i2p_unchecked_node_pool')
+            logging.debug(dest)
+            shared.i2p_unchecked_node_pool.add((dest, 'i2p'))
+        shared.vector_advertise_queue.put(obj.vector)
+        return True
 
     def _process_msg_getdata(self, m):
         getdata = message.GetData.from_message(m)
@@ -510,6 +798,9 @@ class Connection(ConnectionBase):
 
 class Bootstrapper(ConnectionBase):
     """A special type of connection to find IP nodes"""
+    # the addresses are what we connected for
+    addr_limited = False
+
     def _process_msg_addr(self, m):
         super()._process_msg_addr(m)
         shared.node_pool.discard((self.host, self.port))
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+The objects in the order of arrival for the local API: each new object
+gets the next sequence number, so the clients can ask for the objects
+since the last one they have seen or wait for the new ones.
+The numbers start over with the process, so they come with the epoch,
+a random string changing along. The objects are indexed by type and tag
+to find the ones for the client's filter.
+"""
+import bisect
+import itertools
+import os
+import threading
+
+from . import shared
+
+
+class Filter():
+    """
+    The objects of the *object_type* and *version* and with the tag
+    starting with the bytes *tag_prefix*, None matches any
+    """
+    def __init__(self, object_type=None, version=None, tag_prefix=None):
+        self.object_type = object_type
+        self.version = version
+        self.tag_prefix = tag_prefix
+
+    def match(self, obj):
+        """Whether the object passes the filter"""
+        return (
+            (self.object_type is None or obj.object_type == self.object_type)
+            and (self.version is None or obj.version == self.version)
+            and (self.tag_prefix is None or obj.tag is not None
+                 and obj.tag.startswith(self.tag_prefix)))
+
+
+class Feed():
+    """The sequence numbers and vectors of the objects with the indexes"""
+    # the objects after the sequence number checked without the indexes,
+    # e.g. the new ones for the waiting clients
+    scan_limit = 1000
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.epoch = os.urandom(8).hex()
+        self.last = 0
+        self.seqs = []
+        self.vectors = []
+        # vector: sequence number
+        self.numbers = {}
+        # vector: (object type, tag) to remove it from the indexes
+        self.keys = {}
+        # object type: set of vectors
+        self.types = {}
+        # tag: the vector or the set of vectors if there are more,
+        # most tags have one object; the sorted tags for the prefix search
+        self.tags = {}
+        self.sorted_tags = []
+
+    def _clear(self):
+        self.seqs = []
+        self.vectors = []
+        self.numbers = {}
+        self.keys = {}
+        self.types = {}
+        self.tags = {}
+        self.sorted_tags = []
+
+    def reset(self, objects=()):
+        """Start over with the *objects*"""
+        with self.cond:
+            self._clear()
+            self.epoch = os.urandom(8).hex()
+            self.last = 0
+        self.add(objects)
+
+    def add(self, objects):
+        """Append the new *objects* and wake up the waiting clients"""
+        if not objects:
+            return
+        with self.cond:
+            new_tags = []
+            for obj in objects:
+                self.last += 1
+                self.seqs.append(self.last)
+                self.vectors.append(obj.vector)
+                self.numbers[obj.vector] = self.last
+                self.keys[obj.vector] = (obj.object_type, obj.tag)
+                self.types.setdefault(obj.object_type, set()).add(obj.vector)
+                if obj.tag is not None:
+                    vectors = self.tags.get(obj.tag)
+                    if vectors is None:
+                        self.tags[obj.tag] = obj.vector
+                        new_tags.append(obj.tag)
+                    elif isinstance(vectors, set):
+                        vectors.add(obj.vector)
+                    elif vectors != obj.vector:
+                        self.tags[obj.tag] = {vectors, obj.vector}
+            if len(new_tags) == 1:
+                bisect.insort(self.sorted_tags, new_tags[0])
+            elif new_tags:
+                # merges the sorted runs
+                self.sorted_tags = sorted(self.sorted_tags + new_tags)
+            self.cond.notify_all()
+
+    def _candidates(self, flt):
+        """The vectors from the indexes for the filter or None"""
+        sets = []
+        if flt.object_type is not None:
+            sets.append(self.types.get(flt.object_type, set()))
+        if flt.tag_prefix is not None:
+            tags = set()
+            i = bisect.bisect_left(self.sorted_tags, flt.tag_prefix)
+            for tag in self.sorted_tags[i:]:
+                if not tag.startswith(flt.tag_prefix):
+                    break
+                vectors = self.tags[tag]
+                if isinstance(vectors, set):
+                    tags.update(vectors)
+                else:
+                    tags.add(vectors)
+            sets.append(tags)
+        if not sets:
+            return None
+        return set.intersection(*sorted(sets, key=len))
+
+    def since(self, seq, limit=None, flt=None):
+        """
+        The list of (sequence number, vector) after *seq*, at most
+        *limit*, of the objects still in the inventory passing the *flt*.
+        The indexes are used if they give less objects to check
+        than the ones after *seq*.
+        """
+        with self.cond:
+            i = bisect.bisect_right(self.seqs, seq)
+            tail = len(self.seqs) - i
+            candidates = (
+                self._candidates(flt) if flt and tail > self.scan_limit
+                else None)
+            if candidates is not None and len(candidates) < tail:
+                items = sorted(
+                    (self.numbers[vector], vector) for vector in candidates
+                    if self.numbers[vector] > seq)
+            else:
+                items = list(zip(self.seqs[i:], self.vectors[i:]))
+        result = []
+        for item in items:
+            obj = shared.objects.get(item[1])
+            if obj and (flt is None or flt.match(obj)):
+                result.append(item)
+                if len(result) == limit:
+                    break
+        return result
+
+    def wait(self, seq, timeout=None):
+        """Wait for the objects after *seq*, returns True if there are"""
+        with self.cond:
+            return self.cond.wait_for(lambda: self.last > seq, timeout)
+
+    def prune(self):
+        """Forget the objects removed from the inventory"""
+        with self.cond:
+            gone = {
+                vector for vector in self.vectors
+                if vector not in shared.objects}
+            if not gone:
+                return
+            kept = [vector not in gone for vector in self.vectors]
+            self.seqs = list(itertools.compress(self.seqs, kept))
+            self.vectors = list(itertools.compress(self.vectors, kept))
+            tags_removed = False
+            for vector in gone:
+                del self.numbers[vector]
+                object_type, tag = self.keys.pop(vector)
+                self.types[object_type].discard(vector)
+                if not self.types[object_type]:
+                    del self.types[object_type]
+                if tag is None:
+                    continue
+                vectors = self.tags[tag]
+                if isinstance(vectors, set):
+                    vectors.discard(vector)
+                    if len(vectors) == 1:
+                        self.tags[tag] = vectors.pop()
+                elif vectors == vector:
+                    del self.tags[tag]
+                    tags_removed = True
+            if tags_removed:
+                self.sorted_tags = sorted(self.tags)
+
+
+objects = Feed()
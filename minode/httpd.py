@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""HTTP endpoints of the node"""
+import http.server
+import json
+import logging
+import socketserver
+import urllib.parse
+
+from . import api, feed, metrics, proofofwork
+
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    """Serves the metrics on GET"""
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Handle GET request"""
+        if self.path not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        try:
+            body = metrics.export().encode()
+        except Exception:
+            logging.warning('Error while exporting metrics', exc_info=True)
+            self.send_error(500)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        logging.debug('Metrics request: ' + format, *args)
+
+
+class APIHandler(http.server.BaseHTTPRequestHandler):
+    """
+    The local API, JSON over HTTP/1.1 to reuse the connection:
+
+    - POST /objects {"objects": [hex]} - add the objects with the PoW done
+    - GET /objects/<vector> - the object
+    - GET /vectors?since=N&limit=M - the vectors of the objects after N
+    - GET /subscribe?since=N - a stream of the new objects,
+      a JSON line for each and an empty line when idle
+    - both filter the objects by type=T, version=V and tag=<hex prefix>
+    - both take the epoch=E returned with N, the objects are listed
+      from the start if the numbering has changed
+    - POST /pow {"objects": [hex], "priority": P} - queue the PoW
+    - GET /pow - the PoW jobs progress
+    - DELETE /pow/<id> - cancel the PoW job
+    """
+    protocol_version = 'HTTP/1.1'
+    # the headers and the body are sent separately
+    disable_nagle_algorithm = True
+    max_request = 2 ** 26
+
+    def send_json(self, value, code=200):
+        """Send the *value* encoded in JSON"""
+        body = json.dumps(value).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        """The decoded request body or None if the error is sent"""
+        try:
+            length = int(self.headers.get('Content-Length', ''))
+        except ValueError:
+            self.send_error(411)
+            return None
+        if length > self.max_request:
+            self.send_error(413)
+            self.close_connection = True
+            return None
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            self.send_error(400, 'Malformed JSON')
+            return None
+
+    def route(self):
+        """The path split by slashes and the query"""
+        url = urllib.parse.urlsplit(self.path)
+        query = {
+            key: values[-1] for key, values in
+            urllib.parse.parse_qs(url.query).items()}
+        return url.path.strip('/').split('/'), query
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Handle GET request"""
+        path, query = self.route()
+        try:
+            since = int(query.get('since', 0))
+            limit = int(query['limit']) if 'limit' in query else None
+            epoch = query.get('epoch')
+            flt = feed.Filter(
+                int(query['type']) if 'type' in query else None,
+                int(query['version']) if 'version' in query else None,
+                bytes.fromhex(query['tag']) if 'tag' in query else None)
+        except ValueError:
+            self.send_error(400, 'Malformed query')
+            return
+        if len(path) == 2 and path[0] == 'objects':
+            try:
+                obj = api.get(bytes.fromhex(path[1]))
+            except ValueError:
+                obj = None
+            if obj is None:
+                self.send_error(404)
+                return
+            self.send_json({
+                'vector': obj.vector.hex(), 'object': obj.to_bytes().hex()})
+        elif path == ['vectors']:
+            current, last = feed.objects.epoch, feed.objects.last
+            items = api.vectors(since, limit, flt, epoch)
+            self.send_json({
+                'vectors': [vector.hex() for _, vector in items],
+                'last': items[-1][0] if items else last,
+                'epoch': current})
+        elif path == ['subscribe']:
+            self.subscribe(since, flt, epoch)
+        elif path == ['pow']:
+            self.send_json({'jobs': proofofwork.jobs.status()})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Handle POST request"""
+        path = self.route()[0]
+        if path not in (['objects'], ['pow']):
+            self.send_error(404)
+            return
+        request = self.read_json()
+        if request is None:
+            return
+        try:
+            datas = request['objects']
+            priority = int(request.get('priority', 0))
+            if not isinstance(datas, list):
+                raise TypeError
+        except (KeyError, TypeError, ValueError, AttributeError):
+            self.send_error(400, 'Malformed request')
+            return
+        if not (
+            proofofwork.JobManager.min_priority <= priority
+            <= proofofwork.JobManager.max_priority
+        ):
+            self.send_error(400, 'Priority is out of range')
+            return
+        if path == ['objects']:
+            self.send_json({'results': api.submit(datas)})
+            return
+        try:
+            jobs = api.submit_pow(datas, priority)
+        except ValueError:
+            self.send_error(400, 'Malformed object')
+            return
+        self.send_json({'jobs': [job.id for job in jobs]})
+
+    def do_DELETE(self):  # pylint: disable=invalid-name
+        """Handle DELETE request"""
+        path = self.route()[0]
+        if len(path) == 2 and path[0] == 'pow' and (
+                proofofwork.jobs.cancel(path[1])):
+            self.send_response(204)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        else:
+            self.send_error(404)
+
+    def subscribe(self, since, flt, epoch):
+        """Stream the objects as JSON lines until the client disconnects"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        try:
+            current = feed.objects.epoch
+            for item in api.subscribe(since, flt=flt, epoch=epoch):
+                if item is None:
+                    # detects the closed connection
+                    self.wfile.write(b'\n')
+                else:
+                    seq, obj = item
+                    self.wfile.write(json.dumps({
+                        'seq': seq, 'epoch': current,
+                        'vector': obj.vector.hex(),
+                        'object': obj.to_bytes().hex()
+                    }).encode() + b'\n')
+                self.wfile.flush()
+        except OSError:
+            pass
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        logging.debug('API request: ' + format, *args)
+
+
+class Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """HTTP server handling requests in threads"""
+    daemon_threads = True
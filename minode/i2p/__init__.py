@@ -2,5 +2,6 @@
 from .controller import I2PController
 from .dialer import I2PDialer
 from .listener import I2PListener
+from .pool import SAMPool
 
-__all__ = ["I2PController", "I2PDialer", "I2PListener"]
+__all__ = ["I2PController", "I2PDialer", "I2PListener", "SAMPool"]
@@ -1,20 +1,29 @@
 # -*- coding: utf-8 -*-
 import base64
+import collections
 import logging
 import os
+import queue
 import socket
+import threading
 import time
 
 from .util import I2PThread, pub_from_priv
 
 
 class I2PController(I2PThread):
-    def __init__(self, state, host='127.0.0.1', port=7656, dest_priv=b''):
-        super().__init__(state, name='I2P Controller')
+    def __init__(
+        self, state, host='127.0.0.1', port=7656, dest_priv=b'',
+        name='I2P Controller'
+    ):
+        super().__init__(state, name=name)
 
         self.host = host
         self.port = port
         self.nick = b'MiNode_' + base64.b16encode(os.urandom(4)).lower()
+        # queues for the replies to the commands in flight, by reply verb
+        self.waiters = {}
+        self.lock = threading.Lock()
 
         while True:
             if state.shutting_down:
@@ -61,11 +70,22 @@ class I2PController(I2PThread):
                 self.dest_priv = par.replace(b'PRIV=', b'')
         assert self.dest_priv
 
+    def session_options(self):
+        """The tunnel options for the SESSION CREATE"""
+        options = {'length': self.state.i2p_tunnel_length}
+        if self.state.i2p_tunnel_quantity:
+            options['quantity'] = self.state.i2p_tunnel_quantity
+        if self.state.i2p_tunnel_backups:
+            options['backupQuantity'] = self.state.i2p_tunnel_backups
+        return b''.join(
+            ' {}.{}={}'.format(direction, key, value).encode()
+            for key, value in options.items()
+            for direction in ('inbound', 'outbound'))
+
     def create_session(self):
         self._send(
             b'SESSION CREATE STYLE=STREAM ID=' + self.nick
-            + b' inbound.length=' + str(self.state.i2p_tunnel_length).encode()
-            + b' outbound.length=' + str(self.state.i2p_tunnel_length).encode()
+            + self.session_options()
             + b' DESTINATION=' + self.dest_priv + b'\n')
         reply = self._receive_line().split()
         if b'RESULT=OK' not in reply:
@@ -75,17 +95,58 @@ class I2PController(I2PThread):
             time.sleep(5)
             self.create_session()
 
+    def command(self, command, verb, timeout=30):
+        """
+        Sends the command on the session socket, returns the reply
+        starting with the *verb* or None. Can be called from any thread
+        while the controller is running, the bridge replies in order.
+        """
+        waiter = queue.Queue(1)
+        with self.lock:
+            self.waiters.setdefault(verb, collections.deque()).append(waiter)
+            try:
+                self._send(command)
+            except OSError:
+                self.waiters[verb].remove(waiter)
+                return None
+        try:
+            return waiter.get(timeout=timeout)
+        except queue.Empty:
+            # the waiter stays in place to take the late reply
+            return None
+
+    def _dispatch(self, line):
+        msg = line.split(b' ')
+        if msg[0] == b'PING':
+            with self.lock:
+                self._send(b'PONG ' + b' '.join(msg[1:]) + b'\n')
+            return
+        verb = b' '.join(msg[:2])
+        with self.lock:
+            waiters = self.waiters.get(verb)
+            waiter = waiters.popleft() if waiters else None
+        if waiter:
+            waiter.put(line)
+        else:
+            logging.debug('Unexpected reply from SAM bridge: %s', line)
+
+    def _fail_waiters(self):
+        with self.lock:
+            for waiters in self.waiters.values():
+                while waiters:
+                    waiters.popleft().put(None)
+
     def run(self):
         self.s.settimeout(1)
-        while True:
-            if not self.state.shutting_down:
-                try:
-                    msg = self._receive_line().split(b' ')
-                    if msg[0] == b'PING':
-                        self._send(b'PONG ' + msg[1] + b'\n')
-                except socket.timeout:
-                    pass
-            else:
-                logging.debug('Shutting down I2P Controller')
-                self.s.close()
+        while not self.state.shutting_down:
+            try:
+                self._dispatch(self._receive_line())
+            except socket.timeout:
+                pass
+            except OSError as e:
+                if not self.state.shutting_down:
+                    logging.warning('Lost the I2P SAM session: %s', e)
                 break
+        logging.debug('Shutting down I2P Controller')
+        self._fail_waiters()
+        self.s.close()
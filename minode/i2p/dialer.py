@@ -18,28 +18,45 @@ class I2PDialer(I2PThread):
 
         super().__init__(state, name='I2P Dial to {}'.format(self.destination))
 
-        self.s = socket.create_connection((self.sam_host, self.sam_port))
-
         self.version_reply = []
         self.success = True
 
     def run(self):
         logging.debug('Connecting to %s', self.destination)
-        self._connect()
+        try:
+            self._connect()
+        except OSError as e:
+            logging.debug(
+                'Error while connecting to %s: %s', self.destination, e)
+            self.success = False
         if not self.state.shutting_down and self.success:
             c = self.state.connection(
                 self.destination, 'i2p', self.s, 'i2p',
                 False, self.destination)
+            c.buffer_receive = self._received_data()
+            c.i2p_session = self.nick.decode()
             c.start()
             self.state.connections.add(c)
+        elif self.s:
+            self.s.close()
 
     def _connect(self):
-        self._send(b'HELLO VERSION MIN=3.0 MAX=3.3\n')
-        self.version_reply = self._receive_line().split()
-        if b'RESULT=OK' not in self.version_reply:
-            logging.debug('Error while connecting to %s', self.destination)
-            self.success = False
+        pool = getattr(self.state, 'i2p_sam_pool', None)
+        if pool:
+            self.s, self.version_reply = pool.get()
+        else:
+            self.s = socket.create_connection(
+                (self.sam_host, self.sam_port), self.state.i2p_dial_timeout)
+            self._send(b'HELLO VERSION MIN=3.0 MAX=3.3\n')
+            self.version_reply = self._receive_line().split()
+            if b'RESULT=OK' not in self.version_reply:
+                logging.debug(
+                    'Error while connecting to %s', self.destination)
+                self.success = False
+                return
 
+        # the stream may take long to build through the tunnels
+        self.s.settimeout(self.state.i2p_dial_timeout)
         self._send(
             b'STREAM CONNECT ID=' + self.nick + b' DESTINATION='
             + self.destination + b'\n')
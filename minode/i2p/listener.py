@@ -18,17 +18,35 @@ class I2PListener(I2PThread):
         self.new_socket()
 
     def new_socket(self):
-        self.s = socket.create_connection((self.host, self.port))
-        self._send(b'HELLO VERSION MIN=3.0 MAX=3.3\n')
-        self.version_reply = self._receive_line().split()
-        assert b'RESULT=OK' in self.version_reply
+        pool = getattr(self.state, 'i2p_sam_pool', None)
+        if pool:
+            self.s, self.version_reply = pool.get()
+        else:
+            self.s = socket.create_connection((self.host, self.port))
+            self._send(b'HELLO VERSION MIN=3.0 MAX=3.3\n')
+            self.version_reply = self._receive_line().split()
+            assert b'RESULT=OK' in self.version_reply
 
         self._send(b'STREAM ACCEPT ID=' + self.nick + b'\n')
         reply = self._receive_line().split(b' ')
-        assert b'RESULT=OK' in reply
+        if b'RESULT=OK' not in reply:
+            self.s.close()
+            raise ConnectionError(
+                'SAM bridge replied {}'.format(b' '.join(reply)))
 
         self.s.settimeout(1)
 
+    def _renew_socket(self):
+        """Accept the next stream, retrying while the bridge fails"""
+        while not self.state.shutting_down:
+            try:
+                self.new_socket()
+                return
+            except (AssertionError, OSError) as e:
+                logging.warning(
+                    'Error while accepting I2P streams: %s, retrying', e)
+                self.state.shutdown_event.wait(5)
+
     def run(self):
         while not self.state.shutting_down:
             try:
@@ -47,10 +65,19 @@ class I2PListener(I2PThread):
                 else:
                     c = self.state.connection(
                         destination, 'i2p', self.s, 'i2p', True, destination)
+                    c.buffer_receive = self._received_data()
+                    c.i2p_session = self.nick.decode()
                     c.start()
                     self.state.connections.add(c)
                     c = None
-                self.new_socket()
+                self._renew_socket()
             except socket.timeout:
                 pass
+            except OSError as e:
+                if self.state.shutting_down:
+                    break
+                logging.debug('I2P accept stream failed: %s', e)
+                self.s.close()
+                self._renew_socket()
         logging.debug('Shutting down I2P Listener')
+        self.s.close()
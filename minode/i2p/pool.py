@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import logging
+import queue
+import socket
+import threading
+import time
+
+from .util import receive_line
+
+
+class SAMPool():
+    """
+    Sockets connected to the SAM bridge with the HELLO done,
+    ready for STREAM CONNECT or STREAM ACCEPT. The pool is refilled
+    in background threads, the sockets idle for *max_idle* seconds
+    are replaced.
+    """
+    def __init__(
+        self, host='127.0.0.1', port=7656, size=2, timeout=30, max_idle=60
+    ):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.sockets = queue.Queue()
+        self.filling = 0
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def new_socket(self):
+        """Connect and say HELLO, returns the socket and the reply"""
+        s = socket.create_connection((self.host, self.port), self.timeout)
+        try:
+            s.sendall(b'HELLO VERSION MIN=3.0 MAX=3.3\n')
+            reply = receive_line(s).split()
+        except Exception:
+            s.close()
+            raise
+        if b'RESULT=OK' not in reply:
+            s.close()
+            raise ConnectionError(
+                'SAM bridge replied {}'.format(b' '.join(reply)))
+        return s, reply
+
+    def get(self):
+        """A ready socket with the HELLO reply, a new one if none is ready"""
+        while True:
+            try:
+                s, reply, created = self.sockets.get_nowait()
+            except queue.Empty:
+                s, reply = self.new_socket()
+                break
+            if time.monotonic() - created < self.max_idle:
+                break
+            s.close()
+        self.fill()
+        return s, reply
+
+    def fill(self):
+        """Start refilling the pool up to its size"""
+        with self.lock:
+            if self.closed:
+                return
+            n = self.size - self.sockets.qsize() - self.filling
+            if n <= 0:
+                return
+            self.filling += n
+        for _ in range(n):
+            threading.Thread(
+                target=self._add, name='I2P SAM Pool', daemon=True).start()
+
+    def _add(self):
+        try:
+            s, reply = self.new_socket()
+        except Exception as e:
+            logging.debug('Error while connecting to SAM bridge: %s', e)
+        else:
+            self.sockets.put((s, reply, time.monotonic()))
+            if self.closed:
+                self.close()
+        finally:
+            with self.lock:
+                self.filling -= 1
+
+    def close(self):
+        """Close the ready sockets and stop refilling"""
+        self.closed = True
+        while True:
+            try:
+                self.sockets.get_nowait()[0].close()
+            except queue.Empty:
+                return
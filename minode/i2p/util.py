@@ -4,15 +4,41 @@ import hashlib
 import threading
 
 
+class LineReader():
+    """
+    Reads the SAM protocol lines from a socket. The data received
+    after the line is kept in the buffer: on a stream socket it's the
+    beginning of the traffic, see rest().
+    """
+    def __init__(self, s):
+        self.s = s
+        self.buffer = bytearray()
+
+    def readline(self):
+        """The next line without the newline"""
+        start = 0
+        while True:
+            i = self.buffer.find(b'\n', start)
+            if i >= 0:
+                line = bytes(self.buffer[:i])
+                del self.buffer[:i + 1]
+                return line.rstrip(b'\r')
+            start = len(self.buffer)
+            d = self.s.recv(4096)
+            if not d:
+                raise ConnectionResetError
+            self.buffer += d
+
+    def rest(self):
+        """Takes the data received after the last line"""
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
 def receive_line(s):
-    data = b''
-    while b'\n' not in data:
-        d = s.recv(4096)
-        if not d:
-            raise ConnectionResetError
-        data += d
-    data = data.splitlines()
-    return data[0]
+    """A single line from a socket which sends nothing after it"""
+    return LineReader(s).readline()
 
 
 class I2PThread(threading.Thread):
@@ -24,9 +50,12 @@ class I2PThread(threading.Thread):
         super().__init__(name=name)
         self.state = state
         self.s = None
+        self.reader = None
 
     def _receive_line(self):
-        line = receive_line(self.s)
+        if self.reader is None or self.reader.s is not self.s:
+            self.reader = LineReader(self.s)
+        line = self.reader.readline()
         # logging.debug('I2PListener <- %s', line)
         return line
 
@@ -34,6 +63,10 @@ class I2PThread(threading.Thread):
         # logging.debug('I2PListener -> %s', command)
         self.s.sendall(command)
 
+    def _received_data(self):
+        """The stream data received along with the SAM replies"""
+        return self.reader.rest() if self.reader else b''
+
 
 def pub_from_priv(priv):
     priv = base64.b64decode(priv, altchars=b'-~')
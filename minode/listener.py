@@ -1,42 +1,109 @@
 # -*- coding: utf-8 -*-
 """Listener thread creates connection objects for incoming connections"""
+import ipaddress
 import logging
 import socket
 import threading
 
-from . import shared
+from . import shared, structure
 from .connection import Connection
 
 
+def _normalize(host):
+    """IPv4 address for the IPv4-mapped IPv6 one from a dual-stack socket"""
+    if host.startswith('::ffff:') and '.' in host:
+        return host[7:]
+    return host
+
+
+def _is_loopback(host):
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
 class Listener(threading.Thread):
-    """The listener thread"""
-    def __init__(self, host, port, family=socket.AF_INET):
+    """
+    The listener thread. An IPv6 socket bound to any address is dual-stack,
+    *reuse_port* allows several listeners on the same port
+    """
+    def __init__(
+        self, host, port, family=socket.AF_INET, reuse_port=False,
+        backlog=None
+    ):
         super().__init__(name='Listener')
         self.host = host
         self.port = port
         self.family = family
+        self.closed = False
         self.s = socket.socket(self.family, socket.SOCK_STREAM)
-        self.s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.s.bind((self.host, self.port))
-        self.s.listen(1)
+        try:
+            self.s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if reuse_port:
+                self.s.setsockopt(
+                    socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            if family == socket.AF_INET6 and host in ('', '::'):
+                self.s.setsockopt(
+                    socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 0)
+            self.s.bind((self.host, self.port))
+            self.s.listen(backlog or shared.listen_backlog)
+        except Exception:
+            self.s.close()
+            raise
         self.s.settimeout(1)
 
+    def close(self):
+        """Stop accepting, wakes up the thread blocked in accept()"""
+        self.closed = True
+        try:
+            self.s.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.s.close()
+
+    @staticmethod
+    def reject(host):
+        """The reason to refuse the incoming connection or None"""
+        if len(shared.connections) > shared.connection_limit:
+            return 'connection limit reached'
+        if _is_loopback(host):
+            return None
+        group = structure.NetAddrNoPrefix.network_group(host)
+        for c in shared.connections.copy():
+            if (
+                c.network == 'ip' and c.status != 'disconnected'
+                and structure.NetAddrNoPrefix.network_group(c.host) == group
+            ):
+                return 'already connected to the network group'
+        return None
+
     def run(self):
         while True:
-            if shared.shutting_down:
+            if shared.shutting_down or self.closed:
                 logging.debug('Shutting down Listener')
                 break
             try:
                 conn, addr = self.s.accept()
             except socket.timeout:
                 continue
+            except OSError:
+                if shared.shutting_down or self.closed:
+                    continue
+                raise
+
+            host, port = _normalize(addr[0]), addr[1]
+            reason = self.reject(host)
+            if reason:
+                logging.debug(
+                    'Rejecting incoming connection from %s:%i: %s',
+                    host, port, reason)
+                conn.close()
+                continue
 
-            logging.info('Incoming connection from: %s:%i', *addr[:2])
+            logging.info('Incoming connection from: %s:%i', host, port)
+            c = Connection(host, port, conn, server=True)
+            c.start()
             with shared.connections_lock:
-                if len(shared.connections) > shared.connection_limit:
-                    conn.close()
-                else:
-                    c = Connection(*addr[:2], conn, server=True)
-                    c.start()
-                    shared.connections.add(c)
-                    c = None
+                shared.connections.add(c)
+            c = None
@@ -2,13 +2,16 @@
 """Functions for starting the program"""
 import argparse
 import base64
+import csv
+import io
 import logging
-import multiprocessing
 import os
 import signal
 import socket
+import threading
+import time
 
-from . import i2p, shared
+from . import bandwidth, metrics, profiler, shared, storage
 from .advertiser import Advertiser
 from .manager import Manager
 from .listener import Listener
@@ -18,6 +21,42 @@ def handler(s, f):  # pylint: disable=unused-argument
     """Signal handler"""
     logging.info('Gracefully shutting down MiNode')
     shared.shutting_down = True
+    shared.shutdown_event.set()
+    shared.advertise_event.set()
+
+
+def shutdown():
+    """
+    Wake up the threads, close the listening sockets and wait
+    for the threads to finish, exits forcibly after the timeout
+    """
+    shared.shutting_down = True
+    shared.shutdown_event.set()
+    shared.advertise_event.set()
+    for thread in threading.enumerate():
+        if isinstance(thread, Listener):
+            thread.close()
+    if shared.i2p_sam_pool:
+        shared.i2p_sam_pool.close()
+
+    deadline = time.monotonic() + shared.shutdown_timeout
+    for thread in threading.enumerate():
+        if thread is threading.current_thread() or thread.daemon:
+            continue
+        # the threads are finishing simultaneously, so wait for each
+        # until the common deadline
+        thread.join(max(deadline - time.monotonic(), 0))
+    alive = [
+        thread.name for thread in threading.enumerate()
+        if thread.is_alive() and not thread.daemon
+        and thread is not threading.current_thread()]
+    if alive:
+        logging.warning(
+            'Threads not finished in %ss: %s, exiting',
+            shared.shutdown_timeout, ', '.join(alive))
+        logging.shutdown()
+        os._exit(1)  # pylint: disable=protected-access
+    logging.info('Shut down')
 
 
 def parse_arguments():  # pylint: disable=too-many-branches,too-many-statements
@@ -31,6 +70,12 @@ def parse_arguments():  # pylint: disable=too-many-branches,too-many-statements
     parser.add_argument(
         '--no-incoming', action='store_true',
         help='Do not listen for incoming connections')
+    parser.add_argument(
+        '--listen-backlog', type=int,
+        help='Length of the queue of incoming connections')
+    parser.add_argument(
+        '--listen-sockets', type=int,
+        help='Number of listening sockets sharing the port (SO_REUSEPORT)')
     parser.add_argument(
         '--no-outgoing', action='store_true',
         help='Do not send outgoing connections')
@@ -40,10 +85,27 @@ def parse_arguments():  # pylint: disable=too-many-branches,too-many-statements
         '--trusted-peer', help='Specify a trusted peer we should connect to')
     parser.add_argument(
         '--connection-limit', type=int, help='Maximum number of connections')
+    parser.add_argument(
+        '--pow-backend', choices=('auto', 'python', 'native'),
+        help='Proof of work implementation, by default the fastest one')
+    parser.add_argument(
+        '--pow-workers', type=int,
+        help='Number of simultaneous proof of work jobs,'
+        ' by default the number of cores')
     parser.add_argument(
         '--i2p', action='store_true', help='Enable I2P support (uses SAMv3)')
     parser.add_argument(
         '--i2p-tunnel-length', type=int, help='Length of I2P tunnels')
+    parser.add_argument(
+        '--i2p-tunnel-quantity', type=int,
+        help='Number of I2P tunnels in each direction')
+    parser.add_argument(
+        '--i2p-tunnel-backups', type=int,
+        help='Number of backup I2P tunnels in each direction')
+    parser.add_argument(
+        '--i2p-dial-session', action='store_true',
+        help='Use a separate I2P session with a transient destination'
+        ' for the outgoing connections')
     parser.add_argument(
         '--i2p-sam-host', help='Host of I2P SAMv3 bridge')
     parser.add_argument(
@@ -51,6 +113,51 @@ def parse_arguments():  # pylint: disable=too-many-branches,too-many-statements
     parser.add_argument(
         '--i2p-transient', action='store_true',
         help='Generate new I2P destination on start')
+    parser.add_argument(
+        '--i2p-accept-streams', type=int,
+        help='Number of I2P streams accepted in parallel')
+    parser.add_argument(
+        '--upload-limit', type=int,
+        help='Total upload rate limit in KiB/s')
+    parser.add_argument(
+        '--download-limit', type=int,
+        help='Total download rate limit in KiB/s')
+    parser.add_argument(
+        '--connection-upload-limit', type=int,
+        help='Upload rate limit for each connection in KiB/s')
+    parser.add_argument(
+        '--connection-download-limit', type=int,
+        help='Download rate limit for each connection in KiB/s')
+    parser.add_argument(
+        '--metrics-port', type=int,
+        help='Serve metrics in Prometheus format on this port')
+    parser.add_argument(
+        '--metrics-host', help='Host of the metrics endpoint')
+    parser.add_argument(
+        '--api-port', type=int,
+        help='Serve the local objects API over HTTP on this port')
+    parser.add_argument('--api-host', help='Host of the local API')
+    parser.add_argument(
+        '--advertise-window', type=float,
+        help='Milliseconds to collect new objects and addresses'
+        ' before advertising them')
+    parser.add_argument(
+        '--timing', action='store_true',
+        help='Collect latency histograms of message processing'
+        ' for the metrics endpoint')
+    parser.add_argument(
+        '--dns-timeout', type=int,
+        help='Seconds to wait for the DNS bootstrap')
+    parser.add_argument(
+        '--shutdown-timeout', type=int,
+        help='Seconds to wait for the threads to finish on shutdown')
+    parser.add_argument(
+        '--profile', action='store_true',
+        help='Run the sampling profiler from the start,'
+        ' SIGUSR1 switches it on and off')
+    parser.add_argument(
+        '--profile-interval', type=float,
+        help='Sampling interval of the profiler in milliseconds')
 
     args = parser.parse_args()
     if args.port:
@@ -66,6 +173,10 @@ def parse_arguments():  # pylint: disable=too-many-branches,too-many-statements
         shared.data_directory = dir_path
     if args.no_incoming:
         shared.listen_for_connections = False
+    if args.listen_backlog:
+        shared.listen_backlog = args.listen_backlog
+    if args.listen_sockets:
+        shared.listen_sockets = args.listen_sockets
     if args.no_outgoing:
         shared.send_outgoing_connections = False
     if args.no_ip:
@@ -88,50 +199,166 @@ def parse_arguments():  # pylint: disable=too-many-branches,too-many-statements
                 shared.trusted_peer = (addr[0], int(addr[1]))
     if args.connection_limit:
         shared.connection_limit = args.connection_limit
+    if args.pow_backend:
+        shared.pow_backend = args.pow_backend
+    if args.pow_workers:
+        shared.pow_workers = args.pow_workers
     if args.i2p:
         shared.i2p_enabled = True
     if args.i2p_tunnel_length:
         shared.i2p_tunnel_length = args.i2p_tunnel_length
+    if args.i2p_tunnel_quantity:
+        shared.i2p_tunnel_quantity = args.i2p_tunnel_quantity
+    if args.i2p_tunnel_backups:
+        shared.i2p_tunnel_backups = args.i2p_tunnel_backups
+    if args.i2p_dial_session:
+        shared.i2p_dial_session = True
     if args.i2p_sam_host:
         shared.i2p_sam_host = args.i2p_sam_host
     if args.i2p_sam_port:
         shared.i2p_sam_port = args.i2p_sam_port
     if args.i2p_transient:
         shared.i2p_transient = True
-
-
-def bootstrap_from_dns():
-    """Addes addresses of bootstrap servers to core nodes"""
+    if args.i2p_accept_streams:
+        shared.i2p_accept_streams = args.i2p_accept_streams
+    if args.upload_limit:
+        shared.upload_limit = args.upload_limit * 1024
+    if args.download_limit:
+        shared.download_limit = args.download_limit * 1024
+    if args.connection_upload_limit:
+        shared.connection_upload_limit = args.connection_upload_limit * 1024
+    if args.connection_download_limit:
+        shared.connection_download_limit = \
+            args.connection_download_limit * 1024
+    if args.metrics_port:
+        shared.metrics_port = args.metrics_port
+    if args.metrics_host:
+        shared.metrics_host = args.metrics_host
+    if args.api_port:
+        shared.api_port = args.api_port
+    if args.api_host:
+        shared.api_host = args.api_host
+    if args.advertise_window is not None:
+        shared.advertise_window = args.advertise_window / 1000
+    if args.timing:
+        shared.timing = True
+    if args.dns_timeout is not None:
+        shared.dns_timeout = args.dns_timeout
+    if args.shutdown_timeout is not None:
+        shared.shutdown_timeout = args.shutdown_timeout
+    if args.profile:
+        shared.profile = True
+    if args.profile_interval:
+        shared.profile_interval = args.profile_interval / 1000
+
+
+def _resolve(port, nodes):
+    """Resolve the bootstrap server for the *port* into *nodes*"""
     try:
-        for port in (8080, 8444):
-            for item in socket.getaddrinfo(
-                'bootstrap{}.bitmessage.org'.format(port), 80,
-                proto=socket.IPPROTO_TCP
-            ):
-                try:
-                    addr = item[4][0]
-                    socket.inet_pton(item[0], addr)
-                except (TypeError, socket.error):
-                    continue
-                else:
-                    shared.core_nodes.add((addr, port))
+        for item in socket.getaddrinfo(
+            'bootstrap{}.bitmessage.org'.format(port), 80,
+            proto=socket.IPPROTO_TCP
+        ):
+            try:
+                addr = item[4][0]
+                socket.inet_pton(item[0], addr)
+            except (TypeError, socket.error):
+                continue
+            else:
+                nodes.add((addr, port))
     except socket.gaierror:
         logging.info('Failed to do a DNS query')
     except Exception:
         logging.info('Error during DNS bootstrap', exc_info=True)
 
 
+def _load_dns_cache():
+    """Nodes resolved before and the age of the cache in seconds"""
+    path = os.path.join(shared.data_directory, 'dns_cache.csv')
+    try:
+        with open(path, 'r', newline='', encoding='ascii') as src:
+            nodes = {(row[0], int(row[1])) for row in csv.reader(src)}
+        return nodes, time.time() - os.path.getmtime(path)
+    except FileNotFoundError:
+        pass
+    except Exception:
+        logging.info('Error while loading the DNS cache', exc_info=True)
+    return set(), None
+
+
+def _save_dns_cache(nodes):
+    data = io.StringIO(newline='')
+    csv.writer(data).writerows(sorted(nodes))
+    try:
+        storage.atomic_write(
+            os.path.join(shared.data_directory, 'dns_cache.csv'),
+            data.getvalue().encode('ascii'))
+    except Exception:
+        logging.info('Error while saving the DNS cache', exc_info=True)
+
+
+def bootstrap_from_dns():
+    """
+    Addes addresses of bootstrap servers to core nodes, resolving them
+    in parallel, unless they are cached not longer than dns_cache_ttl ago,
+    and passes them to the Manager to bootstrap from
+    """
+    nodes, age = _load_dns_cache()
+    if nodes and age < shared.dns_cache_ttl:
+        logging.debug('Using %s cached bootstrap nodes', len(nodes))
+        shared.core_nodes.update(nodes)
+        shared.bootstrap_nodes_queue.put(nodes)
+        return
+
+    resolved = set()
+    threads = [
+        threading.Thread(
+            target=_resolve, args=(port, resolved),
+            name='DNS Resolver', daemon=True)
+        for port in (8080, 8444)]
+    deadline = time.monotonic() + shared.dns_timeout
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        # resolvers can't be interrupted, so they are left behind
+        thread.join(max(deadline - time.monotonic(), 0))
+    if any(thread.is_alive() for thread in threads):
+        logging.info(
+            'DNS bootstrap not finished in %ss', shared.dns_timeout)
+    resolved = resolved.copy()
+
+    if resolved:
+        _save_dns_cache(resolved)
+        nodes = resolved
+    elif nodes:
+        logging.info('Using %s expired cached bootstrap nodes', len(nodes))
+    shared.core_nodes.update(nodes)
+    if nodes:
+        shared.bootstrap_nodes_queue.put(nodes)
+
+
+def start_listeners(family):
+    """
+    Starts listen_sockets `.listener.Listener` threads
+    sharing the port by SO_REUSEPORT where supported
+    """
+    reuse_port = (
+        shared.listen_sockets > 1 and hasattr(socket, 'SO_REUSEPORT'))
+    for _ in range(shared.listen_sockets if reuse_port else 1):
+        listener = Listener(
+            shared.listening_host, shared.listening_port,
+            family=family, reuse_port=reuse_port)
+        listener.start()
+
+
 def start_ip_listener():
     """Starts `.listener.Listener`"""
-    listener_ipv4 = None
-    listener_ipv6 = None
+    listener_ipv6 = False
 
     if socket.has_ipv6:
         try:
-            listener_ipv6 = Listener(
-                shared.listening_host,
-                shared.listening_port, family=socket.AF_INET6)
-            listener_ipv6.start()
+            start_listeners(socket.AF_INET6)
+            listener_ipv6 = True
         except socket.gaierror as e:
             if e.errno == -9:
                 logging.info('IPv6 is not supported.')
@@ -140,9 +367,11 @@ def start_ip_listener():
                 'Error while starting IPv6 listener on port %s',
                 shared.listening_port, exc_info=True)
 
+    if listener_ipv6 and shared.listening_host in ('', '::'):
+        return  # the dual-stack socket accepts IPv4 connections too
+
     try:
-        listener_ipv4 = Listener(shared.listening_host, shared.listening_port)
-        listener_ipv4.start()
+        start_listeners(socket.AF_INET)
     except OSError as e:
         if listener_ipv6:
             logging.info(
@@ -158,8 +387,43 @@ def start_ip_listener():
                 shared.listening_port, exc_info=True)
 
 
+def start_metrics_listener():
+    """Starts `.metrics.MetricsListener`"""
+    try:
+        listener = metrics.MetricsListener(
+            shared.metrics_host, shared.metrics_port)
+        listener.start()
+    except OSError:
+        logging.warning(
+            'Error while starting metrics endpoint on %s:%s',
+            shared.metrics_host, shared.metrics_port, exc_info=True)
+    else:
+        logging.info(
+            'Serving metrics on http://%s:%s/metrics',
+            shared.metrics_host, shared.metrics_port)
+
+
+def start_api_listener():
+    """Starts `.api.APIListener`"""
+    from . import api  # pylint: disable=import-outside-toplevel
+
+    try:
+        listener = api.APIListener(shared.api_host, shared.api_port)
+        listener.start()
+    except OSError:
+        logging.warning(
+            'Error while starting the API on %s:%s',
+            shared.api_host, shared.api_port, exc_info=True)
+    else:
+        logging.info(
+            'Serving the API on http://%s:%s/',
+            shared.api_host, shared.api_port)
+
+
 def start_i2p_listener():
     """Starts I2P threads"""
+    from . import i2p  # pylint: disable=import-outside-toplevel
+
     # Grab I2P destinations from old object file
     for obj in shared.objects.values():
         if obj.object_type == shared.i2p_dest_obj_type:
@@ -190,13 +454,39 @@ def start_i2p_listener():
 
     shared.i2p_dest_pub = i2p_controller.dest_pub
     shared.i2p_session_nick = i2p_controller.nick
+    shared.i2p_dial_session_nick = i2p_controller.nick
+
+    if shared.i2p_dial_session:
+        # the outgoing streams don't share the tunnels
+        # with the incoming ones
+        dial_controller = i2p.I2PController(
+            shared, shared.i2p_sam_host, shared.i2p_sam_port,
+            name='I2P Dial Controller')
+        dial_controller.start()
+        shared.i2p_dial_session_nick = dial_controller.nick
+        logging.info(
+            'I2P dial session nick: %s', dial_controller.nick.decode())
 
     logging.info('Local I2P destination: %s', shared.i2p_dest_pub.decode())
     logging.info('I2P session nick: %s', shared.i2p_session_nick.decode())
 
-    logging.info('Starting I2P Listener')
-    i2p_listener = i2p.I2PListener(shared, i2p_controller.nick)
-    i2p_listener.start()
+    shared.i2p_sam_pool = i2p.SAMPool(
+        shared.i2p_sam_host, shared.i2p_sam_port, shared.i2p_sam_pool_size)
+    shared.i2p_sam_pool.fill()
+
+    accept_streams = shared.i2p_accept_streams
+    if (
+        b'VERSION=3.0' in i2p_controller.version_reply
+        or b'VERSION=3.1' in i2p_controller.version_reply
+    ):
+        # concurrent STREAM ACCEPT appeared in SAM 3.2
+        accept_streams = 1
+
+    logging.info('Starting %i I2P Listeners', accept_streams)
+    for _ in range(accept_streams):
+        i2p.I2PListener(
+            shared, i2p_controller.nick,
+            shared.i2p_sam_host, shared.i2p_sam_port).start()
 
     if not shared.i2p_transient:
         try:
@@ -225,8 +515,11 @@ def main():
     """Script entry point"""
     signal.signal(signal.SIGINT, handler)
     signal.signal(signal.SIGTERM, handler)
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, profiler.toggle)
 
     parse_arguments()
+    bandwidth.configure()
 
     logging.basicConfig(
         level=shared.log_level,
@@ -242,15 +535,30 @@ def main():
                 'Error while creating data directory in: %s',
                 shared.data_directory, exc_info=True)
 
+    if shared.profile:
+        profiler.start()
+
+    if shared.metrics_port:
+        start_metrics_listener()
+
+    manager = Manager()
+    # before anything can add objects, those would miss the log
+    manager.load_data()
+
+    if shared.api_port:
+        start_api_listener()
+
     if shared.ip_enabled and not shared.trusted_peer:
-        bootstrap_from_dns()
+        # start with the known nodes while resolving
+        threading.Thread(
+            target=bootstrap_from_dns, name='DNS Bootstrap', daemon=True
+        ).start()
 
     if shared.i2p_enabled:
         # We are starting it before cleaning expired objects
         # so we can collect I2P destination objects
         start_i2p_listener()
 
-    manager = Manager()
     manager.start()
 
     advertiser = Advertiser()
@@ -259,7 +567,14 @@ def main():
     if shared.listen_for_connections:
         start_ip_listener()
 
+    # the signal handler interrupts the wait
+    while not shared.shutdown_event.wait(1):
+        if shared.shutting_down:
+            break
+    shutdown()
+
 
 if __name__ == '__main__':
+    import multiprocessing
     multiprocessing.set_start_method('spawn')
     main()
@@ -4,15 +4,13 @@ import base64
 import csv
 import logging
 import os
-import pickle
 import queue
 import random
 import threading
 import time
 
-from . import proofofwork, shared, structure
+from . import feed, nodedb, proofofwork, shared, storage, structure
 from .connection import Bootstrapper, Connection
-from .i2p import I2PDialer
 
 
 class Manager(threading.Thread):
@@ -23,8 +21,8 @@ class Manager(threading.Thread):
         self.bootstrap_pool = []
         self.last_cleaned_objects = time.time()
         self.last_cleaned_connections = time.time()
-        self.last_pickled_objects = time.time()
-        self.last_pickled_nodes = time.time()
+        self.last_saved_objects = time.time()
+        self.last_saved_nodes = time.time()
         # Publish destination 5-15 minutes after start
         self.last_published_i2p_destination = \
             time.time() - 50 * 60 + random.uniform(-1, 1) * 300  # nosec B311
@@ -34,28 +32,49 @@ class Manager(threading.Thread):
         self.bootstrap_pool = list(shared.core_nodes.union(shared.node_pool))
         random.shuffle(self.bootstrap_pool)
 
+    def add_bootstrap_nodes(self):
+        """
+        Add the nodes resolved by the DNS bootstrap in the background
+        to the node pool and to the end of the bootstrap pool to try first
+        """
+        while True:
+            try:
+                nodes = shared.bootstrap_nodes_queue.get_nowait()
+            except queue.Empty:
+                return
+            shared.node_pool.update(nodes)
+            new = list(nodes.difference(self.bootstrap_pool))
+            random.shuffle(new)
+            self.bootstrap_pool.extend(new)
+
     def run(self):
-        self.load_data()
+        # the data is loaded by the main thread before starting
         self.clean_objects()
         self.fill_bootstrap_pool()
         while True:
-            time.sleep(0.8)
+            shared.shutdown_event.wait(0.8)
             now = time.time()
             if shared.shutting_down:
                 logging.debug('Shutting down Manager')
+                self.save_objects()
+                self.save_nodes()
+                proofofwork.jobs.stop()
                 break
+            self.add_bootstrap_nodes()
             if now - self.last_cleaned_objects > 90:
                 self.clean_objects()
                 self.last_cleaned_objects = now
             if now - self.last_cleaned_connections > 2:
                 self.manage_connections()
                 self.last_cleaned_connections = now
-            if now - self.last_pickled_objects > 100:
-                self.pickle_objects()
-                self.last_pickled_objects = now
-            if now - self.last_pickled_nodes > 60:
-                self.pickle_nodes()
-                self.last_pickled_nodes = now
+            if now - self.last_saved_objects > 100:
+                self.save_objects()
+                self.last_saved_objects = now
+            else:
+                self.sync_objects()
+            if now - self.last_saved_nodes > 60:
+                self.save_nodes()
+                self.last_saved_nodes = now
             if now - self.last_published_i2p_destination > 3600:
                 self.publish_i2p_destination()
                 self.last_published_i2p_destination = now
@@ -70,6 +89,7 @@ class Manager(threading.Thread):
                     base64.b16encode(vector).decode())
                 with shared.objects_lock:
                     del shared.objects[vector]
+        feed.objects.prune()
 
     def manage_connections(self):
         """Open new connections if needed, remove closed ones"""
@@ -102,6 +122,7 @@ class Manager(threading.Thread):
             if not c.is_alive() or c.status == 'disconnected':
                 with shared.connections_lock:
                     shared.connections.remove(c)
+                    shared.established_connections.discard(c)
             else:
                 hosts.add(structure.NetAddrNoPrefix.network_group(c.host))
                 if not c.server:
@@ -154,11 +175,12 @@ class Manager(threading.Thread):
             if group in hosts:
                 continue
             if port == 'i2p' and shared.i2p_enabled:
+                from . import i2p  # pylint: disable=import-outside-toplevel
                 if shared.i2p_session_nick and host != shared.i2p_dest_pub:
                     try:
-                        d = I2PDialer(
+                        d = i2p.I2PDialer(
                             shared,
-                            host, shared.i2p_session_nick,
+                            host, shared.i2p_dial_session_nick,
                             shared.i2p_sam_host, shared.i2p_sam_port)
                         d.start()
                         hosts.add(d.destination)
@@ -177,45 +199,19 @@ class Manager(threading.Thread):
     @staticmethod
     def load_data():
         """Loads initial nodes and data, stored in files between sessions"""
-        try:
-            with open(
-                os.path.join(shared.data_directory, 'objects.pickle'), 'br'
-            ) as src:
-                shared.objects = pickle.load(src)
-        except FileNotFoundError:
-            pass  # first start
-        except Exception:
-            logging.warning(
-                'Error while loading objects from disk.', exc_info=True)
+        storage.load_objects()
+        proofofwork.jobs.load()
 
-        try:
-            with open(
-                os.path.join(shared.data_directory, 'nodes.pickle'), 'br'
-            ) as src:
-                shared.node_pool = pickle.load(src)
-        except FileNotFoundError:
-            pass
-        except Exception:
-            logging.warning(
-                'Error while loading nodes from disk.', exc_info=True)
-
-        try:
-            with open(
-                os.path.join(shared.data_directory, 'i2p_nodes.pickle'), 'br'
-            ) as src:
-                shared.i2p_node_pool = pickle.load(src)
-        except FileNotFoundError:
-            pass
-        except Exception:
-            logging.warning(
-                'Error while loading nodes from disk.', exc_info=True)
+        shared.node_pool = nodedb.nodes.load()
+        shared.i2p_node_pool = nodedb.i2p_nodes.load()
 
         with open(
             os.path.join(shared.source_directory, 'core_nodes.csv'),
             'r', newline='', encoding='ascii'
         ) as src:
             reader = csv.reader(src)
-            shared.core_nodes = {(row[0], int(row[1])) for row in reader}
+            # may be already updated by the DNS bootstrap
+            shared.core_nodes.update((row[0], int(row[1])) for row in reader)
             shared.node_pool.update(shared.core_nodes)
 
         with open(
@@ -228,25 +224,29 @@ class Manager(threading.Thread):
             shared.i2p_node_pool.update(shared.i2p_core_nodes)
 
     @staticmethod
-    def pickle_objects():
+    def save_objects():
         try:
-            with open(
-                os.path.join(shared.data_directory, 'objects.pickle'), 'bw'
-            ) as dst:
-                with shared.objects_lock:
-                    pickle.dump(shared.objects, dst, protocol=3)
-                logging.debug('Saved objects')
+            storage.save_objects()
+            logging.debug('Saved objects')
         except Exception:
             logging.warning('Error while saving objects', exc_info=True)
 
     @staticmethod
-    def pickle_nodes():
+    def sync_objects():
+        try:
+            storage.objects_log.sync()
+        except Exception:
+            logging.warning('Error while syncing objects log', exc_info=True)
+
+    @staticmethod
+    def save_nodes():
         if len(shared.node_pool) > 10000:
             shared.node_pool = set(random.sample(
                 tuple(shared.node_pool), 10000))
-        if len(shared.unchecked_node_pool) > 1000:
+        if len(shared.unchecked_node_pool) > shared.unchecked_node_pool_limit:
             shared.unchecked_node_pool = set(random.sample(
-                tuple(shared.unchecked_node_pool), 1000))
+                tuple(shared.unchecked_node_pool),
+                shared.unchecked_node_pool_limit))
 
         if len(shared.i2p_node_pool) > 1000:
             shared.i2p_node_pool = set(random.sample(
@@ -256,15 +256,9 @@ class Manager(threading.Thread):
                 tuple(shared.i2p_unchecked_node_pool), 100))
 
         try:
-            with open(
-                os.path.join(shared.data_directory, 'nodes.pickle'), 'bw'
-            ) as dst:
-                pickle.dump(shared.node_pool, dst, protocol=3)
-            with open(
-                os.path.join(shared.data_directory, 'i2p_nodes.pickle'), 'bw'
-            ) as dst:
-                pickle.dump(shared.i2p_node_pool, dst, protocol=3)
-                logging.debug('Saved nodes')
+            nodedb.nodes.save(shared.node_pool)
+            nodedb.i2p_nodes.save(shared.i2p_node_pool)
+            logging.debug('Saved nodes')
         except Exception:
             logging.warning('Error while saving nodes', exc_info=True)
 
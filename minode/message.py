@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 """Protocol message objects"""
 import base64
+import collections
 import hashlib
 import struct
+import threading
 import time
 
 from . import shared, structure
@@ -47,13 +49,17 @@ class Header():
 
 
 class Message():
-    """Common message structure"""
+    """
+    Common message structure. It's immutable: the serialized bytes
+    are cached and the same message may be sent to many connections.
+    """
     def __init__(self, command, payload):
         self.command = command
         self.payload = payload
 
         self.payload_length = len(payload)
         self.payload_checksum = hashlib.sha512(payload).digest()[:4]
+        self._bytes = None
 
     def __repr__(self):
         return '{}, payload_length: {}, payload_checksum: {}'.format(
@@ -62,11 +68,11 @@ class Message():
 
     def to_bytes(self):
         """Serialize to bytes"""
-        b = Header(
-            self.command, self.payload_length, self.payload_checksum
-        ).to_bytes()
-        b += self.payload
-        return b
+        if self._bytes is None:
+            self._bytes = Header(
+                self.command, self.payload_length, self.payload_checksum
+            ).to_bytes() + self.payload
+        return self._bytes
 
     @classmethod
     def from_bytes(cls, b):
@@ -88,7 +94,74 @@ class Message():
                 'wrong payload checksum, expected {}, got {}'.format(
                     h.payload_checksum, payload_checksum))
 
-        return cls(h.command, payload)
+        m = cls(h.command, payload)
+        m._bytes = b  # pylint: disable=protected-access
+        return m
+
+
+class ObjectFrame():
+    """The 'object' message serialized beforehand, e.g. from FrameCache"""
+    command = b'object'
+
+    def __init__(self, vector, frame):
+        self.vector = vector
+        self.frame = frame
+        self.payload_length = len(frame) - shared.header_length
+
+    def __repr__(self):
+        return 'object, vector: {}'.format(
+            base64.b16encode(self.vector).decode())
+
+    def to_bytes(self):
+        """The frame as is"""
+        return self.frame
+
+
+class FrameCache():
+    """
+    The 'object' message frames by vector, so the popular objects
+    are not serialized and hashed for each getdata.
+    The least recently used are dropped above *size* bytes.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.used = 0
+        self.frames = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.frames)
+
+    def get(self, vector):
+        """Frame for the *vector* or None"""
+        with self.lock:
+            frame = self.frames.get(vector)
+            if frame is not None:
+                self.frames.move_to_end(vector)
+            return frame
+
+    def put(self, vector, frame):
+        """Cache the *frame*, returns it"""
+        with self.lock:
+            old = self.frames.pop(vector, None)
+            if old is not None:
+                self.used -= len(old)
+            self.frames[vector] = frame
+            self.used += len(frame)
+            while self.used > self.size and self.frames:
+                self.used -= len(self.frames.popitem(last=False)[1])
+        return frame
+
+    def frame(self, obj):
+        """Get cached or serialize the *obj* into an ObjectFrame"""
+        frame = self.get(obj.vector)
+        if frame is None:
+            frame = self.put(
+                obj.vector, Message(b'object', obj.to_bytes()).to_bytes())
+        return ObjectFrame(obj.vector, frame)
+
+
+object_frames = FrameCache(shared.object_frames_cache_size)
 
 
 def _payload_read_int(data):
@@ -180,18 +253,23 @@ class Version():
 
 
 class Inv():
-    """The inv message payload"""
+    """The inv message payload, serialized once"""
     def __init__(self, vectors):
         self.vectors = set(vectors)
+        # timing.Relay if the propagation delay is measured
+        self.relay = None
+        self._bytes = None
 
     def __repr__(self):
         return 'inv, count: {}'.format(len(self.vectors))
 
     def to_bytes(self):
-        return Message(
-            b'inv', structure.VarInt(len(self.vectors)).to_bytes()
-            + b''.join(self.vectors)
-        ).to_bytes()
+        if self._bytes is None:
+            self._bytes = Message(
+                b'inv', structure.VarInt(len(self.vectors)).to_bytes()
+                + b''.join(self.vectors)
+            ).to_bytes()
+        return self._bytes
 
     @classmethod
     def from_message(cls, m):
@@ -244,18 +322,23 @@ class GetData():
 
 
 class Addr():
-    """The addr message payload"""
+    """The addr message payload, serialized once"""
     def __init__(self, addresses):
         self.addresses = addresses
+        self._bytes = None
 
     def __repr__(self):
         return 'addr, count: {}'.format(len(self.addresses))
 
     def to_bytes(self):
-        return Message(
-            b'addr', structure.VarInt(len(self.addresses)).to_bytes()
-            + b''.join({addr.to_bytes() for addr in self.addresses})
-        ).to_bytes()
+        if self._bytes is None:
+            timestamp = int(time.time())
+            addresses = {addr.to_bytes(timestamp) for addr in self.addresses}
+            self._bytes = Message(
+                b'addr', structure.VarInt(len(addresses)).to_bytes()
+                + b''.join(addresses)
+            ).to_bytes()
+        return self._bytes
 
     @classmethod
     def from_message(cls, m):
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+Counters of the node internals exported in the Prometheus text format
+by the HTTP endpoint
+"""
+import bisect
+import threading
+
+from . import shared
+
+
+class Counter():
+    """A monotonic counter with optional labels"""
+    kind = 'counter'
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+        registry.append(self)
+
+    def inc(self, *labels, n=1):
+        """Increase the value for *labels* by *n*"""
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + n
+
+    def remove(self, name, value):
+        """Forget the values having label *name* equal to *value*"""
+        i = self.labels.index(name)
+        with self.lock:
+            for labels in tuple(self.values):
+                if labels[i] == value:
+                    del self.values[labels]
+
+    def samples(self):
+        """Generate (suffix, label pairs, value) for export"""
+        with self.lock:
+            values = self.values.copy()
+        for labels, value in values.items():
+            yield '', zip(self.labels, labels), value
+
+
+class Summary(Counter):
+    """Count and sum of observed values, e.g. durations in seconds"""
+    kind = 'summary'
+
+    def observe(self, value, *labels):
+        """Add a new observation"""
+        with self.lock:
+            count, total = self.values.get(labels, (0, 0))
+            self.values[labels] = (count + 1, total + value)
+
+    def samples(self):
+        with self.lock:
+            values = self.values.copy()
+        for labels, (count, total) in values.items():
+            yield '_count', zip(self.labels, labels), count
+            yield '_sum', zip(self.labels, labels), total
+
+
+class Histogram(Counter):
+    """Observed values distributed into cumulative *buckets*"""
+    kind = 'histogram'
+
+    def __init__(
+        self, name, description, labels=(),
+        buckets=(
+            0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+            0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+    ):
+        super().__init__(name, description, labels)
+        self.buckets = buckets
+
+    def observe(self, value, *labels):
+        """Add a new observation"""
+        with self.lock:
+            try:
+                counts = self.values[labels]
+            except KeyError:
+                counts = self.values[labels] = [0] * (len(self.buckets) + 2)
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+
+    def samples(self):
+        with self.lock:
+            values = {
+                labels: counts.copy()
+                for labels, counts in self.values.items()}
+        for labels, counts in values.items():
+            pairs = tuple(zip(self.labels, labels))
+            total = 0
+            for le, count in zip(self.buckets + ('+Inf',), counts):
+                total += count
+                yield '_bucket', pairs + (('le', le),), total
+            yield '_count', pairs, total
+            yield '_sum', pairs, counts[-1]
+
+
+class Gauge(Counter):
+    """A value computed by *collect* callable at the export time"""
+    kind = 'gauge'
+
+    def __init__(self, name, description, labels=(), collect=None):
+        super().__init__(name, description, labels)
+        self.collect = collect
+
+    def samples(self):
+        for labels, value in self.collect():
+            yield '', zip(self.labels, labels), value
+
+
+registry = []
+
+# the commands of the protocol, the others sent by peers are counted
+# together so they can't add the label values without a limit
+commands = frozenset((
+    b'version', b'verack', b'addr', b'inv', b'getdata', b'object',
+    b'ping', b'pong', b'error'))
+
+
+def command_label(command):
+    """The label value for the *command* received from a peer"""
+    return command if command in commands else b'other'
+
+
+messages_received = Counter(
+    'minode_messages_received_total', 'Messages received', ('command',))
+bytes_received = Counter(
+    'minode_bytes_received_total', 'Bytes received', ('command',))
+messages_sent = Counter(
+    'minode_messages_sent_total', 'Messages sent', ('command',))
+bytes_sent = Counter(
+    'minode_bytes_sent_total', 'Bytes sent', ('command',))
+objects_received = Counter(
+    'minode_objects_received_total', 'Received objects by validity',
+    ('result',))
+validation_seconds = Summary(
+    'minode_object_validation_seconds',
+    'Time spent validating an object')
+i2p_bytes = Counter(
+    'minode_i2p_bytes_total', 'Bytes of the I2P streams by session',
+    ('session', 'direction'))
+pow_seconds = Summary(
+    'minode_pow_seconds', 'Time spent doing proof of work')
+pow_trials = Counter(
+    'minode_pow_trials_total', 'Nonces tried doing proof of work')
+
+
+def _connections():
+    counts = {}
+    for c in shared.connections.copy():
+        key = (c.status, c.network)
+        counts[key] = counts.get(key, 0) + 1
+    return counts.items()
+
+
+def _objects():
+    with shared.objects_lock:
+        objects = tuple(shared.objects.values())
+    yield ('count',), len(objects)
+    yield ('bytes',), sum(len(obj.object_payload) for obj in objects)
+
+
+def _queues():
+    yield ('vector_advertise',), shared.vector_advertise_queue.qsize()
+    yield ('address_advertise',), shared.address_advertise_queue.qsize()
+
+
+def _send_queues():
+    for c in shared.connections.copy():
+        yield (c.peer_str,), c.send_queue.qsize()
+
+
+def _i2p_streams():
+    counts = {}
+    for c in shared.connections.copy():
+        if c.i2p_session:
+            key = (c.i2p_session, 'incoming' if c.server else 'outgoing')
+            counts[key] = counts.get(key, 0) + 1
+    return counts.items()
+
+
+def _pow_jobs():
+    from . import proofofwork  # pylint: disable=import-outside-toplevel
+    for status, count in proofofwork.jobs.counts().items():
+        yield (status,), count
+
+
+def _node_pools():
+    for name in (
+        'core_nodes', 'node_pool', 'unchecked_node_pool',
+        'i2p_core_nodes', 'i2p_node_pool', 'i2p_unchecked_node_pool'
+    ):
+        yield (name,), len(getattr(shared, name))
+
+
+Gauge(
+    'minode_connections', 'Connections by status and network',
+    ('status', 'network'), _connections)
+Gauge('minode_objects', 'Objects in the inventory', ('value',), _objects)
+Gauge('minode_queue_size', 'Advertiser queues', ('queue',), _queues)
+Gauge(
+    'minode_send_queue_size', 'Messages in the send queue of a connection',
+    ('peer',), _send_queues)
+Gauge('minode_node_pool_size', 'Node pools', ('pool',), _node_pools)
+Gauge(
+    'minode_i2p_streams', 'I2P streams by session and direction',
+    ('session', 'direction'), _i2p_streams)
+Gauge(
+    'minode_pow_jobs', 'Proof of work jobs by status', ('status',),
+    _pow_jobs)
+
+
+def _label(value):
+    if isinstance(value, bytes):
+        value = value.decode('ascii', 'replace')
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def export():
+    """Render all the metrics in the Prometheus text format"""
+    lines = []
+    for metric in registry:
+        lines.append('# HELP {} {}'.format(metric.name, metric.description))
+        lines.append('# TYPE {} {}'.format(metric.name, metric.kind))
+        for suffix, pairs, value in metric.samples():
+            labels = ','.join(
+                '{}="{}"'.format(name, _label(label))
+                for name, label in pairs)
+            lines.append('{}{}{} {}'.format(
+                metric.name, suffix, '{' + labels + '}' if labels else '',
+                value))
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsListener(threading.Thread):
+    """The thread serving the metrics endpoint"""
+    def __init__(self, host, port):
+        super().__init__(name='Metrics', daemon=True)
+        # http.server is slow to import and rarely needed
+        from . import httpd  # pylint: disable=import-outside-toplevel
+        self.server = httpd.Server((host, port), httpd.MetricsHandler)
+
+    def run(self):
+        self.server.serve_forever()
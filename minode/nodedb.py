@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Compact binary storage for the node pools.
+
+A file starts with a header (magic, version, kind) followed by
+an append-only log of records, each adding or removing a node.
+Changes are appended on save and the log is compacted by an atomic
+rewrite when it grows too large. A torn record at the end, e.g. after
+a crash in the middle of a write, is ignored and truncated on load.
+"""
+import logging
+import mmap
+import os
+import pickle
+import socket
+import struct
+import time
+
+from . import shared, storage
+
+MAGIC = b'MiNode'
+VERSION = 1
+
+ADD = 1
+REMOVE = 2
+
+header = struct.Struct('>6sBB')
+# op, IPv6 or IPv4-mapped address, port, timestamp
+ip_record = struct.Struct('>B16sHI')
+# op, timestamp, destination length, followed by the destination
+i2p_record = struct.Struct('>BIH')
+
+IPV4_PREFIX = b'\x00' * 10 + b'\xFF' * 2
+
+
+class NodeDatabase():
+    """
+    The node pool of (host, port) with IP addresses
+    persisted in the file *name* in the data directory,
+    *legacy* is the pickle to migrate from
+    """
+    kind = 0
+    record = ip_record
+
+    def __init__(self, name, legacy=None):
+        self.name = name
+        self.legacy = legacy
+        # the nodes persisted: timestamp
+        self.nodes = {}
+        # the number of records in the log, None if it must be rewritten
+        self.records = None
+
+    @property
+    def path(self):
+        """The file path in the current data directory"""
+        return os.path.join(shared.data_directory, self.name)
+
+    def encode(self, op, node, timestamp):
+        """Pack a record or return None if the node can't be stored"""
+        host, port = node
+        try:
+            address = IPV4_PREFIX + socket.inet_pton(socket.AF_INET, host)
+        except (OSError, TypeError):
+            try:
+                address = socket.inet_pton(socket.AF_INET6, host)
+            except (OSError, TypeError):
+                return None
+        try:
+            return self.record.pack(op, address, port, timestamp)
+        except struct.error:
+            return None
+
+    def decode(self, data, offset):
+        """Yield (op, node, timestamp, end) for the records in *data*"""
+        size = self.record.size
+        end = len(data) - (len(data) - offset) % size
+        for op, address, port, timestamp in self.record.iter_unpack(
+            data[offset:end]
+        ):
+            if address.startswith(IPV4_PREFIX):
+                host = socket.inet_ntop(socket.AF_INET, address[12:])
+            else:
+                host = socket.inet_ntop(socket.AF_INET6, address)
+            offset += size
+            yield op, (host, port), timestamp, offset
+
+    def load(self):
+        """Read the nodes, migrating from the legacy pickle"""
+        self.nodes = {}
+        self.records = None
+        try:
+            with open(self.path, 'r+b') as src:
+                size = os.fstat(src.fileno()).st_size
+                if size <= header.size:
+                    data = src.read()
+                    end = self._replay(data)
+                else:
+                    with mmap.mmap(
+                        src.fileno(), 0, access=mmap.ACCESS_READ
+                    ) as data:
+                        end = self._replay(data)
+                if self.records is not None and end < size:
+                    logging.warning(
+                        'Ignoring %s bytes of incomplete records in %s',
+                        size - end, self.name)
+                    src.truncate(end)
+        except FileNotFoundError:
+            self._migrate()
+        except Exception:
+            logging.warning(
+                'Error while loading nodes from disk.', exc_info=True)
+            self.nodes = {}
+            self.records = None
+        return set(self.nodes)
+
+    def _replay(self, data):
+        """Apply the records from *data*, return the end of the valid ones"""
+        try:
+            magic, version, kind = header.unpack_from(data)
+        except struct.error:
+            magic = version = kind = None
+        if (magic, version, kind) != (MAGIC, VERSION, self.kind):
+            logging.warning(
+                'Unsupported format of %s, it will be rewritten', self.name)
+            return 0
+        end = header.size
+        records = 0
+        for op, node, timestamp, end_ in self.decode(data, end):
+            if op == ADD:
+                self.nodes[node] = timestamp
+            elif op == REMOVE:
+                self.nodes.pop(node, None)
+            else:  # e.g. zeroes after a crash
+                break
+            records += 1
+            end = end_
+        self.records = records
+        return end
+
+    def _migrate(self):
+        if not self.legacy:
+            return
+        try:
+            with open(
+                os.path.join(shared.data_directory, self.legacy), 'br'
+            ) as src:
+                nodes = pickle.load(src)
+        except FileNotFoundError:
+            return
+        except Exception:
+            logging.warning(
+                'Error while loading nodes from disk.', exc_info=True)
+            return
+        now = int(time.time())
+        self.nodes = {node: now for node in nodes}
+        logging.info(
+            'Migrating %s nodes from %s to %s',
+            len(self.nodes), self.legacy, self.name)
+
+    def save(self, nodes):
+        """Persist the changes since the last save"""
+        if (
+            self.records is None
+            or self.records > 4 * len(nodes) + 256
+        ):
+            self.compact(nodes)
+            return
+        now = int(time.time())
+        data = []
+        for node in self.nodes.keys() - nodes:
+            data.append(self.encode(REMOVE, node, now))
+            del self.nodes[node]
+        for node in nodes - self.nodes.keys():
+            record = self.encode(ADD, node, now)
+            if record:
+                data.append(record)
+                self.nodes[node] = now
+        data = [record for record in data if record]
+        if not data:
+            return
+        try:
+            with open(self.path, 'ab') as dst:
+                dst.write(b''.join(data))
+                dst.flush()
+                os.fsync(dst.fileno())
+        except Exception:
+            self.records = None
+            raise
+        self.records += len(data)
+
+    def compact(self, nodes):
+        """Rewrite the file with only the current *nodes*"""
+        now = int(time.time())
+        self.nodes = {
+            node: self.nodes.get(node, now) for node in nodes}
+        data = [header.pack(MAGIC, VERSION, self.kind)]
+        for node, timestamp in tuple(self.nodes.items()):
+            record = self.encode(ADD, node, timestamp)
+            if record:
+                data.append(record)
+            else:
+                del self.nodes[node]
+        self.records = None
+        storage.atomic_write(self.path, b''.join(data))
+        self.records = len(data) - 1
+
+
+class I2PNodeDatabase(NodeDatabase):
+    """The node pool of (destination, 'i2p')"""
+    kind = 1
+    record = i2p_record
+
+    def encode(self, op, node, timestamp):
+        destination = node[0]
+        if not isinstance(destination, bytes) or len(destination) > 0xFFFF:
+            return None
+        return self.record.pack(
+            op, timestamp, len(destination)) + destination
+
+    def decode(self, data, offset):
+        size = self.record.size
+        while offset + size <= len(data):
+            op, timestamp, length = self.record.unpack_from(data, offset)
+            end = offset + size + length
+            if end > len(data):
+                return
+            yield op, (bytes(data[offset + size:end]), 'i2p'), timestamp, end
+            offset = end
+
+
+nodes = NodeDatabase('nodes.dat', 'nodes.pickle')
+i2p_nodes = I2PNodeDatabase('i2p_nodes.dat', 'i2p_nodes.pickle')
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Sampling profiler for all the threads with per-thread CPU accounting.
+Writes stacks in the folded format accepted by flamegraph.pl
+and speedscope into the data directory.
+"""
+import collections
+import logging
+import os
+import re
+import sys
+import threading
+import time
+
+from . import shared
+
+
+def thread_role(name):
+    """Reduce the thread name to its role, e.g. 'Connection'"""
+    return re.split(r' to | from |-\d|:', name, 1)[0].strip() or name
+
+
+def _frame_name(code):
+    return '{} ({}:{})'.format(
+        code.co_name, os.path.basename(code.co_filename),
+        code.co_firstlineno)
+
+
+def _cpu_times():
+    """CPU seconds (user + system) by native thread id, Linux only"""
+    times = {}
+    ticks = os.sysconf('SC_CLK_TCK')
+    for t in threading.enumerate():
+        native_id = getattr(t, 'native_id', None)
+        if native_id is None:
+            continue
+        try:
+            with open(
+                '/proc/self/task/{}/stat'.format(native_id),
+                'r', encoding='ascii'
+            ) as src:
+                # the thread name in brackets may contain spaces
+                fields = src.read().rsplit(')', 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        times[native_id] = (
+            t.name, (int(fields[11]) + int(fields[12])) / ticks)
+    return times
+
+
+class Profiler(threading.Thread):
+    """The profiler thread sampling stacks every *interval* seconds"""
+    def __init__(self, interval=0.01):
+        super().__init__(name='Profiler')
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.started = time.time()
+        try:
+            self.cpu_started = _cpu_times()
+        except (OSError, ValueError, AttributeError):
+            self.cpu_started = {}
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            if shared.shutting_down:
+                break
+            self.sample()
+        self.dump()
+
+    def sample(self):
+        """Take a snapshot of the stacks of all other threads"""
+        names = {t.ident: t.name for t in threading.enumerate()}
+        # pylint: disable=protected-access
+        for ident, frame in sys._current_frames().items():
+            if ident == self.ident:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            stack.append(thread_role(names.get(ident, 'Unknown')))
+            self.stacks[';'.join(reversed(stack))] += 1
+        self.samples += 1
+
+    def cpu_report(self):
+        """Lines of CPU seconds spent by roles and threads while running"""
+        try:
+            cpu = _cpu_times()
+        except (OSError, ValueError, AttributeError):
+            return ['CPU accounting is not supported on this platform']
+        by_thread = []
+        by_role = collections.Counter()
+        for native_id, (name, seconds) in cpu.items():
+            seconds -= self.cpu_started.get(native_id, (name, 0))[1]
+            by_thread.append((seconds, name))
+            by_role[thread_role(name)] += seconds
+        lines = ['# CPU seconds by role']
+        lines += [
+            '{:10.3f} {}'.format(seconds, role)
+            for role, seconds in by_role.most_common()]
+        lines.append('# CPU seconds by thread')
+        lines += [
+            '{:10.3f} {}'.format(seconds, name)
+            for seconds, name in sorted(by_thread, reverse=True)]
+        return lines
+
+    def dump(self):
+        """Write the folded stacks and the CPU report to the data dir"""
+        prefix = os.path.join(
+            shared.data_directory, time.strftime(
+                'profile-%Y%m%d-%H%M%S', time.localtime(self.started)))
+        try:
+            with open(prefix + '.folded', 'w', encoding='utf-8') as dst:
+                for stack, count in self.stacks.most_common():
+                    dst.write('{} {}\n'.format(stack, count))
+            with open(prefix + '.cpu.txt', 'w', encoding='utf-8') as dst:
+                dst.write('# {} samples in {:.1f}s\n'.format(
+                    self.samples, time.time() - self.started))
+                dst.write('\n'.join(self.cpu_report()) + '\n')
+        except Exception:
+            logging.warning('Error while saving the profile', exc_info=True)
+        else:
+            logging.info('Saved the profile to %s.folded', prefix)
+
+
+profiler = None
+
+
+def start():
+    """Start a new profiler"""
+    global profiler  # pylint: disable=global-statement
+    if profiler and profiler.is_alive():
+        return
+    logging.info('Starting the profiler')
+    profiler = Profiler(shared.profile_interval)
+    profiler.start()
+
+
+def stop():
+    """Stop the profiler and dump its results"""
+    if profiler and profiler.is_alive():
+        logging.info('Stopping the profiler')
+        profiler.stopped.set()
+
+
+def toggle(s, f):  # pylint: disable=unused-argument
+    """Signal handler switching the profiler on and off"""
+    if profiler and profiler.is_alive():
+        stop()
+    else:
+        start()
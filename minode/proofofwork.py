@@ -1,54 +1,446 @@
 """Doing proof of work"""
 import base64
+import concurrent.futures
 import hashlib
+import heapq
+import itertools
 import logging
-import multiprocessing
+import os
 import struct
 import threading
 import time
 
-from . import shared, structure
+from . import metrics, shared, storage, structure, timing
 
+try:
+    from . import _pow
+except ImportError:
+    _pow = None
 
-def _pow_worker(target, initial_hash, q):
-    nonce = 0
-    logging.debug(
-        'target: %s, initial_hash: %s',
-        target, base64.b16encode(initial_hash).decode())
-    trial_value = target + 1
+# nonces searched in one backend call
+_chunk = 2 ** 16
 
-    while trial_value > target:
-        nonce += 1
-        trial_value = struct.unpack('>Q', hashlib.sha512(hashlib.sha512(
-            struct.pack('>Q', nonce) + initial_hash).digest()).digest()[:8])[0]
 
-    q.put(struct.pack('>Q', nonce))
+def _search_python(target, initial_hash, start, count):
+    """The reference PoW search in pure Python"""
+    sha512 = hashlib.sha512
+    pack = struct.Struct('>Q').pack
+    for nonce in range(start, start + count):
+        if int.from_bytes(sha512(sha512(
+            pack(nonce) + initial_hash
+        ).digest()).digest()[:8], 'big') <= target:
+            return nonce
+    return None
 
 
-def _worker(obj):
-    q = multiprocessing.Queue()
-    p = multiprocessing.Process(
-        target=_pow_worker, args=(obj.pow_target(), obj.pow_initial_hash(), q))
+# PoW backends by name: callables search(target, initial_hash, start, count)
+# returning the first suitable nonce in the range or None
+backends = {'python': _search_python}
+if _pow:
+    backends['native'] = _pow.search
 
-    logging.debug('Starting POW process')
-    t = time.time()
-    p.start()
-    nonce = q.get()
-    p.join()
+_backend = None
 
-    logging.debug(
-        'Finished doing POW, nonce: %s, time: %ss', nonce, time.time() - t)
+
+def benchmark(search, seconds=0.05):
+    """Trials per second of the backend's *search*"""
+    initial_hash = b'\x00' * 64
+    count = 1000
+    done = 0
+    started = time.perf_counter()
+    while True:
+        # the target 0 is never reached
+        search(0, initial_hash, done, count)
+        done += count
+        elapsed = time.perf_counter() - started
+        if elapsed > seconds:
+            return done / elapsed
+        count *= 2
+
+
+def get_backend():
+    """The name of the PoW backend, chosen by a self-benchmark if 'auto'"""
+    global _backend  # pylint: disable=global-statement
+    if _backend is None:
+        name = shared.pow_backend
+        if name != 'auto' and name not in backends:
+            logging.warning(
+                'PoW backend %s is not available, choosing another one', name)
+            name = 'auto'
+        if name == 'auto':
+            rates = {
+                name: benchmark(search) for name, search in backends.items()}
+            name = max(rates, key=rates.get)
+            logging.info(
+                'Selected PoW backend %s, %.0f trials/s', name, rates[name])
+        _backend = name
+    return _backend
+
+
+def _search(backend, target, initial_hash, start, count):
+    """Call the backend's search, by name to run in the process pool"""
+    return backends[backend](target, initial_hash, start, count)
+
+
+def _publish(obj, nonce):
+    """Add the *obj* with the *nonce* to the inventory and advertise it"""
     obj = structure.Object(
-        nonce, obj.expires_time, obj.object_type, obj.version,
-        obj.stream_number, obj.object_payload)
+        nonce.to_bytes(8, 'big'), obj.expires_time, obj.object_type,
+        obj.version, obj.stream_number, obj.object_payload)
     logging.debug(
         'Object vector is %s', base64.b16encode(obj.vector).decode())
 
-    with shared.objects_lock:
-        shared.objects[obj.vector] = obj
-        shared.vector_advertise_queue.put(obj.vector)
+    if storage.add_object(obj) and shared.timing:
+        timing.seen(obj.vector)
+    shared.vector_advertise_queue.put(obj.vector)
+
+
+class Job():
+    """The PoW for the object *obj* searched from the *nonce* on"""
+    def __init__(self, obj, priority=0, nonce=1):
+        self.obj = obj
+        self.priority = priority
+        # the next nonce to try, the previous ones are not suitable
+        self.nonce = nonce
+        self.target = obj.pow_target()
+        self.initial_hash = obj.pow_initial_hash()
+        self.id = base64.b16encode(self.initial_hash[:16]).decode().lower()
+        # queued, running, done, cancelled or expired
+        self.status = 'queued'
+        self.result = None
+        # searched in this session
+        self.trials = 0
+        self.seconds = 0
+        self.seq = 0
+
+    @property
+    def expected(self):
+        """The expected number of trials for the target"""
+        return 2 ** 64 / (self.target + 1)
+
+    def progress(self):
+        """
+        The job state for the logs and the API: the trials done, which
+        is the nonce progress, the current rate and the ETA. The search
+        is memoryless, so the ETA is the expected time for the target.
+        """
+        rate = self.trials / self.seconds if self.seconds else 0
+        return {
+            'id': self.id,
+            'status': self.status,
+            'priority': self.priority,
+            'trials': self.nonce - 1,
+            'expected': round(self.expected),
+            'rate': round(rate),
+            'eta': round(self.expected / rate) if rate else None
+        }
+
+
+class JobManager():
+    """
+    The queue of PoW jobs done by at most as many worker threads
+    as there are cores, the higher priority first. The jobs are
+    searched in chunks, so a running job can be cancelled or put back
+    for a job of higher priority, and its nonce progress is persisted
+    along with the pending jobs in the file *name* in the data directory.
+    The Python backend runs in a process pool, the native one releases
+    the GIL and runs in the worker threads.
+    """
+    header = struct.Struct('>6sB')
+    # priority, next nonce, object length, followed by the object
+    record = struct.Struct('>iQI')
+    min_priority = -2 ** 31
+    max_priority = 2 ** 31 - 1
+    magic = b'MiPoW\x00'
+    version = 1
+    save_interval = 30
+    log_interval = 60
+
+    def __init__(self, name='pow_jobs.dat'):
+        self.name = name
+        self.path = None
+        self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
+        # the queued and running jobs by id
+        self.jobs = {}
+        # (-priority, seq, job) of the queued jobs
+        self.queue = []
+        self.seq = itertools.count()
+        self.threads = []
+        self.executor = None
+        # the chunks submitted to the process pool
+        self.futures = set()
+        self.stopped = False
+        self.last_saved = time.monotonic()
+
+    @staticmethod
+    def max_workers():
+        """The number of workers capped by the number of cores"""
+        cores = os.cpu_count() or 1
+        return min(shared.pow_workers or cores, cores)
+
+    def _push(self, job):
+        job.status = 'queued'
+        heapq.heappush(self.queue, (-job.priority, job.seq, job))
+        self.cond.notify()
+
+    def submit_many(self, objects, priority=0):
+        """
+        Queue the PoW for the *objects*, returns the jobs,
+        raises ValueError if the *priority* can't be persisted
+        """
+        if not self.min_priority <= priority <= self.max_priority:
+            raise ValueError('priority {} is out of range'.format(priority))
+        result = []
+        with self.lock:
+            for obj in objects:
+                job = Job(obj, priority)
+                if job.id in self.jobs:
+                    # the same object is already queued
+                    result.append(self.jobs[job.id])
+                    continue
+                job.seq = next(self.seq)
+                self.jobs[job.id] = job
+                self._push(job)
+                result.append(job)
+            self._start()
+        self.save()
+        return result
+
+    def submit(self, obj, priority=0):
+        """Queue the PoW for *obj*, returns the job"""
+        return self.submit_many([obj], priority)[0]
+
+    def cancel(self, job_id):
+        """Cancel the job by id, returns False if there is no such job"""
+        with self.lock:
+            job = self.jobs.pop(job_id, None)
+            if job is None:
+                return False
+            if job.status == 'queued':
+                self.queue = [
+                    item for item in self.queue if item[2] is not job]
+                heapq.heapify(self.queue)
+            # a running job is stopped by the worker after the chunk
+            job.status = 'cancelled'
+        logging.info('Cancelled PoW job %s', job.id)
+        self.save()
+        return True
+
+    def status(self):
+        """The progress of the queued and running jobs"""
+        with self.lock:
+            jobs = sorted(
+                self.jobs.values(), key=lambda job: (-job.priority, job.seq))
+        return [job.progress() for job in jobs]
+
+    def counts(self):
+        """The number of jobs by status"""
+        counts = {'queued': 0, 'running': 0}
+        with self.lock:
+            for job in self.jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+    def _start(self):
+        """Start the missing workers, called with the lock held"""
+        self.threads = [t for t in self.threads if t.is_alive()]
+        for _ in range(
+            min(self.max_workers(), len(self.jobs)) - len(self.threads)
+        ):
+            thread = threading.Thread(
+                target=self._run, name='PoW Worker', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def _run(self):
+        while True:
+            with self.lock:
+                while not self.queue and not self.stopped:
+                    if not self.cond.wait(60):
+                        # idle, may be started again on submit
+                        self.threads.remove(threading.current_thread())
+                        return
+                if self.stopped:
+                    return
+                job = heapq.heappop(self.queue)[2]
+                job.status = 'running'
+            try:
+                self._work(job)
+            except Exception:
+                if self.stopped:
+                    return
+                logging.warning(
+                    'Error in PoW job %s', job.id, exc_info=True)
+                with self.lock:
+                    self.jobs.pop(job.id, None)
+                self.save()
+
+    def _get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = concurrent.futures.ProcessPoolExecutor(
+                    self.max_workers())
+            return self.executor
+
+    def search(self, job):
+        """Search the next chunk of nonces for the *job*"""
+        backend = get_backend()
+        args = (backend, job.target, job.initial_hash, job.nonce, _chunk)
+        started = time.monotonic()
+        if backend == 'python':
+            # the pure Python search would hold the GIL
+            future = self._get_executor().submit(_search, *args)
+            with self.lock:
+                self.futures.add(future)
+            try:
+                found = future.result()
+            finally:
+                with self.lock:
+                    self.futures.discard(future)
+        else:
+            found = _search(*args)
+        job.seconds += time.monotonic() - started
+        trials = _chunk if found is None else found - job.nonce + 1
+        job.trials += trials
+        metrics.pow_trials.inc(n=trials)
+        if found is None:
+            job.nonce += _chunk
+        else:
+            job.nonce = found + 1
+            job.result = found
+        return found
+
+    def _work(self, job):
+        logging.debug(
+            'Starting PoW job %s, priority %s, ~%.0f trials, nonce %s',
+            job.id, job.priority, job.expected, job.nonce)
+        last_logged = time.monotonic()
+        while job.result is None:
+            if job.obj.is_expired():
+                logging.warning('PoW job %s expired', job.id)
+                job.status = 'expired'
+                with self.lock:
+                    self.jobs.pop(job.id, None)
+                self.save()
+                return
+            self.search(job)
+            with self.lock:
+                if job.status == 'cancelled' or self.stopped:
+                    return
+                if job.result is None and self.queue and (
+                    -self.queue[0][0] > job.priority
+                ):
+                    logging.debug(
+                        'PoW job %s is put back for a higher priority one',
+                        job.id)
+                    self._push(job)
+                    return
+            now = time.monotonic()
+            if now - last_logged > self.log_interval:
+                progress = job.progress()
+                logging.info(
+                    'PoW job %s: %s trials of ~%s, %s trials/s, ETA %ss',
+                    job.id, progress['trials'], progress['expected'],
+                    progress['rate'], progress['eta'])
+                last_logged = now
+            if now - self.last_saved > self.save_interval:
+                self.save()
+
+        metrics.pow_seconds.observe(job.seconds)
+        logging.debug(
+            'Finished PoW job %s, nonce: %s, time: %.1fs',
+            job.id, job.result, job.seconds)
+        _publish(job.obj, job.result)
+        with self.lock:
+            job.status = 'done'
+            self.jobs.pop(job.id, None)
+        self.save()
+
+    def stop(self):
+        """Stop the workers and save the progress"""
+        with self.lock:
+            self.stopped = True
+            self.cond.notify_all()
+            threads = list(self.threads)
+        for thread in threads:
+            thread.join(shared.shutdown_timeout / 2)
+        with self.lock:
+            # cancel_futures of shutdown() needs Python 3.9
+            for future in self.futures:
+                future.cancel()
+        if self.executor:
+            self.executor.shutdown(wait=False)
+        self.save()
+
+    def save(self):
+        """Persist the pending jobs, if loaded from the data directory"""
+        if self.path is None:
+            return
+        with self.lock:
+            jobs = [job for job in self.jobs.values() if job.status in (
+                'queued', 'running')]
+            self.last_saved = time.monotonic()
+        try:
+            data = [self.header.pack(self.magic, self.version)]
+            for job in jobs:
+                obj_data = job.obj.to_bytes()
+                data.append(self.record.pack(
+                    job.priority, job.nonce, len(obj_data)))
+                data.append(obj_data)
+            storage.atomic_write(self.path, b''.join(data))
+        except (OSError, struct.error):
+            logging.warning('Error while saving PoW jobs', exc_info=True)
+
+    def load(self):
+        """Resume the jobs persisted in the data directory"""
+        self.path = os.path.join(shared.data_directory, self.name)
+        try:
+            with open(self.path, 'rb') as src:
+                data = src.read()
+        except FileNotFoundError:
+            return
+        except OSError:
+            logging.warning('Error while loading PoW jobs', exc_info=True)
+            return
+        if data[:self.header.size] != self.header.pack(
+                self.magic, self.version):
+            logging.warning('Unsupported PoW jobs file %s', self.path)
+            return
+
+        jobs = []
+        offset = self.header.size
+        try:
+            while offset < len(data):
+                priority, nonce, length = self.record.unpack_from(
+                    data, offset)
+                offset += self.record.size
+                if offset + length > len(data):
+                    raise ValueError('Truncated record')
+                obj = structure.Object.from_bytes(
+                    data[offset:offset + length])
+                offset += length
+                if not obj.is_expired():
+                    jobs.append(Job(obj, priority, nonce))
+        except (struct.error, ValueError, IndexError):
+            logging.warning(
+                'PoW jobs file %s is damaged, resuming %s jobs',
+                self.path, len(jobs), exc_info=True)
+
+        with self.lock:
+            for job in jobs:
+                if job.id not in self.jobs:
+                    job.seq = next(self.seq)
+                    self.jobs[job.id] = job
+                    self._push(job)
+            self._start()
+        if jobs:
+            logging.info('Resumed %s PoW jobs', len(jobs))
+
+
+jobs = JobManager()
 
 
-def do_pow_and_publish(obj):
-    t = threading.Thread(target=_worker, args=(obj, ))
-    t.start()
+def do_pow_and_publish(obj, priority=0):
+    """Queue the PoW for *obj*, it's published when done"""
+    return jobs.submit(obj, priority)
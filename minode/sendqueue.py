@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""The outbound message scheduler of a connection"""
+import collections
+import queue
+import threading
+import time
+
+from . import message, shared
+
+CONTROL = 0
+INVENTORY = 1
+OBJECT = 2
+
+
+def classify(m):
+    """Determine the priority class and approximate size of the message"""
+    if isinstance(m, (message.Message, message.ObjectFrame)):
+        return (
+            OBJECT if m.command == b'object' else CONTROL,
+            shared.header_length + m.payload_length)
+    if isinstance(m, (message.Inv, message.GetData)):
+        return INVENTORY, shared.header_length + 32 * len(m.vectors)
+    if isinstance(m, message.Addr):
+        return INVENTORY, shared.header_length + 38 * len(m.addresses)
+    # version, error and the special values: None and 'fully_established'
+    return CONTROL, shared.header_length
+
+
+class SendQueue():
+    """
+    A replacement for the FIFO queue.Queue with three priority classes.
+    Control messages always go first, inventory and objects share
+    the bandwidth using the deficit round robin with *quantums* in bytes.
+    """
+    def __init__(self, quantums=(65536, 32768)):
+        self.lock = threading.Lock()
+        self.queues = (
+            collections.deque(), collections.deque(), collections.deque())
+        self.quantums = (0,) + tuple(quantums)
+        self.deficits = [0, self.quantums[INVENTORY], 0]
+        self.current = INVENTORY
+        self.object_bytes = 0
+        # seconds the last message returned by get() spent in the queue
+        self.waited = 0
+
+    def __repr__(self):
+        return (
+            'send_queue, control: {}, inventory: {}, objects: {} ({} bytes)'
+        ).format(*(len(q) for q in self.queues), self.object_bytes)
+
+    def put(self, m):
+        """Enqueue a message, never blocks"""
+        cls, size = classify(m)
+        with self.lock:
+            self.queues[cls].append((m, size, time.monotonic()))
+            if cls == OBJECT:
+                self.object_bytes += size
+
+    def empty(self):
+        """Nothing to send"""
+        return not any(self.queues)
+
+    def qsize(self):
+        """The number of queued messages"""
+        return sum(len(q) for q in self.queues)
+
+    def has_control(self):
+        """There are urgent control messages in the queue"""
+        return bool(self.queues[CONTROL])
+
+    def accepts_objects(self):
+        """Queued objects are below the limit and more may be queued"""
+        return self.object_bytes < shared.send_queue_object_bytes
+
+    def get(self):
+        """Dequeue the next message to send, raises queue.Empty"""
+        with self.lock:
+            if self.queues[CONTROL]:
+                m, _, queued = self.queues[CONTROL].popleft()
+                self.waited = time.monotonic() - queued
+                return m
+            if not self.queues[INVENTORY] and not self.queues[OBJECT]:
+                raise queue.Empty
+            while True:
+                cls = self.current
+                q = self.queues[cls]
+                if q and self.deficits[cls] >= q[0][1]:
+                    m, size, queued = q.popleft()
+                    self.waited = time.monotonic() - queued
+                    self.deficits[cls] -= size
+                    if cls == OBJECT:
+                        self.object_bytes -= size
+                    return m
+                if not q:
+                    self.deficits[cls] = 0
+                self.current = OBJECT if cls == INVENTORY else INVENTORY
+                if self.queues[self.current]:
+                    self.deficits[self.current] += \
+                        self.quantums[self.current]
+
+    get_nowait = get
@@ -7,6 +7,10 @@ import threading
 
 listening_port = 8444
 listening_host = ''
+# the queue of incoming connections in the kernel
+listen_backlog = 128
+# listening sockets (threads) per address family
+listen_sockets = 1
 send_outgoing_connections = True
 listen_for_connections = True
 data_directory = 'minode_data/'
@@ -27,24 +31,82 @@ header_length = 24
 i2p_dest_obj_type = 0x493250
 i2p_dest_obj_version = 1
 
+timing = False
+
+profile = False
+profile_interval = 0.01
+
+metrics_host = '127.0.0.1'
+metrics_port = 0
+
+api_host = '127.0.0.1'
+api_port = 0
+
 i2p_enabled = False
 i2p_transient = False
 i2p_sam_host = '127.0.0.1'
 i2p_sam_port = 7656
 i2p_tunnel_length = 2
+# tunnels in each direction and their backups, router defaults if 0
+i2p_tunnel_quantity = 0
+i2p_tunnel_backups = 0
 i2p_session_nick = b''
+# the session for the outgoing streams, a separate one
+# with its own tunnels if i2p_dial_session is set
+i2p_dial_session = False
+i2p_dial_session_nick = b''
 i2p_dest_pub = b''
+# sockets kept connected to the SAM bridge for the new streams
+i2p_sam_pool = None
+i2p_sam_pool_size = 2
+# simultaneous STREAM ACCEPT, needs SAM 3.2
+i2p_accept_streams = 2
+# seconds for the STREAM CONNECT
+i2p_dial_timeout = 60
 
 nonce_trials_per_byte = 1000
+# 'auto' for the fastest one, see proofofwork.backends
+pow_backend = 'auto'
+# simultaneous PoW jobs, 0 for the number of cores
+pow_workers = 0
 payload_length_extra_bytes = 1000
 
 shutting_down = False
+# set along with shutting_down to wake up the waiting threads
+shutdown_event = threading.Event()
+# seconds to wait for the threads to finish on shutdown
+shutdown_timeout = 10
+
+# seconds for the TLS handshake
+tls_timeout = 20
+
+# seconds to wait for the DNS bootstrap
+dns_timeout = 10
+# seconds to use the resolved bootstrap nodes without resolving again
+dns_cache_ttl = 6 * 3600
+
+# set on new items in the advertise queues
+advertise_event = threading.Event()
+# seconds to collect more items before advertising
+advertise_window = 0.05
 
-vector_advertise_queue = queue.Queue()
-address_advertise_queue = queue.Queue()
+
+class AdvertiseQueue(queue.Queue):
+    """A queue waking up the Advertiser on put"""
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        advertise_event.set()
+
+
+vector_advertise_queue = AdvertiseQueue()
+address_advertise_queue = AdvertiseQueue()
+# sets of the nodes resolved by the DNS bootstrap for the Manager
+bootstrap_nodes_queue = queue.Queue()
 
 connections = set()
 connections_lock = threading.Lock()
+# connections in the 'fully_established' status, also under connections_lock
+established_connections = set()
 
 i2p_dialers = set()
 
@@ -62,5 +124,25 @@ i2p_unchecked_node_pool = set()
 outgoing_connections = 8
 connection_limit = 250
 
+# new addresses accepted from a peer per second and at once
+addr_rate = 0.1
+addr_burst = 1000
+# the number of peers to relay an address to
+addr_relay_fanout = 2
+unchecked_node_pool_limit = 1000
+
+# bandwidth limits in bytes per second, 0 means unlimited
+upload_limit = 0
+download_limit = 0
+connection_upload_limit = 0
+connection_download_limit = 0
+
+# bytes, written to the connection buffer before prioritizing the rest
+send_buffer_size = 65536
+# a limit for objects in the send queue of a connection, bytes
+send_queue_object_bytes = 2 * 2**20
+# bytes of serialized objects kept for sending
+object_frames_cache_size = 64 * 2**20
+
 objects = {}
 objects_lock = threading.Lock()
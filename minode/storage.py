@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+Crash-safe persistence: atomic file replacement and the write-ahead log
+of objects checkpointed into objects.pickle, the log is rotated
+to objects.wal.old while the checkpoint is written
+"""
+import logging
+import os
+import pickle
+import shutil
+import struct
+import threading
+import zlib
+
+from . import feed, shared, structure
+
+# payload length and crc32 of the payload
+wal_record = struct.Struct('>II')
+
+
+def atomic_write(path, data):
+    """
+    Write the file through a temporary one and rename it,
+    so the *path* has either the old or the new content
+    """
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as dst:
+        dst.write(data)
+        dst.flush()
+        os.fsync(dst.fileno())
+    os.replace(tmp, path)
+    try:
+        fd = os.open(os.path.dirname(path) or '.', os.O_RDONLY)
+    except OSError:
+        return  # e.g. on Windows
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class ObjectsLog():
+    """
+    The objects added after the last checkpoint,
+    logging starts when the objects are loaded
+    """
+    def __init__(self):
+        self.file = None
+        self.dirty = False
+        self.lock = threading.Lock()
+
+    @property
+    def path(self):
+        """The file path in the current data directory"""
+        return os.path.join(shared.data_directory, 'objects.wal')
+
+    @property
+    def old_path(self):
+        """The log rotated by the checkpoint being written"""
+        return self.path + '.old'
+
+    @staticmethod
+    def _replay_file(path, objects):
+        """
+        Add the objects logged in the file, cut off the incomplete
+        records, return the number of objects and the end of the valid ones
+        """
+        count = 0
+        try:
+            with open(path, 'rb') as src:
+                data = src.read()
+        except FileNotFoundError:
+            return 0, 0
+        offset = 0
+        while offset + wal_record.size <= len(data):
+            length, crc = wal_record.unpack_from(data, offset)
+            start = offset + wal_record.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            try:
+                obj = structure.Object.from_bytes(payload)
+            except Exception:
+                break
+            objects[obj.vector] = obj
+            offset = start + length
+            count += 1
+        if offset < len(data):
+            logging.warning(
+                'Ignoring %s bytes of incomplete records in %s',
+                len(data) - offset, os.path.basename(path))
+            with open(path, 'r+b') as dst:
+                dst.truncate(offset)
+        return count, offset
+
+    def replay(self, objects):
+        """Add the logged objects to *objects*, return their number"""
+        # the checkpoint was interrupted
+        count, _ = self._replay_file(self.old_path, objects)
+        added, offset = self._replay_file(self.path, objects)
+        with self.lock:
+            self._close()
+            self.file = open(self.path, 'ab')
+            self.file.truncate(offset)
+        return count + added
+
+    def append(self, *objects):
+        """Log the new objects"""
+        payloads = [obj.to_bytes() for obj in objects]
+        data = b''.join(
+            wal_record.pack(len(payload), zlib.crc32(payload)) + payload
+            for payload in payloads)
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(data)
+            # reaches the OS, survives the crash of the process
+            self.file.flush()
+            self.dirty = True
+
+    def sync(self):
+        """Make the log durable"""
+        with self.lock:
+            if self.dirty and self.file:
+                os.fsync(self.file.fileno())
+            self.dirty = False
+
+    def rotate(self):
+        """
+        Start an empty log for the objects added after the checkpoint,
+        the current one is kept until the checkpoint is written
+        """
+        with self.lock:
+            self._close()
+            if not os.path.exists(self.old_path):
+                try:
+                    os.replace(self.path, self.old_path)
+                except FileNotFoundError:
+                    pass
+            elif os.path.exists(self.path):
+                # the previous checkpoint has failed, keep both
+                with open(self.path, 'rb') as src, \
+                        open(self.old_path, 'ab') as dst:
+                    shutil.copyfileobj(src, dst)
+                    dst.flush()
+                    os.fsync(dst.fileno())
+            self.file = open(self.path, 'wb')
+
+    def remove_rotated(self):
+        """Forget the rotated log, its objects are in the checkpoint"""
+        try:
+            os.remove(self.old_path)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        """Flush and close the file"""
+        with self.lock:
+            self._close()
+
+    def _close(self):
+        if self.file:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+            self.file = None
+        self.dirty = False
+
+
+objects_log = ObjectsLog()
+
+
+def add_objects(objects):
+    """
+    Add the objects to the inventory, the log and the feed,
+    return the list of booleans, False if the object is already there
+    """
+    added = []
+    result = []
+    with shared.objects_lock:
+        for obj in objects:
+            if obj.vector in shared.objects:
+                result.append(False)
+                continue
+            shared.objects[obj.vector] = obj
+            added.append(obj)
+            result.append(True)
+    feed.objects.add(added)
+    if added:
+        try:
+            objects_log.append(*added)
+        except Exception:
+            logging.warning('Error while logging the objects', exc_info=True)
+    return result
+
+
+def add_object(obj):
+    """
+    Add the object to the inventory and the log,
+    return False if it's already there
+    """
+    return add_objects([obj])[0]
+
+
+def load_objects():
+    """Load the last checkpoint and replay the log"""
+    objects = {}
+    try:
+        with open(
+            os.path.join(shared.data_directory, 'objects.pickle'), 'br'
+        ) as src:
+            objects = pickle.load(src)
+    except FileNotFoundError:
+        pass  # first start
+    except Exception:
+        logging.warning(
+            'Error while loading objects from disk.', exc_info=True)
+    try:
+        count = objects_log.replay(objects)
+    except Exception:
+        logging.warning(
+            'Error while replaying the objects log.', exc_info=True)
+    else:
+        if count:
+            logging.info('Recovered %s objects from the log', count)
+    with shared.objects_lock:
+        shared.objects = objects
+    feed.objects.reset(list(objects.values()))
+
+
+def save_objects():
+    """
+    Checkpoint: write all the objects and start a new log,
+    the objects added meanwhile go to the new one
+    """
+    with shared.objects_lock:
+        objects = shared.objects.copy()
+        objects_log.rotate()
+    data = pickle.dumps(objects, protocol=3)
+    atomic_write(
+        os.path.join(shared.data_directory, 'objects.pickle'), data)
+    objects_log.remove_rotated()
@@ -73,7 +73,11 @@ class Object():
     @classmethod
     def from_message(cls, m):
         """Decode message payload"""
-        payload = m.payload
+        return cls.from_bytes(m.payload)
+
+    @classmethod
+    def from_bytes(cls, payload):
+        """Decode the serialized object"""
         nonce, expires_time, object_type = struct.unpack('>8sQL', payload[:20])
         payload = payload[20:]
         version_varint_length = VarInt.length(payload[0])
@@ -101,56 +105,64 @@ class Object():
         """Check if object's TTL is expired"""
         return self.expires_time + 3 * 3600 < time.time()
 
-    def is_valid(self):
-        """Checks the object validity"""
-        if self.is_expired():
-            logging.debug(
-                'Invalid object %s, reason: expired',
-                base64.b16encode(self.vector).decode())
-            return False
-        if self.expires_time > time.time() + 28 * 24 * 3600 + 3 * 3600:
-            logging.warning(
-                'Invalid object %s, reason: end of life too far in the future',
-                base64.b16encode(self.vector).decode())
-            return False
+    def check(self, now=None):
+        """The reason the object is invalid, without the PoW, or None"""
+        now = now or time.time()
+        if self.expires_time + 3 * 3600 < now:
+            return 'expired'
+        if self.expires_time > now + 28 * 24 * 3600 + 3 * 3600:
+            return 'end of life too far in the future'
         if len(self.object_payload) > 2**18:
-            logging.warning(
-                'Invalid object %s, reason: payload is too long',
-                base64.b16encode(self.vector).decode())
-            return False
+            return 'payload is too long'
         if self.stream_number != shared.stream:
-            logging.warning(
-                'Invalid object %s, reason: not in stream %i',
-                base64.b16encode(self.vector).decode(), shared.stream)
-            return False
+            return 'not in stream {}'.format(shared.stream)
+        return None
 
-        pow_value = int.from_bytes(
-            hashlib.sha512(hashlib.sha512(
-                self.nonce + self.pow_initial_hash()
-            ).digest()).digest()[:8], 'big')
-        target = self.pow_target()
-        if target < pow_value:
-            logging.warning(
-                'Invalid object %s, reason: insufficient pow',
-                base64.b16encode(self.vector).decode())
+    def is_valid(self):
+        """Checks the object validity"""
+        reason = self.check()
+        if not reason:
+            pow_value = int.from_bytes(
+                hashlib.sha512(hashlib.sha512(
+                    self.nonce + self.pow_initial_hash()
+                ).digest()).digest()[:8], 'big')
+            if self.pow_target() < pow_value:
+                reason = 'insufficient pow'
+        if reason:
+            log_invalid(self, reason)
             return False
         return True
 
     def pow_target(self):
         """Compute PoW target"""
-        data = self.to_bytes()[8:]
-        length = len(data) + 8 + shared.payload_length_extra_bytes
-        dt = max(self.expires_time - time.time(), 0)
-        return int(
-            2 ** 64 / (
-                shared.nonce_trials_per_byte * (
-                    length + (dt * length) / (2 ** 16))))
+        return pow_target(
+            len(self.to_bytes()) + shared.payload_length_extra_bytes,
+            self.expires_time - time.time())
 
     def pow_initial_hash(self):
         """Compute the initial hash for PoW"""
         return hashlib.sha512(self.to_bytes()[8:]).digest()
 
 
+def log_invalid(obj, reason):
+    """Log the reason of the object invalidity"""
+    logging.log(
+        logging.DEBUG if reason == 'expired' else logging.WARNING,
+        'Invalid object %s, reason: %s',
+        base64.b16encode(obj.vector).decode(), reason)
+
+
+def pow_target(length, ttl):
+    """
+    PoW target for the serialized object of *length* bytes
+    with the payload_length_extra_bytes, living for *ttl* seconds
+    """
+    return int(
+        2 ** 64 / (
+            shared.nonce_trials_per_byte * (
+                length + (max(ttl, 0) * length) / (2 ** 16))))
+
+
 class NetAddrNoPrefix():
     """Network address"""
     def __init__(self, services, host, port):
@@ -206,17 +218,21 @@ class NetAddr():
         self.services = services
         self.host = host
         self.port = port
+        self._bytes = None
 
     def __repr__(self):
         return 'net_addr, stream: {}, services: {}, host: {}, port {}'.format(
             self.stream, self.services, self.host, self.port)
 
-    def to_bytes(self):
-        b = b''
-        b += struct.pack('>Q', int(time.time()))
-        b += struct.pack('>I', self.stream)
-        b += NetAddrNoPrefix(self.services, self.host, self.port).to_bytes()
-        return b
+    def to_bytes(self, timestamp=None):
+        """Serialize to bytes with *timestamp* or the current time"""
+        if self._bytes is None:
+            # everything except the time is cached
+            self._bytes = struct.pack('>I', self.stream) + NetAddrNoPrefix(
+                self.services, self.host, self.port).to_bytes()
+        return struct.pack(
+            '>Q', int(time.time()) if timestamp is None else timestamp
+        ) + self._bytes
 
     @classmethod
     def from_bytes(cls, b):
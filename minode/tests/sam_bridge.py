@@ -0,0 +1,267 @@
+"""
+A SAMv3 bridge stand-in for testing the I2P code without a router.
+It knows HELLO, DEST GENERATE, SESSION CREATE, STREAM CONNECT/ACCEPT
+and PING, the streams are piped over loopback.
+"""
+import base64
+import os
+import random
+import socket
+import socketserver
+import threading
+import time
+
+from minode.i2p.util import pub_from_priv
+
+
+def generate_destination():
+    """New destination: the public and the private keys in base64"""
+    # EdDSA signing key with the 7 bytes key certificate
+    pub = os.urandom(384) + b'\x05\x00\x04\x00\x07\x00\x00'
+    priv = pub + os.urandom(256) + os.urandom(32)
+    return (
+        base64.b64encode(pub, altchars=b'-~'),
+        base64.b64encode(priv, altchars=b'-~'))
+
+
+class Session():  # pylint: disable=too-few-public-methods
+    """A SAM session, the handlers of STREAM ACCEPT wait in accepting"""
+    def __init__(self, nick, priv, options):
+        self.nick = nick
+        self.priv = priv
+        self.pub = pub_from_priv(priv)
+        self.options = options
+        self.accepting = []
+        self.cond = threading.Condition()
+
+
+class Handler(socketserver.BaseRequestHandler):
+    """A connection to the bridge"""
+    def setup(self):
+        self.buffer = b''
+        self.version = b'3.3'
+        self.nicks = []
+        self.done = threading.Event()
+        self.server.handlers.add(self)
+        # the reply to STREAM ACCEPT and the destination line
+        # go in separate writes
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def finish(self):
+        self.server.handlers.discard(self)
+        for nick in self.nicks:
+            self.server.sessions.pop(nick, None)
+
+    def readline(self):
+        """The next command line"""
+        while b'\n' not in self.buffer:
+            data = self.request.recv(4096)
+            if not data:
+                raise ConnectionResetError
+            self.buffer += data
+        line, self.buffer = self.buffer.split(b'\n', 1)
+        return line
+
+    def reply(self, line):
+        """Send the reply after the latency"""
+        time.sleep(self.server.latency)
+        self.request.sendall(line + b'\n')
+
+    def handle(self):
+        try:
+            while True:
+                args = self.readline().split()
+                if not args:
+                    continue
+                kwargs = dict(a.split(b'=', 1) for a in args if b'=' in a)
+                command = b' '.join(args[:2])
+                if args[0] == b'HELLO':
+                    self.version = kwargs.get(b'MAX', b'3.3')
+                    self.reply(
+                        b'HELLO REPLY RESULT=OK VERSION=' + self.version)
+                elif command == b'DEST GENERATE':
+                    pub, priv = generate_destination()
+                    self.reply(b'DEST REPLY PUB=' + pub + b' PRIV=' + priv)
+                elif command == b'SESSION CREATE':
+                    self.session_create(kwargs)
+                elif command == b'STREAM CONNECT':
+                    self.stream_connect(kwargs)
+                    return
+                elif command == b'STREAM ACCEPT':
+                    self.stream_accept(kwargs)
+                    return
+                elif args[0] == b'PING':
+                    self.reply(b'PONG ' + b' '.join(args[1:]))
+                else:
+                    self.reply(b'ERROR RESULT=I2P_ERROR')
+        except OSError:
+            pass
+
+    def session_create(self, kwargs):
+        """Create the session, TRANSIENT destinations are supported"""
+        nick = kwargs[b'ID']
+        if nick in self.server.sessions:
+            self.reply(b'SESSION STATUS RESULT=DUPLICATED_ID')
+            return
+        priv = kwargs[b'DESTINATION']
+        if priv == b'TRANSIENT':
+            priv = generate_destination()[1]
+        self.server.sessions[nick] = Session(nick, priv, kwargs)
+        self.nicks.append(nick)
+        self.reply(b'SESSION STATUS RESULT=OK DESTINATION=' + priv)
+
+    def stream_connect(self, kwargs):
+        """Pair with a handler waiting in the STREAM ACCEPT"""
+        session = self.server.sessions.get(kwargs[b'ID'])
+        if not session:
+            self.reply(b'STREAM STATUS RESULT=INVALID_ID')
+            return
+        target = None
+        for s in tuple(self.server.sessions.values()):
+            if s.pub == kwargs[b'DESTINATION']:
+                target = s
+        if (
+            not target
+            or random.random() < self.server.loss  # nosec B311
+        ):
+            self.reply(b'STREAM STATUS RESULT=CANT_REACH_PEER')
+            return
+        deadline = time.monotonic() + self.server.accept_timeout
+        with target.cond:
+            while not target.accepting:
+                if not target.cond.wait(deadline - time.monotonic()):
+                    self.reply(b'STREAM STATUS RESULT=TIMEOUT')
+                    return
+            other = target.accepting.pop(0)
+        self.reply(b'STREAM STATUS RESULT=OK')
+        other.request.sendall(session.pub + b' FROM_PORT=0 TO_PORT=0\n')
+        thread = threading.Thread(
+            target=self.pipe, args=(other, self), daemon=True)
+        thread.start()
+        self.pipe(self, other)
+        thread.join()
+
+    def stream_accept(self, kwargs):
+        """Wait for the STREAM CONNECT, SAM 3.2 allows several at once"""
+        session = self.server.sessions.get(kwargs[b'ID'])
+        if not session:
+            self.reply(b'STREAM STATUS RESULT=INVALID_ID')
+            return
+        if session.accepting and self.version < b'3.2':
+            self.reply(b'STREAM STATUS RESULT=ALREADY_ACCEPTING')
+            return
+        self.reply(b'STREAM STATUS RESULT=OK')
+        with session.cond:
+            session.accepting.append(self)
+            session.cond.notify()
+        while not self.done.wait(1):
+            if self.server.closed:
+                break
+
+    @staticmethod
+    def pipe(src, dst):
+        """Copy the data from one handler's socket to another's"""
+        try:
+            if src.buffer:
+                dst.request.sendall(src.buffer)
+            while True:
+                data = src.request.recv(65536)
+                if not data:
+                    break
+                dst.request.sendall(data)
+        except OSError:
+            pass
+        try:
+            dst.request.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+        dst.done.set()
+
+
+class SAMBridge(socketserver.ThreadingTCPServer):
+    """
+    The bridge listening on *port*, 0 for any free port. *latency* is
+    added to each reply, *loss* is the probability of a STREAM CONNECT
+    failing with CANT_REACH_PEER.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(
+        self, host='127.0.0.1', port=0, latency=0, loss=0, accept_timeout=5
+    ):
+        super().__init__((host, port), Handler)
+        self.latency = latency
+        self.loss = loss
+        self.accept_timeout = accept_timeout
+        self.sessions = {}
+        self.handlers = set()
+        self.closed = False
+        self.thread = None
+
+    @property
+    def port(self):
+        """The listening port"""
+        return self.server_address[1]
+
+    def start(self):
+        """Serve in a background thread"""
+        self.thread = threading.Thread(
+            target=self.serve_forever, name='SAM Bridge', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and drop all the connections"""
+        self.closed = True
+        self.shutdown()
+        self.server_close()
+        for handler in self.handlers.copy():
+            try:
+                handler.request.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class Stream():  # pylint: disable=too-few-public-methods
+    """Takes the place of the Connection created by the I2P threads"""
+    def __init__(self, host, port, s, network, server, i2p_remote_dest):
+        self.host = host
+        self.port = port
+        self.s = s
+        self.network = network
+        self.server = server
+        self.i2p_remote_dest = i2p_remote_dest
+        self.buffer_receive = b''
+        self.i2p_session = None
+        self.started = threading.Event()
+
+    def start(self):
+        """Mark as started, the socket is left to the caller"""
+        self.started.set()
+
+
+class State():  # pylint: disable=too-few-public-methods
+    """The settings and collections the I2P threads use from shared"""
+    connection = Stream
+
+    def __init__(self):
+        self.shutting_down = False
+        self.shutdown_event = threading.Event()
+        self.connections = set()
+        self.i2p_dialers = set()
+        self.i2p_sam_pool = None
+        self.i2p_dial_timeout = 10
+        self.i2p_tunnel_length = 2
+        self.i2p_tunnel_quantity = 0
+        self.i2p_tunnel_backups = 0
+
+    def shutdown(self):
+        """Stop the I2P threads"""
+        self.shutting_down = True
+        self.shutdown_event.set()
+
+
+if __name__ == '__main__':
+    SAMBridge(port=7656).serve_forever()
@@ -0,0 +1,95 @@
+"""Tests for the advertising of new objects and addresses"""
+import os
+import queue
+import time
+import unittest
+
+from minode import advertiser, connection, message, shared, structure
+
+
+class FakeConnection():
+    """Collects the messages queued for sending"""
+    def __init__(self):
+        self.send_queue = queue.Queue()
+        self.addresses_known = connection.KnownAddresses()
+
+    def sent(self):
+        """The list of queued messages"""
+        items = []
+        while not self.send_queue.empty():
+            items.append(self.send_queue.get_nowait())
+        return items
+
+
+class TestAdvertiser(unittest.TestCase):
+    """Test the batching and the relay of addresses"""
+
+    def setUp(self):
+        self.advertise_window = shared.advertise_window
+        self.addr_relay_fanout = shared.addr_relay_fanout
+        self.vector_advertise_queue = shared.vector_advertise_queue
+        shared.vector_advertise_queue = shared.AdvertiseQueue()
+        self.address_advertise_queue = shared.address_advertise_queue
+        shared.address_advertise_queue = shared.AdvertiseQueue()
+        self.connections = [FakeConnection() for _ in range(5)]
+        with shared.connections_lock:
+            self.established_connections = shared.established_connections
+            shared.established_connections = set(self.connections)
+
+    def tearDown(self):
+        shared.advertise_window = self.advertise_window
+        shared.addr_relay_fanout = self.addr_relay_fanout
+        shared.vector_advertise_queue = self.vector_advertise_queue
+        shared.address_advertise_queue = self.address_advertise_queue
+        with shared.connections_lock:
+            shared.established_connections = self.established_connections
+        shared.advertise_event.clear()
+
+    def test_window(self):
+        """The vectors arriving within the window go in one inv"""
+        shared.advertise_window = 0.2
+        shared.advertise_event.clear()
+        thread = advertiser.Advertiser()
+        thread.start()
+        try:
+            vectors = [os.urandom(32) for _ in range(3)]
+            for vector in vectors:
+                shared.vector_advertise_queue.put(vector)
+                time.sleep(0.05)
+            time.sleep(0.4)
+        finally:
+            shared.shutting_down = True
+            shared.advertise_event.set()
+            thread.join()
+            shared.shutting_down = False
+        for c in self.connections:
+            sent = c.sent()
+            self.assertEqual(len(sent), 1)
+            self.assertIsInstance(sent[0], message.Inv)
+            self.assertEqual(sent[0].vectors, set(vectors))
+
+    def test_fanout(self):
+        """Each address goes to the fanout of peers not knowing it"""
+        shared.addr_relay_fanout = 2
+        addresses = [
+            structure.NetAddr(1, '10.0.0.{}'.format(i), 8444)
+            for i in range(4)]
+        # already known to one peer
+        self.connections[0].addresses_known.update(
+            [(addresses[0].host, addresses[0].port)])
+        for addr in addresses:
+            shared.address_advertise_queue.put(addr)
+        # pylint: disable=protected-access
+        advertiser.Advertiser()._advertise_addresses()
+        received = {}
+        for i, c in enumerate(self.connections):
+            sent = c.sent()
+            self.assertLessEqual(len(sent), 1)
+            for m in sent:
+                for addr in m.addresses:
+                    received.setdefault(addr.host, []).append(i)
+        self.assertEqual(
+            sorted(received), [addr.host for addr in addresses])
+        for peers in received.values():
+            self.assertEqual(len(peers), 2)
+        self.assertNotIn(0, received[addresses[0].host])
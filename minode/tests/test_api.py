@@ -0,0 +1,242 @@
+"""Tests for the local API"""
+import json
+import os
+import queue
+import time
+import unittest
+import urllib.error
+import urllib.request
+
+from minode import api, feed, shared, structure
+
+from .test_validation import make_object
+
+
+class TestFeed(unittest.TestCase):
+    """The objects found by the indexes and by checking each"""
+
+    def setUp(self):
+        self.objects = shared.objects
+        shared.objects = {}
+
+    def tearDown(self):
+        shared.objects = self.objects
+
+    def test_filter(self):
+        """The same results with and without the indexes"""
+        objects = [
+            structure.Object(
+                b'\x00' * 8, int(time.time() + 3600), object_type, version,
+                1, bytes([prefix]) * 2 + os.urandom(40))
+            for object_type, version, prefix in (
+                (0, 4, 1), (1, 4, 1), (1, 4, 2), (3, 5, 1), (3, 4, 1),
+                (42, 1, 1), (1, 3, 1))]
+        shared.objects = {obj.vector: obj for obj in objects}
+        filters = [
+            feed.Filter(), feed.Filter(1), feed.Filter(1, 4),
+            feed.Filter(tag_prefix=b'\x01'),
+            feed.Filter(tag_prefix=b'\x01\x01'),
+            feed.Filter(1, tag_prefix=b'\x01'), feed.Filter(0, 5),
+            feed.Filter(tag_prefix=b'\x03')]
+        indexed = feed.Feed()
+        indexed.scan_limit = 0
+        checked = feed.Feed()
+        for f in (indexed, checked):
+            f.add(objects)
+
+        def vectors(f, flt, since=0):
+            return [vector for _, vector in f.since(since, flt=flt)]
+
+        expected = [
+            [obj.vector for obj in objects if flt.match(obj)]
+            for flt in filters]
+        self.assertEqual(
+            [len(vectors) for vectors in expected], [7, 3, 2, 3, 3, 1, 0, 0])
+        for f in (indexed, checked):
+            self.assertEqual([vectors(f, flt) for flt in filters], expected)
+            self.assertEqual(
+                vectors(f, filters[3], since=1),
+                [objects[1].vector, objects[3].vector])
+
+        # getpubkey objects for the same address have the same tag
+        tag = objects[1].tag
+        same = [
+            structure.Object(
+                b'\x00' * 8, int(time.time() + 3600), 0, 4, 1,
+                tag + bytes([i]))
+            for i in range(3)]
+        shared.objects.update((obj.vector, obj) for obj in same)
+        indexed.add(same)
+        self.assertEqual(
+            vectors(indexed, feed.Filter(0, tag_prefix=tag)),
+            [obj.vector for obj in same])
+        for obj in same[:2]:
+            del shared.objects[obj.vector]
+        indexed.prune()
+        self.assertEqual(
+            vectors(indexed, feed.Filter(tag_prefix=tag)),
+            [objects[1].vector, same[2].vector])
+        del shared.objects[same[2].vector]
+
+        del shared.objects[objects[1].vector]
+        indexed.prune()
+        self.assertEqual(
+            vectors(indexed, filters[1]),
+            [objects[2].vector, objects[6].vector])
+        self.assertEqual(indexed.since(3, flt=filters[2]), [])
+        self.assertEqual(indexed.since(2, flt=filters[1]), [
+            (3, objects[2].vector), (7, objects[6].vector)])
+
+
+class TestAPI(unittest.TestCase):
+    """Submit and get the objects through the HTTP API"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.listener = api.APIListener('127.0.0.1', 0)
+        cls.listener.start()
+        cls.url = 'http://127.0.0.1:{}'.format(
+            cls.listener.server.server_address[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.listener.server.shutdown()
+        cls.listener.server.server_close()
+
+    def setUp(self):
+        self.nonce_trials_per_byte = shared.nonce_trials_per_byte
+        shared.nonce_trials_per_byte = 2
+        self.stream = shared.stream
+        shared.stream = 1
+        self.vector_advertise_queue = shared.vector_advertise_queue
+        shared.vector_advertise_queue = queue.Queue()
+        self.objects = shared.objects
+        shared.objects = {}
+        feed.objects.reset()
+
+    def tearDown(self):
+        shared.nonce_trials_per_byte = self.nonce_trials_per_byte
+        shared.stream = self.stream
+        shared.vector_advertise_queue = self.vector_advertise_queue
+        shared.objects = self.objects
+        feed.objects.reset()
+
+    def request(self, path, body=None, method=None):
+        """The decoded JSON response"""
+        request = urllib.request.Request(
+            self.url + path, method=method,
+            data=None if body is None else json.dumps(body).encode())
+        with urllib.request.urlopen(  # nosec B310
+            request, timeout=5
+        ) as response:
+            return json.loads(response.read())
+
+    def test_objects(self):
+        """Bulk submit, get by vector and list the vectors since"""
+        objects = [make_object(str(i).encode()) for i in range(3)]
+        expired = make_object(b'expired', ttl=-4 * 3600)
+        datas = [obj.to_bytes().hex() for obj in objects]
+        results = self.request('/objects', {'objects': datas + [
+            datas[0], expired.to_bytes().hex(), 'not hex']})['results']
+        self.assertEqual(
+            [result['status'] for result in results],
+            ['added'] * 3 + ['duplicate', 'invalid', 'malformed'])
+        self.assertEqual(results[4]['reason'], 'expired')
+        self.assertEqual(
+            [result['vector'] for result in results[:3]],
+            [obj.vector.hex() for obj in objects])
+        self.assertEqual(shared.vector_advertise_queue.qsize(), 3)
+
+        response = self.request('/objects/' + objects[1].vector.hex())
+        self.assertEqual(response['object'], datas[1])
+        with self.assertRaises(urllib.error.HTTPError) as e:
+            self.request('/objects/' + expired.vector.hex())
+        self.assertEqual(e.exception.code, 404)
+
+        epoch = feed.objects.epoch
+        response = self.request('/vectors?since=1&limit=1')
+        self.assertEqual(response, {
+            'vectors': [objects[1].vector.hex()], 'last': 2,
+            'epoch': epoch})
+        del shared.objects[objects[2].vector]
+        feed.objects.prune()
+        self.assertEqual(self.request('/vectors?since=2&epoch=' + epoch), {
+            'vectors': [], 'last': 3, 'epoch': epoch})
+        # the numbers from the previous run of the node
+        self.assertEqual(
+            len(self.request('/vectors?since=100')['vectors']), 2)
+        self.assertEqual(
+            len(self.request('/vectors?since=1&epoch=other')['vectors']), 2)
+        self.assertEqual(
+            len(self.request('/vectors?since=1&epoch=' + epoch)['vectors']),
+            1)
+
+    def test_subscribe(self):
+        """The objects added before and after subscribing"""
+        objects = [make_object(str(i).encode()) for i in range(3)]
+        self.request(
+            '/objects', {'objects': [objects[0].to_bytes().hex()]})
+        with urllib.request.urlopen(  # nosec B310
+            self.url + '/subscribe', timeout=5
+        ) as response:
+            line = json.loads(response.readline())
+            self.assertEqual(line['seq'], 1)
+            self.assertEqual(line['epoch'], feed.objects.epoch)
+            self.assertEqual(line['vector'], objects[0].vector.hex())
+            self.request('/objects', {'objects': [
+                obj.to_bytes().hex() for obj in objects[1:]]})
+            for seq, obj in enumerate(objects[1:], start=2):
+                line = json.loads(response.readline())
+                self.assertEqual(line['seq'], seq)
+                self.assertEqual(
+                    structure.Object.from_bytes(
+                        bytes.fromhex(line['object'])).vector,
+                    obj.vector)
+
+    def test_filter(self):
+        """Only the pubkeys with the tag prefix"""
+        tag = os.urandom(32)
+        objects = [
+            make_object(tag + b'pubkey', object_type=1, version=4),
+            make_object(tag + b'getpubkey', object_type=0, version=4),
+            make_object(tag + b'other', version=4),
+            make_object(b'\x00' + tag + b'pubkey', object_type=1, version=4),
+            make_object(tag + b'later pubkey', object_type=1, version=4)]
+        self.request('/objects', {'objects': [
+            obj.to_bytes().hex() for obj in objects[:4]]})
+        self.assertEqual(
+            self.request('/vectors?type=1&tag=' + tag[:4].hex()),
+            {'vectors': [objects[0].vector.hex()], 'last': 1,
+             'epoch': feed.objects.epoch})
+        self.assertEqual(
+            len(self.request('/vectors?version=4')['vectors']), 4)
+        with urllib.request.urlopen(  # nosec B310
+            self.url + '/subscribe?type=1&since=1&tag=' + tag.hex(),
+            timeout=5
+        ) as response:
+            self.request(
+                '/objects', {'objects': [objects[4].to_bytes().hex()]})
+            line = json.loads(response.readline())
+            self.assertEqual(line['seq'], 5)
+            self.assertEqual(line['vector'], objects[4].vector.hex())
+
+    def test_errors(self):
+        """The malformed requests"""
+        for path, body in (
+            ('/objects', {'vectors': []}), ('/objects', {'objects': 'x'}),
+            ('/pow', {'objects': ['00']}),
+            ('/pow', {'objects': [], 'priority': 2 ** 31}),
+            ('/pow', {'objects': [], 'priority': -2 ** 31 - 1}),
+            ('/unknown', {})
+        ):
+            with self.assertRaises(urllib.error.HTTPError) as e:
+                self.request(path, body)
+            self.assertEqual(
+                e.exception.code, 404 if path == '/unknown' else 400)
+        with self.assertRaises(urllib.error.HTTPError) as e:
+            self.request('/pow/unknown', method='DELETE')
+        self.assertEqual(e.exception.code, 404)
+        self.assertEqual(self.request('/pow'), {'jobs': []})
+        with self.assertRaises(urllib.error.HTTPError) as e:
+            self.request('/vectors?tag=xyz')
+        self.assertEqual(e.exception.code, 400)
@@ -0,0 +1,32 @@
+"""Tests for bandwidth limiting"""
+import time
+import unittest
+
+from minode import bandwidth
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Test the token bucket used for rate limiting"""
+
+    def test_unlimited(self):
+        """Zero rate means no limit"""
+        bucket = bandwidth.TokenBucket()
+        self.assertEqual(bucket.available(2**20), 2**20)
+        bucket.consume(2**20)
+        self.assertEqual(bucket.available(2**20), 2**20)
+
+    def test_limit(self):
+        """Consume the burst and wait for refill"""
+        bucket = bandwidth.TokenBucket(10000)
+        self.assertEqual(bucket.available(4096), 4096)
+        self.assertEqual(bucket.available(20000), 10000)
+        bucket.consume(10000)
+        self.assertLess(bucket.available(4096), 1000)
+        time.sleep(0.5)
+        self.assertGreater(bucket.available(10000), 4000)
+        # debt
+        bucket.consume(20000)
+        self.assertEqual(bucket.available(4096), 0)
+
+        bucket.set_rate(0)
+        self.assertEqual(bucket.available(4096), 4096)
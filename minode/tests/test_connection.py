@@ -0,0 +1,260 @@
+"""Tests for the connection internals not requiring the network"""
+import os
+import queue
+import socket
+import time
+import unittest
+
+from minode import (
+    connection, message, metrics, sendqueue, shared, structure, timing)
+
+from .test_validation import make_object
+
+
+class TestSendQueue(unittest.TestCase):
+    """Test the prioritized send queue of a connection"""
+
+    def test_priority(self):
+        """Control messages go ahead of inventory and objects"""
+        q = sendqueue.SendQueue()
+        self.assertTrue(q.empty())
+        with self.assertRaises(queue.Empty):
+            q.get()
+        obj = message.Message(b'object', os.urandom(1000))
+        inv = message.Inv([os.urandom(32) for _ in range(10)])
+        q.put(obj)
+        q.put(inv)
+        q.put(message.Message(b'pong', b''))
+        q.put('fully_established')
+        q.put(None)
+        self.assertEqual(q.qsize(), 5)
+        self.assertEqual(q.object_bytes, 1024)
+        self.assertTrue(q.has_control())
+        self.assertEqual(q.get().command, b'pong')
+        self.assertEqual(q.get(), 'fully_established')
+        self.assertIsNone(q.get())
+        self.assertFalse(q.has_control())
+        self.assertEqual(q.get(), inv)
+        self.assertEqual(q.get(), obj)
+        self.assertTrue(q.empty())
+        self.assertEqual(q.object_bytes, 0)
+
+    def test_fairness(self):
+        """Inventory and objects share the queue by quantums"""
+        q = sendqueue.SendQueue((65536, 65536))
+        objects = [
+            message.Message(b'object', os.urandom(8192 - 24))
+            for _ in range(32)]
+        invs = [
+            message.Inv([os.urandom(32) for _ in range(255)])
+            for _ in range(32)]
+        for obj, inv in zip(objects, invs):
+            q.put(obj)
+            q.put(inv)
+        self.assertEqual(q.object_bytes, 32 * 8192)
+        self.assertTrue(q.accepts_objects())
+        limit = shared.send_queue_object_bytes
+        try:
+            shared.send_queue_object_bytes = 65536
+            self.assertFalse(q.accepts_objects())
+        finally:
+            shared.send_queue_object_bytes = limit
+        sent = [q.get() for _ in range(32)]
+        sent_objects = sum(1 for m in sent if m in objects)
+        self.assertGreater(sent_objects, 10)
+        self.assertGreater(32 - sent_objects, 10)
+        # FIFO inside the class
+        self.assertEqual([m for m in sent if m in objects], objects[:16])
+
+
+class Socket():
+    """Accepts *budget* bytes, at most 100 at once"""
+    def __init__(self, budget):
+        self.budget = budget
+        self.data = b''
+
+    def send(self, data):
+        """Keep the accepted part of *data*"""
+        if not self.budget:
+            raise BlockingIOError
+        amount = min(len(data), 100, self.budget)
+        self.budget -= amount
+        self.data += bytes(data[:amount])
+        return amount
+
+
+class TestSend(unittest.TestCase):
+    """Test the order of the sent messages"""
+
+    def test_control(self):
+        """Control messages wait for the object being sent, not the queue"""
+        c = connection.Connection('127.0.0.1', 8444, Socket(150))
+        objects = [
+            message.Message(b'object', os.urandom(300)) for _ in range(2)]
+        ping = message.Message(b'ping', b'')
+        # pylint: disable=protected-access
+        for m in objects:
+            c._send_message(m)
+        c._send_data()
+        c._send_message(ping)
+        # the rest of the first object is not copied
+        self.assertIsInstance(c.buffer_send_object, memoryview)
+        self.assertEqual(c.buffer_send, ping.to_bytes())
+        c.s.budget = 10000
+        while c.buffer_send_bulk or c.buffer_send_object:
+            c._send_data()
+        self.assertEqual(
+            c.s.data,
+            objects[0].to_bytes() + ping.to_bytes() + objects[1].to_bytes())
+
+    def test_relay(self):
+        """The relay is complete when the inv is written to the socket"""
+        c = connection.Connection('127.0.0.1', 8444, Socket(150))
+        inv = message.Inv([os.urandom(32) for _ in range(10)])
+        inv.relay = timing.Relay(inv.vectors, 1)
+        # pylint: disable=protected-access
+        c._send_message(message.Message(b'ping', b''))
+        c._send_message(inv)
+        while c.s.budget:
+            c._send_data()
+        self.assertEqual(inv.relay.pending, 1)
+        c.s.budget = 10000
+        while c.buffer_send:
+            c._send_data()
+        self.assertEqual(inv.relay.pending, 0)
+        self.assertFalse(c.relays)
+
+
+class TestAddresses(unittest.TestCase):
+    """Test the handling of received addresses"""
+
+    def setUp(self):
+        shared.unchecked_node_pool.clear()
+
+    def tearDown(self):
+        shared.unchecked_node_pool.clear()
+
+    def test_known(self):
+        """The set of known addresses is bounded"""
+        known = connection.KnownAddresses(10)
+        known.update(('127.0.0.{}'.format(i), 8444) for i in range(20))
+        self.assertEqual(len(known), 10)
+        self.assertNotIn(('127.0.0.1', 8444), known)
+        self.assertIn(('127.0.0.19', 8444), known)
+
+    def test_rate_limit(self):
+        """A peer can not fill the unchecked node pool at once"""
+        c = connection.Connection('127.0.0.1', 8444)
+        c.addr_bucket.set_rate(0.1, 100)
+        addresses = [
+            structure.NetAddr(1, '10.0.{}.{}'.format(i // 250, i % 250), 8444)
+            for i in range(500)]
+        # pylint: disable=protected-access
+        c._process_msg_addr(message.Message.from_bytes(
+            message.Addr(addresses).to_bytes()))
+        self.assertEqual(len(shared.unchecked_node_pool), 100)
+        self.assertEqual(len(c.addresses_known), 500)
+        c._process_msg_addr(message.Message.from_bytes(
+            message.Addr(addresses[:10]).to_bytes()))
+        self.assertEqual(len(shared.unchecked_node_pool), 100)
+
+    def test_full_pool(self):
+        """New addresses replace the old ones, the bootstrapper's are all"""
+        limit = shared.unchecked_node_pool_limit
+        shared.unchecked_node_pool_limit = 100
+        try:
+            old = {('10.1.0.{}'.format(i), 8444) for i in range(100)}
+            shared.unchecked_node_pool.update(old)
+            c = connection.Connection('127.0.0.1', 8444)
+            c.addr_bucket.set_rate(0.1, 10)
+            addresses = [
+                structure.NetAddr(1, '10.2.0.{}'.format(i), 8444)
+                for i in range(50)]
+            # pylint: disable=protected-access
+            c._process_msg_addr(message.Message.from_bytes(
+                message.Addr(addresses).to_bytes()))
+            self.assertEqual(len(shared.unchecked_node_pool), 100)
+            self.assertEqual(len(shared.unchecked_node_pool - old), 10)
+
+            c = connection.Bootstrapper('127.0.0.1', 8444)
+            c.addr_bucket.set_rate(0.1, 10)
+            addresses = [
+                structure.NetAddr(1, '10.3.0.{}'.format(i), 8444)
+                for i in range(40)]
+            c._process_msg_addr(message.Message.from_bytes(
+                message.Addr(addresses).to_bytes()))
+            self.assertEqual(len(shared.unchecked_node_pool), 100)
+            self.assertTrue(all(
+                (a.host, a.port) in shared.unchecked_node_pool
+                for a in addresses))
+        finally:
+            shared.unchecked_node_pool_limit = limit
+
+
+class TestObjects(unittest.TestCase):
+    """Test the validation of received objects"""
+
+    def setUp(self):
+        self.nonce_trials_per_byte = shared.nonce_trials_per_byte
+        shared.nonce_trials_per_byte = 2
+        self.stream = shared.stream
+        shared.stream = 1
+        self.objects = shared.objects
+        shared.objects = {}
+        self.vector_advertise_queue = shared.vector_advertise_queue
+        shared.vector_advertise_queue = queue.Queue()
+
+    def tearDown(self):
+        shared.nonce_trials_per_byte = self.nonce_trials_per_byte
+        shared.stream = self.stream
+        shared.objects = self.objects
+        shared.vector_advertise_queue = self.vector_advertise_queue
+
+    def test_duplicate(self):
+        """The same object twice in the buffer is validated once"""
+        obj = make_object(b'duplicate')
+        m = message.Message(b'object', obj.to_bytes())
+        c = connection.Connection('127.0.0.1', 8444)
+        counts = metrics.objects_received.values.copy()
+        # pylint: disable=protected-access
+        c._process_msg_object(m)
+        c._process_msg_object(m)
+        c._validate_objects()
+        self.assertIn(obj.vector, shared.objects)
+        self.assertEqual(shared.vector_advertise_queue.qsize(), 1)
+        for result in ('valid', 'duplicate'):
+            self.assertEqual(
+                metrics.objects_received.values.get((result,), 0)
+                - counts.get((result,), 0), 1)
+
+
+class TestTLS(unittest.TestCase):
+    """Test the TLS handshake state"""
+
+    def test_context(self):
+        """Contexts are created once for each side"""
+        self.assertIs(
+            connection.tls_context(True), connection.tls_context(True))
+        self.assertIsNot(
+            connection.tls_context(True), connection.tls_context(False))
+
+    def test_timeout(self):
+        """The stalled handshake is abandoned after the timeout"""
+        tls_timeout = shared.tls_timeout
+        shared.tls_timeout = 0.5
+        local, remote = socket.socketpair()
+        try:
+            local.settimeout(0)
+            c = connection.Connection('127.0.0.1', 8444, local)
+            started = time.monotonic()
+            # pylint: disable=protected-access
+            c._start_tls_handshake()
+            while c._do_tls_handshake():
+                self.assertLess(time.monotonic() - started, 5)
+            self.assertEqual(c.status, 'disconnecting')
+            self.assertFalse(c.tls)
+            self.assertGreaterEqual(time.monotonic() - started, 0.3)
+        finally:
+            shared.tls_timeout = tls_timeout
+            local.close()
+            remote.close()
@@ -0,0 +1,57 @@
+"""Tests for the DNS bootstrap cache"""
+import os
+import queue
+import shutil
+import tempfile
+import unittest
+
+from minode import main, shared
+from minode.manager import Manager
+
+
+class TestDNSCache(unittest.TestCase):
+    """Test saving and using the resolved bootstrap nodes"""
+
+    def setUp(self):
+        self.data_directory = shared.data_directory
+        self.core_nodes = shared.core_nodes
+        shared.data_directory = tempfile.mkdtemp()
+        shared.core_nodes = set()
+        self.node_pool = shared.node_pool
+        shared.node_pool = set()
+        shared.bootstrap_nodes_queue = queue.Queue()
+
+    def tearDown(self):
+        shutil.rmtree(shared.data_directory)
+        shared.data_directory = self.data_directory
+        shared.core_nodes = self.core_nodes
+        shared.node_pool = self.node_pool
+
+    def test_cached(self):
+        """Fresh cache is used without resolving"""
+        nodes = {('127.0.0.1', 8444), ('::1', 8080)}
+        # pylint: disable=protected-access
+        main._save_dns_cache(nodes)
+        cached, age = main._load_dns_cache()
+        self.assertEqual(cached, nodes)
+        self.assertLess(age, 60)
+
+        main.bootstrap_from_dns()
+        self.assertEqual(shared.core_nodes, nodes)
+
+        os.remove(os.path.join(shared.data_directory, 'dns_cache.csv'))
+        self.assertEqual(main._load_dns_cache(), (set(), None))
+
+    def test_bootstrap_pool(self):
+        """The resolved nodes are tried first by the Manager"""
+        nodes = {('127.0.0.1', 8444), ('::1', 8080)}
+        main._save_dns_cache(nodes)  # pylint: disable=protected-access
+        manager = Manager()
+        manager.bootstrap_pool = [('127.0.0.2', 8444), ('::1', 8080)]
+        main.bootstrap_from_dns()
+        manager.add_bootstrap_nodes()
+        self.assertEqual(shared.node_pool, nodes)
+        self.assertEqual(manager.bootstrap_pool[:2], [
+            ('127.0.0.2', 8444), ('::1', 8080)])
+        self.assertEqual(manager.bootstrap_pool.pop(), ('127.0.0.1', 8444))
+        self.assertEqual(len(manager.bootstrap_pool), 2)
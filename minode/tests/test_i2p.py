@@ -0,0 +1,155 @@
+"""Tests for the I2P SAM protocol helpers"""
+import socket
+import time
+import unittest
+
+from minode import i2p
+from minode.i2p.util import LineReader, pub_from_priv
+
+from .sam_bridge import SAMBridge, State
+
+
+class TestLineReader(unittest.TestCase):
+    """Test reading the SAM lines from a stream socket"""
+
+    def setUp(self):
+        self.local, self.remote = socket.socketpair()
+        self.local.settimeout(2)
+
+    def tearDown(self):
+        self.local.close()
+        self.remote.close()
+
+    def test_lines(self):
+        """The lines split across the packets or sent together"""
+        reader = LineReader(self.local)
+        self.remote.sendall(b'HELLO REPLY RESULT=OK')
+        self.remote.sendall(b' VERSION=3.3\nPING 1\r\nPI')
+        self.assertEqual(
+            reader.readline(), b'HELLO REPLY RESULT=OK VERSION=3.3')
+        self.assertEqual(reader.readline(), b'PING 1')
+        self.remote.sendall(b'NG 2\n')
+        self.assertEqual(reader.readline(), b'PING 2')
+        self.remote.close()
+        with self.assertRaises(ConnectionResetError):
+            reader.readline()
+
+    def test_rest(self):
+        """The data after the reply is not lost"""
+        reader = LineReader(self.local)
+        data = b'\xe9\xbe\xb4\xd9version\x00\x00\x00\x00\x00\nabc'
+        self.remote.sendall(b'STREAM STATUS RESULT=OK\n' + data)
+        self.assertEqual(reader.readline(), b'STREAM STATUS RESULT=OK')
+        self.assertEqual(reader.rest(), data)
+        self.assertEqual(reader.rest(), b'')
+
+    def test_timeout(self):
+        """The partial line is kept on timeout"""
+        reader = LineReader(self.local)
+        self.local.settimeout(0.1)
+        self.remote.sendall(b'abc')
+        with self.assertRaises(socket.timeout):
+            reader.readline()
+        self.remote.sendall(b'def\n')
+        self.assertEqual(reader.readline(), b'abcdef')
+
+
+class TestSAM(unittest.TestCase):
+    """Test the I2P threads with the SAM bridge stand-in"""
+
+    def setUp(self):
+        self.bridge = SAMBridge().start()
+        # the listening and the dialing nodes
+        self.state = State()
+        self.controller = i2p.I2PController(
+            self.state, port=self.bridge.port)
+        self.controller.start()
+        self.remote = State()
+        self.remote_controller = i2p.I2PController(
+            self.remote, port=self.bridge.port)
+        self.remote_controller.start()
+
+    def tearDown(self):
+        for state in (self.state, self.remote):
+            state.shutdown()
+            if state.i2p_sam_pool:
+                state.i2p_sam_pool.close()
+            for c in state.connections:
+                c.s.close()
+        self.controller.join(5)
+        self.remote_controller.join(5)
+        self.bridge.stop()
+
+    def listen(self, n=1):
+        """Start the listeners"""
+        for _ in range(n):
+            i2p.I2PListener(
+                self.state, self.controller.nick, port=self.bridge.port
+            ).start()
+
+    def dial(self, destination=None):
+        """Dial the listening node and wait for the dialer"""
+        dialer = i2p.I2PDialer(
+            self.remote, destination or self.controller.dest_pub,
+            self.remote_controller.nick, sam_port=self.bridge.port)
+        dialer.start()
+        dialer.join(10)
+        return dialer
+
+    def wait_stream(self, state):
+        """The first stream of the node"""
+        for _ in range(50):
+            if state.connections:
+                return next(iter(state.connections))
+            time.sleep(0.1)
+        self.fail('No stream established')
+        return None
+
+    def test_session(self):
+        """The session with the tunnel options"""
+        self.assertEqual(
+            pub_from_priv(self.controller.dest_priv),
+            self.controller.dest_pub)
+        session = self.bridge.sessions[self.controller.nick]
+        self.assertEqual(session.options[b'inbound.length'], b'2')
+        self.assertNotIn(b'inbound.quantity', session.options)
+
+    def test_stream(self):
+        """The data sent right after the connect is not lost"""
+        self.listen(2)
+        self.assertTrue(self.dial().success)
+        outgoing = self.wait_stream(self.remote)
+        self.assertFalse(outgoing.server)
+        self.assertEqual(
+            outgoing.i2p_session, self.remote_controller.nick.decode())
+        outgoing.s.sendall(b'version')
+        incoming = self.wait_stream(self.state)
+        self.assertTrue(incoming.server)
+        self.assertEqual(incoming.host, self.remote_controller.dest_pub)
+        data = incoming.buffer_receive
+        incoming.s.settimeout(5)
+        while len(data) < 7:
+            data += incoming.s.recv(7)
+        self.assertEqual(data, b'version')
+
+    def test_pool(self):
+        """The dialer takes the ready socket from the pool"""
+        self.remote.i2p_sam_pool = i2p.SAMPool(
+            port=self.bridge.port, size=2)
+        self.remote.i2p_sam_pool.fill()
+        self.listen()
+        for _ in range(50):
+            if self.remote.i2p_sam_pool.sockets.qsize() == 2:
+                break
+            time.sleep(0.1)
+        self.assertTrue(self.dial().success)
+        self.assertTrue(self.wait_stream(self.state))
+
+    def test_loss(self):
+        """The failed connects are reported"""
+        self.bridge.loss = 1
+        self.listen()
+        self.assertFalse(self.dial().success)
+        self.bridge.loss = 0
+        self.assertFalse(self.dial(b'unknown').success)
+        self.assertFalse(self.remote.connections)
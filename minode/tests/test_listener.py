@@ -0,0 +1,67 @@
+"""Tests for the listener"""
+import socket
+import time
+import unittest
+
+from minode import shared
+from minode.listener import Listener
+
+
+class FakeConnection():  # pylint: disable=too-few-public-methods
+    """A connection with the attributes checked by the listener"""
+    def __init__(self, host):
+        self.host = host
+        self.network = 'ip'
+        self.status = 'fully_established'
+
+
+class TestListener(unittest.TestCase):
+    """Test accepting and rejecting incoming connections"""
+
+    def setUp(self):
+        self.connection_limit = shared.connection_limit
+        shared.connections.clear()
+
+    def tearDown(self):
+        shared.connection_limit = self.connection_limit
+        for c in shared.connections:
+            c.status = 'disconnecting'
+        shared.connections.clear()
+
+    def test_reject(self):
+        """Over the limit and the same network group are rejected"""
+        shared.connection_limit = 1
+        shared.connections.add(FakeConnection('1.2.3.4'))
+        self.assertIsNone(Listener.reject('127.0.0.1'))
+        self.assertIsNone(Listener.reject('1.3.3.4'))
+        self.assertEqual(
+            Listener.reject('1.2.5.6'),
+            'already connected to the network group')
+        shared.connections.add(FakeConnection('::1'))
+        self.assertEqual(
+            Listener.reject('::1'), 'connection limit reached')
+
+    @unittest.skipUnless(socket.has_ipv6, 'IPv6 is not supported')
+    def test_dual_stack(self):
+        """IPv4 connection accepted by the IPv6 socket, with the backlog"""
+        shared.connection_limit = 2
+        try:
+            listener = Listener('', 0, family=socket.AF_INET6, backlog=16)
+        except OSError:
+            self.skipTest('Failed to bind the dual-stack socket')
+        port = listener.s.getsockname()[1]
+        listener.start()
+        try:
+            with socket.create_connection(('127.0.0.1', port), 5):
+                for _ in range(50):
+                    if shared.connections:
+                        break
+                    time.sleep(0.1)
+                self.assertEqual(len(shared.connections), 1)
+                c = next(iter(shared.connections))
+                self.assertEqual(c.host, '127.0.0.1')
+                self.assertTrue(c.server)
+        finally:
+            listener.close()
+            listener.join(5)
+        self.assertFalse(listener.is_alive())
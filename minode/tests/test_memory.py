@@ -40,13 +40,21 @@ class TestListener(TestProcessProto):
             if not self._stop_process(10):
                 self.fail('Failed to stop the client process')
 
+            # the process exits before the connection notices
+            started = time.time()
+            while all(
+                c.is_alive() and c.status != 'disconnected'
+                for c in shared.connections.copy()
+            ):
+                if time.time() - started > 10:
+                    self.fail('The connection is alive')
+                time.sleep(0.2)
+
             for c in shared.connections.copy():
                 if not c.is_alive() or c.status == 'disconnected':
                     shared.connections.remove(c)
                     c = None
                     break
-            else:
-                self.fail('The connection is alive')
 
             gc.collect()
             for obj in gc.get_objects():
@@ -4,7 +4,7 @@ import time
 import unittest
 from binascii import unhexlify
 
-from minode import message
+from minode import message, structure
 from minode.shared import magic_bytes
 
 
@@ -73,6 +73,49 @@ class TestMessage(unittest.TestCase):
         self.assertEqual(address.port, 8444)
         self.assertEqual(address.host, '127.0.0.1')
 
+    def test_cached_bytes(self):
+        """Messages are serialized once"""
+        msg = message.Message.from_bytes(sample_ping_msg)
+        self.assertIs(msg.to_bytes(), sample_ping_msg)
+        msg = message.Message(b'ping', b'test')
+        self.assertIs(msg.to_bytes(), msg.to_bytes())
+
+        inv = message.Inv([b'\x01' * 32, b'\x02' * 32])
+        self.assertIs(inv.to_bytes(), inv.to_bytes())
+        self.assertEqual(
+            message.Inv.from_message(
+                message.Message.from_bytes(inv.to_bytes())).vectors,
+            inv.vectors)
+
+        addr = message.Addr([
+            structure.NetAddr(1, '127.0.0.1', 8444),
+            structure.NetAddr(1, '127.0.0.1', 8444),
+            structure.NetAddr(1, '127.0.0.2', 8444)])
+        data = addr.to_bytes()
+        self.assertIs(addr.to_bytes(), data)
+        self.assertEqual(data[24], 2)  # duplicates are omitted
+        self.assertEqual(
+            len(message.Addr.from_message(
+                message.Message.from_bytes(data)).addresses), 2)
+
+    def test_frame_cache(self):
+        """Object frames are kept within the size limit"""
+        cache = message.FrameCache(100)
+        cache.put(b'\x01' * 32, b'a' * 40)
+        cache.put(b'\x02' * 32, b'b' * 40)
+        self.assertEqual(cache.get(b'\x01' * 32), b'a' * 40)
+        cache.put(b'\x03' * 32, b'c' * 40)
+        # the least recently used is dropped
+        self.assertIsNone(cache.get(b'\x02' * 32))
+        self.assertEqual(len(cache), 2)
+        self.assertLessEqual(cache.used, 100)
+
+        frame = message.ObjectFrame(
+            b'\x01' * 32, message.Message(b'object', b'test').to_bytes())
+        self.assertEqual(frame.payload_length, 4)
+        self.assertEqual(
+            message.Message.from_bytes(frame.to_bytes()).payload, b'test')
+
     def test_version(self):
         """Test version message"""
         msg = message.Message.from_bytes(sample_version_msg)
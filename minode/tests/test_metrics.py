@@ -0,0 +1,102 @@
+"""Tests for the metrics endpoint"""
+import unittest
+import urllib.request
+
+from minode import connection, metrics, shared, timing
+
+
+class TestMetrics(unittest.TestCase):
+    """Test counters and their export"""
+
+    def test_export(self):
+        """Check the text format of counters and gauges"""
+        counter = metrics.Counter('test_total', 'Test', ('command',))
+        counter.inc(b'inv')
+        counter.inc(b'inv', n=2)
+        summary = metrics.Summary('test_seconds', 'Test')
+        summary.observe(0.5)
+        try:
+            data = metrics.export()
+        finally:
+            metrics.registry.remove(counter)
+            metrics.registry.remove(summary)
+        self.assertIn('# TYPE test_total counter', data)
+        self.assertIn('test_total{command="inv"} 3', data)
+        self.assertIn('test_seconds_count 1', data)
+        self.assertIn('test_seconds_sum 0.5', data)
+        self.assertIn('minode_objects{value="count"}', data)
+        self.assertIn('minode_node_pool_size{pool="node_pool"}', data)
+
+    def test_command_label(self):
+        """The unknown commands sent by peers share one label value"""
+        self.assertEqual(metrics.command_label(b'inv'), b'inv')
+        self.assertEqual(metrics.command_label(b'getblocks'), b'other')
+        self.assertEqual(metrics.command_label(b'\xff' * 12), b'other')
+
+    def test_i2p_streams(self):
+        """The I2P streams are counted by session and direction"""
+        connections = [
+            connection.Connection(
+                b'dest', 'i2p', None, 'i2p', server, b'dest')
+            for server in (True, True, False)]
+        for c in connections:
+            c.i2p_session = 'MiNode_test'
+        shared.connections.update(connections)
+        try:
+            data = metrics.export()
+        finally:
+            shared.connections.difference_update(connections)
+        self.assertIn(
+            'minode_i2p_streams{session="MiNode_test",direction="incoming"}'
+            ' 2', data)
+        self.assertIn(
+            'minode_i2p_streams{session="MiNode_test",direction="outgoing"}'
+            ' 1', data)
+
+    def test_endpoint(self):
+        """Start the listener and make a request"""
+        listener = metrics.MetricsListener('127.0.0.1', 0)
+        listener.start()
+        try:
+            with urllib.request.urlopen(  # nosec B310
+                'http://127.0.0.1:{}/metrics'.format(
+                    listener.server.server_address[1]), timeout=5
+            ) as response:
+                self.assertEqual(response.status, 200)
+                self.assertIn(b'minode_connections', response.read())
+        finally:
+            listener.server.shutdown()
+            listener.server.server_close()
+
+    def test_timing(self):
+        """Histograms of the stages and the relay tracking"""
+        timing.observe('parse', b'inv', '127.0.0.1:8444', 0.003)
+        timing.observe('parse', b'inv', '127.0.0.1:8444', 100)
+        data = metrics.export()
+        self.assertIn(
+            'minode_stage_seconds_bucket{stage="parse",command="inv",'
+            'le="0.0025"} 0', data)
+        self.assertIn(
+            'minode_stage_seconds_bucket{stage="parse",command="inv",'
+            'le="0.005"} 1', data)
+        self.assertIn(
+            'minode_stage_seconds_bucket{stage="parse",command="inv",'
+            'le="+Inf"} 2', data)
+        self.assertIn(
+            'minode_peer_stage_seconds_count{stage="parse",'
+            'peer="127.0.0.1:8444"} 2', data)
+        timing.observe('process', b'junk\x01', '127.0.0.1:8444', 0.1)
+        self.assertIn(
+            'minode_stage_seconds_count{stage="process",command="other"} 1',
+            metrics.export())
+        timing.forget_peer('127.0.0.1:8444')
+        self.assertNotIn('peer="127.0.0.1:8444"', metrics.export())
+
+        vector = b'\x01' * 32
+        timing.seen(vector)
+        relay = timing.Relay({vector}, 2)
+        relay.sent()
+        self.assertIn(vector, timing.first_seen)
+        relay.sent()
+        self.assertNotIn(vector, timing.first_seen)
+        self.assertIn('minode_relay_seconds_count 1', metrics.export())
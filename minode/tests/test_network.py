@@ -67,10 +67,14 @@ class TestNetwork(unittest.TestCase):
         shared.core_nodes.clear()
         shared.unchecked_node_pool.clear()
         shared.objects = {}
-        try:
-            os.remove(os.path.join(shared.data_directory, 'objects.pickle'))
-        except FileNotFoundError:
-            pass
+        for name in (
+            'objects.pickle', 'objects.wal', 'objects.wal.old',
+            'dns_cache.csv'
+        ):
+            try:
+                os.remove(os.path.join(shared.data_directory, name))
+            except FileNotFoundError:
+                pass
 
     def _make_initial_nodes(self):
         Manager.load_data()
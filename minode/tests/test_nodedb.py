@@ -0,0 +1,82 @@
+"""Tests for the binary node database"""
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from minode import nodedb, shared
+
+
+class TestNodeDatabase(unittest.TestCase):
+    """Test saving, loading and recovery of the node pools"""
+
+    def setUp(self):
+        self.data_directory = shared.data_directory
+        shared.data_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(shared.data_directory)
+        shared.data_directory = self.data_directory
+
+    def test_incremental(self):
+        """Changes are appended and replayed"""
+        db = nodedb.NodeDatabase('nodes.dat')
+        self.assertEqual(db.load(), set())
+        nodes = {('127.0.0.1', 8444), ('::1', 8444), ('1.2.3.4', 8080)}
+        db.save(nodes)
+        size = os.path.getsize(db.path)
+        self.assertEqual(
+            size, nodedb.header.size + 3 * nodedb.ip_record.size)
+
+        nodes = {('127.0.0.1', 8444), ('5.6.7.8', 8444), ('bad host', 1)}
+        db.save(nodes)
+        # one removed, one added, the invalid is skipped
+        self.assertEqual(
+            os.path.getsize(db.path), size + 3 * nodedb.ip_record.size)
+        self.assertEqual(
+            nodedb.NodeDatabase('nodes.dat').load(),
+            {('127.0.0.1', 8444), ('5.6.7.8', 8444)})
+
+    def test_torn_record(self):
+        """A partial record at the end is dropped"""
+        db = nodedb.I2PNodeDatabase('i2p_nodes.dat')
+        db.load()
+        db.save({(b'a' * 516, 'i2p')})
+        db.save({(b'a' * 516, 'i2p'), (b'b' * 516, 'i2p')})
+        size = os.path.getsize(db.path)
+        with open(db.path, 'r+b') as dst:
+            dst.truncate(size - 10)
+
+        db = nodedb.I2PNodeDatabase('i2p_nodes.dat')
+        self.assertEqual(db.load(), {(b'a' * 516, 'i2p')})
+        self.assertEqual(os.path.getsize(db.path), size - 523)
+        db.save({(b'a' * 516, 'i2p'), (b'c' * 516, 'i2p')})
+        self.assertEqual(
+            nodedb.I2PNodeDatabase('i2p_nodes.dat').load(),
+            {(b'a' * 516, 'i2p'), (b'c' * 516, 'i2p')})
+
+    def test_migrate(self):
+        """Nodes are read from the legacy pickle and the file is compacted"""
+        nodes = {('127.0.0.1', 8444), ('127.0.0.2', 8444)}
+        with open(
+            os.path.join(shared.data_directory, 'nodes.pickle'), 'wb'
+        ) as dst:
+            pickle.dump(nodes, dst, protocol=3)
+        db = nodedb.NodeDatabase('nodes.dat', 'nodes.pickle')
+        self.assertEqual(db.load(), nodes)
+        self.assertIsNone(db.records)
+        db.save(nodes)
+        self.assertEqual(db.records, 2)
+        self.assertEqual(nodedb.NodeDatabase('nodes.dat').load(), nodes)
+
+    def test_compact(self):
+        """The log is rewritten when it's mostly removals"""
+        db = nodedb.NodeDatabase('nodes.dat')
+        db.load()
+        for i in range(300):
+            db.save({('10.0.{}.{}'.format(i // 256, i % 256), 8444)})
+        self.assertLess(db.records, 300)
+        self.assertEqual(
+            nodedb.NodeDatabase('nodes.dat').load(),
+            {('10.0.1.43', 8444)})
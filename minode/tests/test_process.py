@@ -13,6 +13,8 @@ import psutil
 from minode.i2p import util
 from minode.structure import NetAddrNoPrefix
 
+from .sam_bridge import SAMBridge
+
 try:
     socket.socket().bind(('127.0.0.1', 7656))
     i2p_port_free = True
@@ -136,16 +138,25 @@ class TestProcess(TestProcessProto):
                 self.fail('No listening connection found')
 
 
-@unittest.skipIf(i2p_port_free, 'No running i2pd detected')
 class TestProcessI2P(TestProcess):
-    """Test minode process with --i2p and no IP"""
+    """
+    Test minode process with --i2p and no IP,
+    uses the SAM bridge stand-in if no i2pd is running
+    """
     _process_cmd = ['minode', '--i2p', '--no-ip']
     _listen = True
     _listening_port = 8448
+    bridge = None
 
     @classmethod
     def setUpClass(cls):
+        if i2p_port_free:
+            cls.bridge = SAMBridge().start()
+            cls._process_cmd = cls._process_cmd + [
+                '--i2p-sam-port', str(cls.bridge.port)]
         cls.freezed = False
+        if not cls.home:
+            cls.home = tempfile.gettempdir()
         cls.keyfile = os.path.join(cls.home, 'i2p_dest.pub')
         saved = os.path.isfile(cls.keyfile)
         super().setUpClass()
@@ -159,6 +170,12 @@ class TestProcessI2P(TestProcess):
         else:
             cls.freezed = True
 
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if cls.bridge:
+            cls.bridge.stop()
+
     def setUp(self):
         """Skip any test if I2PController freezed"""
         if self.freezed:
@@ -175,6 +192,8 @@ class TestProcessI2P(TestProcess):
 
     def test_connections(self):
         """Ensure all connections are I2P"""
+        if self.bridge:
+            raise unittest.SkipTest('No I2P network behind the SAM bridge')
         super().test_connections()
         for c in self.connections():
             self.assertEqual(c.raddr[0], '127.0.0.1')
@@ -0,0 +1,44 @@
+"""Tests for the sampling profiler"""
+import os
+import tempfile
+import unittest
+
+from minode import profiler, shared
+
+
+class TestProfiler(unittest.TestCase):
+    """Test the sampling profiler"""
+
+    def test_thread_role(self):
+        """Thread names are reduced to roles"""
+        self.assertEqual(
+            profiler.thread_role('Connection to 127.0.0.1:8444'),
+            'Connection')
+        self.assertEqual(profiler.thread_role('I2P Dial to abcd'), 'I2P Dial')
+        self.assertEqual(profiler.thread_role('Thread-12'), 'Thread')
+        self.assertEqual(profiler.thread_role('Manager'), 'Manager')
+
+    def test_dump(self):
+        """Sample stacks and write the folded file"""
+        data_directory = shared.data_directory
+        shared.data_directory = tempfile.mkdtemp()
+        try:
+            p = profiler.Profiler(0.001)
+            p.start()
+            p.stopped.wait(0.2)
+            p.stopped.set()
+            p.join()
+            self.assertGreater(p.samples, 0)
+            files = os.listdir(shared.data_directory)
+            self.assertEqual(len(files), 2)
+            folded = [f for f in files if f.endswith('.folded')][0]
+            with open(
+                os.path.join(shared.data_directory, folded),
+                encoding='utf-8'
+            ) as src:
+                lines = src.readlines()
+            self.assertTrue(any(
+                line.startswith('MainThread;') for line in lines))
+            self.assertTrue(lines[0].strip().split(' ')[-1].isdigit())
+        finally:
+            shared.data_directory = data_directory
@@ -0,0 +1,93 @@
+"""Tests for the crash-safe persistence of objects"""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from minode import shared, storage, structure
+
+
+def make_object(n):
+    """A dummy object with distinct payload"""
+    return structure.Object(
+        b'\x00' * 8, int(time.time() + 3600), 42, 1, 1,
+        'test {}'.format(n).encode())
+
+
+class TestStorage(unittest.TestCase):
+    """Test the objects log and checkpoints"""
+
+    def setUp(self):
+        self.data_directory = shared.data_directory
+        self.objects = shared.objects
+        shared.data_directory = tempfile.mkdtemp()
+        shared.objects = {}
+
+    def tearDown(self):
+        storage.objects_log.close()
+        shutil.rmtree(shared.data_directory)
+        shared.data_directory = self.data_directory
+        shared.objects = self.objects
+
+    def test_atomic_write(self):
+        """The file is replaced, no temporary is left"""
+        path = os.path.join(shared.data_directory, 'test')
+        storage.atomic_write(path, b'old')
+        storage.atomic_write(path, b'new')
+        with open(path, 'rb') as src:
+            self.assertEqual(src.read(), b'new')
+        self.assertEqual(os.listdir(shared.data_directory), ['test'])
+
+    def test_recovery(self):
+        """Objects added after the checkpoint are replayed from the log"""
+        objects = [make_object(i) for i in range(4)]
+        storage.load_objects()
+        self.assertTrue(storage.add_object(objects[0]))
+        self.assertFalse(storage.add_object(objects[0]))
+        storage.save_objects()
+        self.assertEqual(os.path.getsize(storage.objects_log.path), 0)
+        for obj in objects[1:]:
+            storage.add_object(obj)
+        storage.objects_log.close()
+        # a crash in the middle of the last record
+        with open(storage.objects_log.path, 'r+b') as dst:
+            dst.truncate(os.path.getsize(storage.objects_log.path) - 3)
+
+        shared.objects = {}
+        storage.load_objects()
+        self.assertEqual(
+            set(shared.objects), {obj.vector for obj in objects[:3]})
+        self.assertEqual(
+            shared.objects[objects[2].vector].object_payload, b'test 2')
+
+        # the log continues after the valid records
+        storage.add_object(objects[3])
+        storage.objects_log.close()
+        shared.objects = {}
+        storage.load_objects()
+        self.assertEqual(len(shared.objects), 4)
+
+    def test_checkpoint(self):
+        """Objects added while the checkpoint is written are kept"""
+        objects = [make_object(i) for i in range(3)]
+        storage.load_objects()
+        storage.add_object(objects[0])
+        # a crash while writing the checkpoint
+        storage.objects_log.rotate()
+        storage.add_object(objects[1])
+        storage.objects_log.rotate()
+        storage.add_object(objects[2])
+        storage.objects_log.close()
+
+        shared.objects = {}
+        storage.load_objects()
+        self.assertEqual(
+            set(shared.objects), {obj.vector for obj in objects})
+        storage.save_objects()
+        self.assertFalse(os.path.exists(storage.objects_log.old_path))
+        self.assertEqual(os.path.getsize(storage.objects_log.path), 0)
+        storage.objects_log.close()
+        shared.objects = {}
+        storage.load_objects()
+        self.assertEqual(len(shared.objects), 3)
@@ -1,8 +1,12 @@
 """Tests for structures"""
 import base64
+import hashlib
 import logging
+import os
 import queue
+import shutil
 import struct
+import tempfile
 import time
 import unittest
 from binascii import unhexlify
@@ -143,7 +147,11 @@ class TestStructure(unittest.TestCase):
         obj = structure.Object(
             b'\x00' * 8, int(time.time() + 300), 42, 1, 2, b'HELLO')
         vector = obj.vector
-        proofofwork._worker(obj)  # pylint: disable=protected-access
+        job = proofofwork.Job(obj)
+        while proofofwork.jobs.search(job) is None:
+            pass
+        # pylint: disable=protected-access
+        proofofwork._publish(obj, job.result)
         obj = shared.objects.popitem()[1]
         self.assertNotEqual(obj.vector, vector)
         self.assertFalse(obj.is_expired())
@@ -155,6 +163,20 @@ class TestStructure(unittest.TestCase):
             b'TIGER, tiger, burning bright. In the forests of the night'
         self.assertFalse(obj.is_valid())
 
+    def test_pow_backends(self):
+        """All the PoW backends find the same nonces"""
+        initial_hash = hashlib.sha512(b'HELLO').digest()
+        target = 2 ** 64 // 1000
+        # pylint: disable=protected-access
+        nonces = proofofwork._search_python(target, initial_hash, 0, 10000)
+        self.assertIsNotNone(nonces)
+        for name, search in proofofwork.backends.items():
+            self.assertEqual(
+                search(target, initial_hash, 0, 10000), nonces, name)
+            self.assertIsNone(search(0, initial_hash, 0, 1000), name)
+            self.assertGreater(proofofwork.benchmark(search, 0.01), 0)
+        self.assertIn(proofofwork.get_backend(), proofofwork.backends)
+
     def test_proofofwork(self):
         """Check the main proofofwork call and worker"""
         shared.vector_advertise_queue = queue.Queue()
@@ -180,15 +202,71 @@ class TestStructure(unittest.TestCase):
             self.assertEqual(result.object_type, 42)
             self.assertEqual(result.object_payload, b'HELLO')
 
-        q = queue.Queue()
-        # pylint: disable=protected-access
-        proofofwork._pow_worker(obj.pow_target(), obj.pow_initial_hash(), q)
-        try:
-            nonce = q.get(timeout=5)
-        except queue.Empty:
-            self.fail("No nonce found in the queue")
-
+        job = proofofwork.Job(obj)
+        while proofofwork.jobs.search(job) is None:
+            pass
         obj = structure.Object(
-            nonce, obj.expires_time, obj.object_type, obj.version,
-            obj.stream_number, obj.object_payload)
+            job.result.to_bytes(8, 'big'), obj.expires_time,
+            obj.object_type, obj.version, obj.stream_number,
+            obj.object_payload)
         self.assertTrue(obj.is_valid())
+
+
+class TestPoWJobs(unittest.TestCase):
+    """The PoW job queue without the workers"""
+
+    def setUp(self):
+        self.data_directory = shared.data_directory
+        shared.data_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(shared.data_directory)
+        shared.data_directory = self.data_directory
+
+    @staticmethod
+    def manager():
+        """The loaded job manager not starting the workers"""
+        jobs = proofofwork.JobManager()
+        jobs.max_workers = lambda: 0
+        jobs.load()
+        return jobs
+
+    def test_queue(self):
+        """The jobs by priority, cancelled and resumed with the progress"""
+        objects = [
+            structure.Object(
+                b'\x00' * 8, int(time.time() + 3600), 42, 1, 2,
+                'job {}'.format(i).encode())
+            for i in range(3)]
+        jobs = self.manager()
+        low, other = jobs.submit_many(objects[:2])
+        high = jobs.submit(objects[2], priority=1)
+        self.assertIs(jobs.submit(objects[0]), low)
+        self.assertEqual(
+            [job['id'] for job in jobs.status()], [high.id, low.id, other.id])
+        self.assertEqual(jobs.status()[0]['priority'], 1)
+        self.assertEqual(jobs.counts(), {'queued': 3, 'running': 0})
+
+        with self.assertRaises(ValueError):
+            jobs.submit(objects[0], priority=2 ** 31)
+        self.assertEqual(len(jobs.jobs), 3)
+
+        low.nonce = 12345
+        self.assertTrue(jobs.cancel(high.id))
+        self.assertFalse(jobs.cancel(high.id))
+        self.assertEqual(len(jobs.queue), 2)
+
+        resumed = self.manager()
+        self.assertEqual(
+            sorted(resumed.jobs), sorted(job['id'] for job in jobs.status()))
+        self.assertEqual(resumed.jobs[low.id].nonce, 12345)
+        self.assertEqual(resumed.jobs[low.id].progress()['trials'], 12344)
+        self.assertIsNone(resumed.jobs[low.id].progress()['eta'])
+
+        # a torn record is ignored
+        path = os.path.join(shared.data_directory, 'pow_jobs.dat')
+        with open(path, 'rb') as src:
+            data = src.read()
+        with open(path, 'wb') as dst:
+            dst.write(data[:-3])
+        self.assertEqual(len(self.manager().jobs), 1)
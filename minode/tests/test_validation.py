@@ -0,0 +1,70 @@
+"""Tests for the batch validation of objects"""
+import hashlib
+import os
+import time
+import unittest
+
+from minode import shared, structure, validation
+
+
+def make_object(payload, stream=1, ttl=3600, object_type=42, version=1):
+    """An object with the PoW done for the lowered difficulty"""
+    obj = structure.Object(
+        b'\x00' * 8, int(time.time() + ttl), object_type, version, stream,
+        payload)
+    target = obj.pow_target()
+    initial_hash = obj.pow_initial_hash()
+    nonce = 0
+    while int.from_bytes(hashlib.sha512(hashlib.sha512(
+        nonce.to_bytes(8, 'big') + initial_hash
+    ).digest()).digest()[:8], 'big') > target:
+        nonce += 1
+    return structure.Object(
+        nonce.to_bytes(8, 'big'), obj.expires_time, obj.object_type,
+        obj.version, obj.stream_number, obj.object_payload)
+
+
+class TestValidation(unittest.TestCase):
+    """Compare the batch validation with Object.is_valid()"""
+
+    def setUp(self):
+        self.nonce_trials_per_byte = shared.nonce_trials_per_byte
+        shared.nonce_trials_per_byte = 2
+        self.stream = shared.stream
+        shared.stream = 1
+
+    def tearDown(self):
+        shared.nonce_trials_per_byte = self.nonce_trials_per_byte
+        shared.stream = self.stream
+
+    def test_validate(self):
+        """Valid and invalid objects, small and large"""
+        objects = [
+            make_object(os.urandom(size)) for size in (10, 100, 5000, 70000)]
+        objects.append(make_object(b'other stream', stream=2))
+        objects.append(make_object(b'expired', ttl=-4 * 3600))
+        good = make_object(os.urandom(3000))
+        # the nonce for another payload
+        objects.append(structure.Object(
+            good.nonce, good.expires_time, good.object_type, good.version,
+            good.stream_number, os.urandom(3000)))
+        objects.append(good)
+        self.assertEqual(
+            validation.validate(objects), [obj.is_valid() for obj in objects])
+        self.assertEqual(
+            validation.validate(objects),
+            [True] * 4 + [False] * 3 + [True])
+        self.assertEqual(validation.validate([]), [])
+
+    def test_initial_hashes(self):
+        """The same hashes from the pool"""
+        datas = [os.urandom(size) for size in (10, 40000, 3000, 50000)]
+        # pylint: disable=protected-access
+        cpu_count = validation._cpu_count
+        validation._cpu_count = 4
+        try:
+            self.assertEqual(
+                validation.initial_hashes(datas),
+                [hashlib.sha512(data).digest() for data in datas])
+        finally:
+            validation._cpu_count = cpu_count
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Opt-in latency histograms for the stages of the connection pipeline
+and the propagation delay of objects through the node
+"""
+import threading
+import time
+
+from . import metrics
+
+stages = metrics.Histogram(
+    'minode_stage_seconds', 'Time spent in the connection pipeline stages',
+    ('stage', 'command'))
+peer_stages = metrics.Histogram(
+    'minode_peer_stage_seconds',
+    'Time spent in the connection pipeline stages by peer',
+    ('stage', 'peer'))
+advertise_seconds = metrics.Histogram(
+    'minode_advertise_seconds',
+    'Time from the first seen of an object to its advertisement')
+relay_seconds = metrics.Histogram(
+    'minode_relay_seconds',
+    'Time from the first seen of an object'
+    ' to the inv written for all the peers')
+
+# vector: time.monotonic() when the object was stored
+first_seen = {}
+
+
+def observe(stage, command, peer, seconds):
+    """Record the duration of a *stage* for the *command* and *peer*"""
+    # the parsing stage is before the command is known
+    stages.observe(
+        seconds, stage, metrics.command_label(command) if command else b'')
+    peer_stages.observe(seconds, stage, peer)
+
+
+def forget_peer(peer):
+    """Drop the per peer histograms on disconnect"""
+    peer_stages.remove('peer', peer)
+
+
+def seen(vector):
+    """Remember the time when a new object was stored"""
+    now = time.monotonic()
+    if len(first_seen) > 100000:
+        # objects which were never relayed
+        for v, t in tuple(first_seen.items()):
+            if now - t > 3600:
+                first_seen.pop(v, None)
+    first_seen.setdefault(vector, now)
+
+
+class Relay():
+    """
+    Tracks an inv advertised to *peers* connections:
+    the relay is complete when the inv is written for all of them.
+    Connections closed before that leave the relay incomplete.
+    """
+    def __init__(self, vectors, peers):
+        self.vectors = vectors
+        self.pending = peers
+        self.lock = threading.Lock()
+        now = time.monotonic()
+        for vector in vectors:
+            t = first_seen.get(vector)
+            if t:
+                advertise_seconds.observe(now - t)
+
+    def sent(self):
+        """Called by the connection which has sent the inv"""
+        with self.lock:
+            self.pending -= 1
+            if self.pending:
+                return
+        now = time.monotonic()
+        for vector in self.vectors:
+            t = first_seen.pop(vector, None)
+            if t:
+                relay_seconds.observe(now - t)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Validation of many objects at once, e.g. the objects parsed
+from the receive buffer during the initial sync
+"""
+import concurrent.futures
+import hashlib
+import os
+import threading
+import time
+
+from . import shared, structure
+
+# hashlib releases the GIL for the data of this size and larger
+_GIL_RELEASE_SIZE = 2048
+# the pool doesn't pay off for smaller batches
+_POOL_MIN_BYTES = 2 ** 16
+
+_cpu_count = os.cpu_count() or 1
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool  # pylint: disable=global-statement
+    with _pool_lock:
+        if _pool is None:
+            _pool = concurrent.futures.ThreadPoolExecutor(
+                _cpu_count, thread_name_prefix='Validation')
+        return _pool
+
+
+def _initial_hash(data):
+    return hashlib.sha512(data).digest()
+
+
+def initial_hashes(datas):
+    """The PoW initial hashes, the large ones computed in parallel"""
+    large = [
+        i for i, data in enumerate(datas) if len(data) >= _GIL_RELEASE_SIZE]
+    if (
+        len(large) < 2 or _cpu_count < 2
+        or sum(len(datas[i]) for i in large) < _POOL_MIN_BYTES
+    ):
+        return [_initial_hash(data) for data in datas]
+    hashes = [None] * len(datas)
+    futures = {i: _get_pool().submit(_initial_hash, datas[i]) for i in large}
+    for i, data in enumerate(datas):
+        if i not in futures:
+            hashes[i] = _initial_hash(data)
+    for i, future in futures.items():
+        hashes[i] = future.result()
+    return hashes
+
+
+def validate(objects):
+    """
+    Check the objects like Object.is_valid() does, returns the list
+    of booleans. The objects are serialized once, the targets are
+    computed for the same time and the hashes of the large objects
+    in the thread pool.
+    """
+    now = time.time()
+    results = [False] * len(objects)
+    checked = []
+    for i, obj in enumerate(objects):
+        reason = obj.check(now)
+        if reason:
+            structure.log_invalid(obj, reason)
+        else:
+            checked.append(i)
+    if not checked:
+        return results
+
+    datas = [objects[i].to_bytes() for i in checked]
+    extra = shared.payload_length_extra_bytes
+    targets = [
+        structure.pow_target(len(data) + extra, objects[i].expires_time - now)
+        for i, data in zip(checked, datas)]
+    hashes = initial_hashes([data[8:] for data in datas])
+
+    sha512 = hashlib.sha512
+    for i, data, initial_hash, target in zip(
+            checked, datas, hashes, targets):
+        pow_value = int.from_bytes(sha512(sha512(
+            data[:8] + initial_hash).digest()).digest()[:8], 'big')
+        if target < pow_value:
+            structure.log_invalid(objects[i], 'insufficient pow')
+        else:
+            results[i] = True
+    return results
@@ -2,7 +2,7 @@
 
 import os
 
-from setuptools import setup, find_packages
+from setuptools import Extension, setup, find_packages
 
 from minode import shared
 
@@ -22,6 +22,8 @@ setup(
     author='Krzysztof Oziomek',
     url='https://git.bitmessage.org/lee.miller/MiNode',
     packages=find_packages(exclude=('*tests',)),
+    # the native PoW search, pure Python is used if it fails to build
+    ext_modules=[Extension('minode._pow', ['minode/_pow.c'], optional=True)],
     package_data={'': ['*.csv', 'tls/*.pem']},
     entry_points={'console_scripts': ['minode = minode.main:main']},
     classifiers=[